@@ -39,6 +39,9 @@ def build_agent():
             '--hidden-import=websocket',
             '--hidden-import=requests',
             '--hidden-import=psutil',
+            '--hidden-import=orjson',
+            '--hidden-import=msgpack',
+            '--hidden-import=zstandard',
             '--hidden-import=win32api',
             '--hidden-import=win32event',
             '--hidden-import=winerror',
@@ -154,7 +154,8 @@ class Agent:
         self.websocket = WebSocketConnection(
             self.config_manager,
             computer_id,
-            agent_uuid
+            agent_uuid,
+            server_connector=self.server_connector
         )
         
         # Initialize command dispatcher with the WebSocket
@@ -163,12 +164,13 @@ class Agent:
             self.config_manager
         )
         
+        # Start the command dispatcher first: its journal must be loaded before
+        # the first auth_ok triggers the recovery of unfinished tasks
+        self.command_dispatcher.start()
+        
         # Start the WebSocket connection
         self.websocket.start()
         
-        # Start the command dispatcher
-        self.command_dispatcher.start()
-        
         logger.info("WebSocket and command handler started.")
         
     def cleanup(self, is_relaunching=False):
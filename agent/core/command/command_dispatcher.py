@@ -1,10 +1,32 @@
 # agent/core/command/command_dispatcher.py
+import os
 import json
+import time
+import threading
 import agent.core.utils.logger as logger
-from agent.core.command.task_executor import TaskExecutor
+from agent.core.command.task_executor import TaskExecutor, LANE_CHOCO, LANE_COLLECTOR, LANE_IO
+from agent.core.command.task_queue import (
+    PRIORITY_INTERACTIVE, PRIORITY_NORMAL, PRIORITY_BACKGROUND, PRIORITY_OFFSETS,
+    TASK_STATUS_COMPLETED, TASK_STATUS_FAILED, TASK_STATUS_CANCELLED, TASK_STATUS_TIMEOUT,
+    TASK_STATUS_INTERRUPTED
+)
+from agent.core.command.task_journal import TaskJournal, JOURNAL_ACCEPTED
+from agent.core.command.dispatch_pool import DispatchPool
+from agent.core.command.subscription_manager import SubscriptionManager
+from agent.core.network.columnar import FORMAT_COLUMNAR
+from agent.core.network.result_stream import ResultStream
 import agent.core.helper.system_info as system_info
+import agent.core.helper.process_snapshot as process_snapshot
+import agent.core.helper.dns_resolver as dns_resolver
+import agent.core.helper.process_cache as process_cache
+import agent.core.helper.inventory as inventory
+import agent.core.helper.telemetry as telemetry
+import agent.core.helper.alert_rules as alert_rules
 import agent.core.helper.choco_handle as choco_handle
 import agent.core.helper.file_handle as file_handle
+import agent.core.helper.process_handle as process_handle
+
+MIN_PROCESS_SUBSCRIPTION_INTERVAL = 2 # Seconds
 
 class CommandDispatcher:
     """
@@ -22,43 +44,175 @@ class CommandDispatcher:
         """
         self.websocket = websocket_connection
         self.config_manager = config_manager
-        self.task_executor = TaskExecutor(self._on_task_completed)
         
-        # Register the message handler with the WebSocket
+        # Command registry: maps command types to their handler and, for
+        # commands executed asynchronously, the TaskExecutor lane they run in,
+        # their default priority class, their default deadline in seconds,
+        # whether identical in-flight requests may share one execution and
+        # whether the task can safely be re-run after an agent restart
+        self.command_handlers = {
+            "get_system_info": {"handler": self._handle_get_system_info},
+            "get_process_list": {"handler": self._handle_get_process_list},
+            "cancel_task": {"handler": self._handle_cancel_task},
+            "get_agent_stats": {"handler": self._handle_get_agent_stats},
+            "get_metrics_history": {"handler": self._handle_get_metrics_history},
+            "set_alert_rules": {"handler": self._handle_set_alert_rules},
+            "get_alert_rules": {"handler": self._handle_get_alert_rules},
+            "subscribe": {"handler": self._handle_subscribe},
+            "unsubscribe": {"handler": self._handle_unsubscribe},
+            "get_network_connections": {
+                "handler": self._handle_get_network_connections,
+                "lane": LANE_COLLECTOR,
+                "priority": PRIORITY_INTERACTIVE,
+                "timeout": 60,
+                "coalesce": True,
+                "idempotent": True,
+                "follow_up": self._stream_network_hostnames,
+            },
+            "install_application": {
+                "handler": self._handle_install_application,
+                "lane": LANE_CHOCO,
+                "priority": PRIORITY_BACKGROUND,
+                "timeout": 30 * 60,
+            },
+            "uninstall_application": {
+                "handler": self._handle_uninstall_application,
+                "lane": LANE_CHOCO,
+                "priority": PRIORITY_BACKGROUND,
+                "timeout": 30 * 60,
+            },
+            "install_file": {
+                "handler": self._handle_install_file,
+                "lane": LANE_IO,
+                "priority": PRIORITY_NORMAL,
+                "timeout": 15 * 60,
+                "idempotent": True,
+            },
+            "list_files": {
+                "handler": self._handle_list_files,
+                "lane": LANE_IO,
+                "priority": PRIORITY_NORMAL,
+                "timeout": 5 * 60,
+                "idempotent": True,
+            },
+        }
+        
+        # Lane worker counts can be overridden through the "task_lanes" config key
+        config = self.config_manager.get_config() or {}
+        self.task_executor = TaskExecutor(
+            self._on_task_completed,
+            lanes=config.get("task_lanes"),
+            start_callback=self._on_task_started
+        )
+        
+        # Pool that runs command handlers so the WebSocket receive thread only
+        # parses and hands off messages
+        self.dispatch_pool = DispatchPool()
+        
+        # Write-ahead journal of accepted async tasks, replayed after a restart
+        self.journal = TaskJournal(os.path.join(self.config_manager.config_dir, "task_journal.jsonl"))
+        self.unfinished_tasks = []
+        self.journal_recovered = False
+        
+        # Response format requested by each queued task (task ID -> format)
+        self.task_formats = {}
+        
+        # Results currently being streamed in chunks (task ID -> ResultStream)
+        self.result_streams = {}
+        self.result_streams_lock = threading.Lock()
+        
+        # Collectors the server can subscribe to; each is pushed at its own interval
+        self.subscriptions = SubscriptionManager(self.websocket, {
+            "metrics": self._collect_metrics,
+            "processes": self._collect_processes,
+            "connections": self._collect_connections,
+        })
+        
+        # Register the message handler with the WebSocket; journaled tasks are
+        # recovered once the server has accepted the authentication
         self.websocket.message_handler = self.handle_message
+        self.websocket.ready_handler = self._recover_journal_tasks
         
     def start(self):
         """Start the command dispatcher and task executor"""
+        self.unfinished_tasks = self.journal.open()
         self.task_executor.start()
+        self.dispatch_pool.start()
+        
+        # Alert rules are evaluated on every telemetry sample and survive restarts
+        alert_rules.start(os.path.join(self.config_manager.config_dir, "alert_rules.json"), self._send_alert)
+        
+        # Background metrics history; the interval can be set through the "telemetry_interval" config key
+        config = self.config_manager.get_config() or {}
+        telemetry.start(config.get("telemetry_interval", telemetry.DEFAULT_SAMPLE_INTERVAL))
+        self.subscriptions.start()
         logger.info("CommandDispatcher started")
         
-    def handle_message(self, ws, message):
+    def handle_message(self, ws, data):
         """
         Handle incoming messages from WebSocket
         
+        Runs on the WebSocket receive thread, so it only inspects the message
+        and hands the command off to the dispatch pool.
+        
         Args:
             ws: WebSocket instance
-            message: Raw message string from WebSocket
+            data: Message decoded by the connection's codec
         """
         try:
-            data = json.loads(message)
-            
             logger.info("\n" + "=" * 30)
             logger.info(f"[RECV COMMAND] Type: {data.get('type', 'unknown')}")
             logger.info(f"[PARAMS] {data.get('params')}")
             
-            # Handle welcome message separately
+            # Handle welcome message separately; the agent is not authenticated yet
             if data.get("type") == "welcome":
                 logger.info("[STATUS] Received welcome message from server")
                 return
                 
+            # Flow control for streamed results is handled inline: the workers
+            # streaming the results may be the ones waiting for this credit
+            if data.get("type") == "grant_credit":
+                self._grant_stream_credit(data.get("task_id"), data.get("credit", 1))
+                return
+                
             # Extract command type and task ID
             command_type = data.get("command_type", data.get("type"))
             params = data.get("params", {})
             task_id = params.get("task_id")
             
-            logger.info(f"[EXECUTING] Command: {command_type}, Task ID: {task_id}")
+            # Hand the command off to the dispatch pool
+            if not self.dispatch_pool.submit(self._execute_command, command_type, params):
+                logger.warning(f"[BUSY] Rejecting command {command_type} (Task ID: {task_id}): dispatch queue full")
+                self.websocket.send({
+                    "type": "response",
+                    "command_type": command_type,
+                    "task_id": task_id,
+                    "success": False,
+                    "message": "Agent is busy, please retry later",
+                    "data": None,
+                })
+                
+            logger.info("=" * 30 + "\n")
             
+        except Exception as e:
+            logger.error(f"[ERROR] Exception in handle_message: {e}")
+            try:
+                self.websocket.send({"type": "error", "message": f"An internal error occurred: {e}"})
+            except Exception as send_error:
+                logger.error(f"Failed to send generic error response: {send_error}")
+                
+    def _execute_command(self, command_type, params):
+        """
+        Execute a command on a dispatch worker and send its immediate response
+        
+        Args:
+            command_type: Type of command to process
+            params: Parameters for the command
+        """
+        task_id = params.get("task_id")
+        logger.info(f"[EXECUTING] Command: {command_type}, Task ID: {task_id}")
+        
+        try:
             # Process the command
             response_data = self.handle_command(command_type, params)
             
@@ -72,7 +226,10 @@ class CommandDispatcher:
                     "message": response_data.get("message", ""),
                     "data": response_data.get("data"),
                 }
-                
+                response_format = self._get_format(params)
+                if response_format:
+                    response["format"] = response_format
+                    
                 logger.info(
                     f"[SEND RESPONSE] Command: {command_type}, Task ID: {task_id}, Success: {response['success']}"
                 )
@@ -82,17 +239,8 @@ class CommandDispatcher:
                 except Exception as send_error:
                     logger.error(f"Failed to send immediate response for {command_type} (Task ID: {task_id}): {send_error}")
                     
-            logger.info("=" * 30 + "\n")
-            
-        except json.JSONDecodeError:
-            logger.error("[ERROR] Invalid JSON message received")
-            try:
-                self.websocket.send({"type": "error", "message": "Invalid JSON format"})
-            except Exception as send_error:
-                logger.error(f"Failed to send JSON error response: {send_error}")
-                
         except Exception as e:
-            logger.error(f"[ERROR] Exception in handle_message: {e}")
+            logger.error(f"[ERROR] Exception executing {command_type} (Task ID: {task_id}): {e}")
             try:
                 self.websocket.send({"type": "error", "message": f"An internal error occurred: {e}"})
             except Exception as send_error:
@@ -114,19 +262,9 @@ class CommandDispatcher:
         logger.info(f"Handling command: {command_type}, Task ID: {task_id}")
         
         try:
-            # Map command types to handler methods
-            command_handlers = {
-                "get_system_info": self._handle_get_system_info,
-                "get_process_list": self._handle_get_process_list,
-                "get_network_connections": self._handle_get_network_connections,
-                "install_application": self._handle_install_application,
-                "uninstall_application": self._handle_uninstall_application,
-                "install_file": self._handle_install_file
-            }
-            
             # Execute handler if available
-            if command_type in command_handlers:
-                handler = command_handlers[command_type]
+            if command_type in self.command_handlers:
+                handler = self.command_handlers[command_type]["handler"]
                 return handler(params)
             else:
                 # Unknown command
@@ -144,8 +282,13 @@ class CommandDispatcher:
             }
             
     def _handle_get_system_info(self, params):
-        """Handle get_system_info command"""
-        system_info_data = system_info.get_system_info()
+        """
+        Handle get_system_info command
+        
+        Returns the hardware and OS inventory; 'refresh': true rebuilds the
+        cached static part instead of waiting for a change to be detected.
+        """
+        system_info_data = system_info.get_system_info(params.get("refresh") is True)
         logger.info("Retrieved system info.")
         
         return {
@@ -155,8 +298,26 @@ class CommandDispatcher:
         }
         
     def _handle_get_process_list(self, params):
-        """Handle get_process_list command"""
-        processes = system_info.get_process_list()
+        """
+        Handle get_process_list command
+        
+        Without a 'since_version' param the full process list is returned as before.
+        With it (null for a first request), a versioned snapshot is returned, holding
+        only the changes since that version when the agent still knows it.
+        An optional 'fields' list limits the collected fields, and an optional
+        'query' object filters, sorts and limits the rows on the agent.
+        """
+        cpu_window = self._get_cpu_window(params)
+        fields = self._get_fields(params)
+        query = self._get_query(params)
+        
+        if "since_version" in params:
+            since_version = params.get("since_version")
+            if not isinstance(since_version, int):
+                since_version = None
+            processes = system_info.get_process_snapshot(since_version, cpu_window, fields, query)
+        else:
+            processes = system_info.get_process_list(cpu_window, fields, query)
         logger.info("Retrieved process list.")
         
         return {
@@ -165,21 +326,389 @@ class CommandDispatcher:
             "data": processes,
         }
         
+    def _get_cpu_window(self, params):
+        """
+        Get the CPU measurement window requested by a process command
+        
+        Args:
+            params: Command parameters
+            
+        Returns:
+            float: Requested window in seconds, or the default when it is
+                   missing or outside 0 to MAX_PROCESS_CPU_WINDOW
+        """
+        cpu_window = params.get("cpu_window")
+        if isinstance(cpu_window, bool) or not (
+            isinstance(cpu_window, (int, float)) and 0 <= cpu_window <= process_snapshot.MAX_PROCESS_CPU_WINDOW
+        ):
+            return process_snapshot.PROCESS_CPU_WINDOW
+        return cpu_window
+        
+    def _get_fields(self, params):
+        """
+        Get the field projection requested by a collector command
+        
+        Args:
+            params: Command parameters
+            
+        Returns:
+            list or None: Requested field names, or None for all fields
+        """
+        fields = params.get("fields")
+        if not isinstance(fields, list):
+            return None
+        return [field for field in fields if isinstance(field, str)] or None
+        
+    def _get_format(self, params):
+        """
+        Get the response format requested by a command
+        
+        Args:
+            params: Command parameters
+            
+        Returns:
+            str or None: FORMAT_COLUMNAR, or None for plain rows
+        """
+        return FORMAT_COLUMNAR if params.get("format") == FORMAT_COLUMNAR else None
+        
+    def _get_query(self, params):
+        """
+        Get the filter/sort/limit query requested by a collector command
+        
+        Args:
+            params: Command parameters
+            
+        Returns:
+            dict or None: The query, or None if absent or malformed
+        """
+        query = params.get("query")
+        return query if isinstance(query, dict) else None
+        
+    def _handle_cancel_task(self, params):
+        """Handle cancel_task command"""
+        target_task_id = params.get("target_task_id")
+        
+        if not target_task_id:
+            return {
+                "success": False,
+                "message": "Target task ID parameter ('target_task_id') is required"
+            }
+            
+        logger.info(f"Cancelling task {target_task_id}")
+        cancelled, message = self.task_executor.cancel_task(target_task_id)
+        
+        return {
+            "success": cancelled,
+            "message": message,
+            "data": {"target_task_id": target_task_id},
+        }
+        
+    def _handle_get_agent_stats(self, params):
+        """Handle get_agent_stats command"""
+        return {
+            "success": True,
+            "message": "Agent stats retrieved successfully.",
+            "data": {
+                "dispatch": self.dispatch_pool.get_stats(),
+                "task_lanes": self.task_executor.get_stats(),
+                "dns_resolver": dns_resolver.get_stats(),
+                "process_cache": process_cache.get_stats(),
+                "inventory": inventory.get_stats(),
+                "telemetry": telemetry.get_stats(),
+                "alerts": alert_rules.get_stats(),
+                "subscriptions": self.subscriptions.get_stats(),
+                "websocket": self.websocket.get_stats(),
+            },
+        }
+        
+    def _handle_get_metrics_history(self, params):
+        """
+        Handle get_metrics_history command
+        
+        Returns the metrics recorded by the background sampler for the last
+        'window' seconds (default 10 minutes, at most 24 hours) without taking
+        a new sample. Optional 'metrics' limits the returned columns and
+        'resolution': "1m" forces the one-minute rollups.
+        """
+        window = params.get("window", telemetry.RECENT_SPAN)
+        metrics = params.get("metrics")
+        if not (isinstance(metrics, list) and all(isinstance(metric, str) for metric in metrics)):
+            metrics = None
+            
+        history = telemetry.get_history(window, params.get("resolution"), metrics)
+        return {
+            "success": True,
+            "message": "Metrics history retrieved successfully.",
+            "data": history,
+        }
+        
+    def _handle_set_alert_rules(self, params):
+        """
+        Handle set_alert_rules command
+        
+        Replaces the agent's alert rules with 'rules', a list of
+        {id, metric, comparator, threshold, duration, hysteresis}. Rules are
+        evaluated on every telemetry sample and only firing/resolved
+        transitions are sent, as alert messages.
+        """
+        success, message = alert_rules.set_rules(params.get("rules"))
+        return {
+            "success": success,
+            "message": message,
+            "data": {"rules": alert_rules.get_rules()} if success else None,
+        }
+        
+    def _handle_get_alert_rules(self, params):
+        """Handle get_alert_rules command"""
+        return {
+            "success": True,
+            "message": "Alert rules retrieved successfully.",
+            "data": {"rules": alert_rules.get_rules()},
+        }
+        
+    def _send_alert(self, alert):
+        """
+        Send an alert rule transition to the server
+        
+        Alerts raised while disconnected are kept in the outbox.
+        
+        Args:
+            alert: Alert data built by alert_rules
+        """
+        self.websocket.send({"type": "alert", "alert_id": alert["alert_id"], "data": alert})
+        
+    def _handle_subscribe(self, params):
+        """
+        Handle subscribe command
+        
+        Starts pushing a collector ('metrics', 'processes' or 'connections')
+        every 'interval' seconds in subscription_update messages until
+        unsubscribe or the end of the connection. 'subscription_id' defaults
+        to the task ID; subscribing again with the same ID replaces the
+        subscription and restarts it with full data. 'fields', 'query',
+        'metrics', 'cpu_window' and 'format' apply as in the matching commands.
+        """
+        collector = params.get("collector")
+        subscription_id = params.get("subscription_id") or params.get("task_id")
+        interval = params.get("interval", 5)
+        
+        options = {"fields": self._get_fields(params), "query": self._get_query(params)}
+        metrics = params.get("metrics")
+        if isinstance(metrics, list) and all(isinstance(metric, str) for metric in metrics):
+            options["metrics"] = metrics
+        if collector == "processes":
+            cpu_window = self._get_cpu_window(params)
+            options["cpu_window"] = cpu_window
+            # A process snapshot takes at least the CPU window
+            if isinstance(interval, (int, float)) and not isinstance(interval, bool):
+                interval = max(interval, MIN_PROCESS_SUBSCRIPTION_INTERVAL, cpu_window)
+                
+        success, message = self.subscriptions.subscribe(
+            subscription_id, collector, interval, options, self._get_format(params)
+        )
+        return {
+            "success": success,
+            "message": message,
+            "data": {"subscription_id": subscription_id, "collector": collector},
+        }
+        
+    def _handle_unsubscribe(self, params):
+        """Handle unsubscribe command"""
+        subscription_id = params.get("subscription_id")
+        
+        if not subscription_id:
+            return {
+                "success": False,
+                "message": "Subscription ID parameter ('subscription_id') is required"
+            }
+            
+        success, message = self.subscriptions.unsubscribe(subscription_id)
+        return {
+            "success": success,
+            "message": message,
+            "data": {"subscription_id": subscription_id},
+        }
+        
+    def _collect_metrics(self, state, options):
+        """
+        Subscription collector: metrics recorded since the previous push
+        
+        The first push holds the last minute of history.
+        """
+        now = time.time()
+        last_ts = state.get("last_ts")
+        window = now - last_ts + 1 if last_ts else 60
+        history = telemetry.get_history(window, None, options.get("metrics"))
+        
+        if last_ts:
+            start = 0
+            while start < len(history["timestamps"]) and history["timestamps"][start] <= last_ts:
+                start += 1
+            history["timestamps"] = history["timestamps"][start:]
+            history["values"] = [column[start:] for column in history["values"]]
+        if history["timestamps"]:
+            state["last_ts"] = history["timestamps"][-1]
+        return history
+        
+    def _collect_processes(self, state, options):
+        """
+        Subscription collector: process snapshot, as a delta against the previous push
+        """
+        snapshot = system_info.get_process_snapshot(
+            state.get("version"), options.get("cpu_window"), options.get("fields"), options.get("query")
+        )
+        state["version"] = snapshot.get("version")
+        return snapshot
+        
+    def _collect_connections(self, state, options):
+        """
+        Subscription collector: network connections, as a delta against the previous push
+        
+        Returns:
+            dict: {"full": True, "connections": [...]} on the first push, then
+                  {"full": False, "added": [...], "removed": [[pid, local_addr, remote_addr], ...],
+                   "changed": [...]} where changed rows hold the key and the changed fields
+        """
+        rows = system_info.get_network_connections(0, options.get("fields"), options.get("query"))
+        current = {
+            (row.get("pid"), row.get("local_addr"), row.get("remote_addr")): row
+            for row in rows
+        }
+        previous = state.get("rows")
+        state["rows"] = current
+        
+        if previous is None:
+            return {"full": True, "connections": rows}
+            
+        changed = []
+        for key, row in current.items():
+            old_row = previous.get(key)
+            if old_row is None:
+                continue
+            diff = {field: value for field, value in row.items() if old_row.get(field) != value}
+            if diff:
+                diff["pid"], diff["local_addr"], diff["remote_addr"] = key
+                changed.append(diff)
+                
+        return {
+            "full": False,
+            "added": [row for key, row in current.items() if key not in previous],
+            "removed": [list(key) for key in previous if key not in current],
+            "changed": changed,
+        }
+        
     def _handle_get_network_connections(self, params):
         """Handle get_network_connections command (async)"""
         task_id = params.get("task_id")
         logger.info(f"Queueing task for network connections retrieval (Task ID: {task_id})")
         
-        # Queue heavy task
-        self.task_executor.queue_task(
+        # Streamed on request: rows are sent in result_chunk messages as they are read
+        if params.get("stream"):
+            self._queue_task(
+                "get_network_connections",
+                self._stream_network_connections,
+                params,
+                args=(task_id, self._get_fields(params), self._get_query(params), self._get_format(params))
+            )
+            return None
+            
+        # Queue heavy task; the table is returned without waiting for uncached hostnames,
+        # which are sent afterwards as task_update messages (see _stream_network_hostnames)
+        self._queue_task(
+            "get_network_connections",
             system_info.get_network_connections,
-            command_type="get_network_connections",
-            task_id=task_id
+            params,
+            args=(0, self._get_fields(params), self._get_query(params))
         )
         
         # Async task, no immediate response
         return None
         
+    def _stream_network_connections(self, task_id, fields, query, response_format):
+        """
+        Task body of a streamed get_network_connections: send the connections in
+        chunks as they are read, then stream the hostnames still being resolved
+        
+        Args:
+            task_id: Task ID of the request
+            fields: Field projection
+            query: Filter/sort/limit query
+            response_format: Response format of the chunks
+            
+        Returns:
+            dict: Stream summary used as the task result
+        """
+        pending_hostnames = {}
+        rows = system_info.iter_network_connections(fields, query, pending_hostnames)
+        summary = self._stream_result("get_network_connections", task_id, rows, response_format)
+        
+        if pending_hostnames:
+            def on_update(updates, done):
+                self._send_task_update("get_network_connections", task_id, {"remote_hosts": updates, "done": done})
+                
+            system_info.stream_pending_hostnames(pending_hostnames, on_update)
+        return summary
+        
+    def _handle_list_files(self, params):
+        """Handle list_files command (async), optionally streamed in chunks"""
+        task_id = params.get("task_id")
+        logger.info(f"Queueing task for managed file listing (Task ID: {task_id})")
+        
+        if params.get("stream"):
+            self._queue_task(
+                "list_files",
+                self._stream_result,
+                params,
+                args=("list_files", task_id, file_handle.iter_files(), self._get_format(params))
+            )
+        else:
+            self._queue_task("list_files", lambda: list(file_handle.iter_files()), params)
+            
+        # Async task, no immediate response
+        return None
+        
+    def _stream_result(self, command_type, task_id, rows, response_format=None):
+        """
+        Send the rows of a task result as result_chunk messages
+        
+        Runs on the task worker; stops early if the task is cancelled or times out.
+        
+        Args:
+            command_type: Type of command that produced the rows
+            task_id: Task ID the chunks belong to
+            rows: Iterable of rows, typically a generator
+            response_format: Optional response format of the chunks
+            
+        Returns:
+            dict: Stream summary used as the task result
+        """
+        stream = ResultStream(self.websocket, command_type, task_id, response_format)
+        task = process_handle.get_current_task()
+        should_stop = task.is_finished if task is not None else None
+        
+        with self.result_streams_lock:
+            self.result_streams[task_id] = stream
+        try:
+            return stream.send_rows(rows, should_stop)
+        finally:
+            with self.result_streams_lock:
+                self.result_streams.pop(task_id, None)
+                
+    def _grant_stream_credit(self, task_id, credit):
+        """
+        Add credit granted by the server to a result stream
+        
+        Args:
+            task_id: Task ID of the stream
+            credit: Number of additional chunks the stream may send
+        """
+        with self.result_streams_lock:
+            stream = self.result_streams.get(task_id)
+        if stream is None:
+            return
+        if isinstance(credit, int) and credit > 0:
+            stream.grant(credit)
+            
     def _handle_install_application(self, params):
         """Handle install_application command (async)"""
         app_name = params.get("name")
@@ -196,12 +725,7 @@ class CommandDispatcher:
         logger.info(f"Queueing task for installing {app_name} (Version: {version or 'latest'}, Task ID: {task_id})")
         
         # Queue heavy task
-        self.task_executor.queue_task(
-            choco_handle.install_package,
-            args=(app_name, version),
-            command_type="install_application",
-            task_id=task_id
-        )
+        self._queue_task("install_application", choco_handle.install_package, params, args=(app_name, version))
         
         # Async task, no immediate response
         return None
@@ -221,12 +745,7 @@ class CommandDispatcher:
         logger.info(f"Queueing task for uninstalling {app_name} (Task ID: {task_id})")
         
         # Queue heavy task
-        self.task_executor.queue_task(
-            choco_handle.uninstall_package,
-            args=(app_name,),
-            command_type="uninstall_application",
-            task_id=task_id
-        )
+        self._queue_task("uninstall_application", choco_handle.uninstall_package, params, args=(app_name,))
         
         # Async task, no immediate response
         return None
@@ -250,17 +769,180 @@ class CommandDispatcher:
         server_link = self.config_manager.get_config().get("server_link")
         
         # Queue heavy task
-        self.task_executor.queue_task(
-            file_handle.install_file,
-            args=(server_link, file_name, file_link),
-            command_type="install_file",
-            task_id=task_id
+        self._queue_task(
+            "install_file", file_handle.install_file, params, args=(server_link, file_name, file_link)
         )
         
         # Async task, no immediate response
         return None
         
-    def _on_task_completed(self, success, result, command_type, task_id):
+    def _queue_task(self, command_type, func, params, args=()):
+        """
+        Queue an async task using the settings registered for its command type
+        and record it in the task journal
+        
+        Args:
+            command_type: Type of command
+            func: Function to execute
+            params: Command parameters (must include task_id)
+            args: Positional arguments for the function (tuple)
+            
+        Returns:
+            bool: True if the task was queued successfully
+        """
+        task_id = params.get("task_id")
+        self.journal.record_accepted(task_id, command_type, params)
+        
+        response_format = self._get_format(params)
+        if response_format and task_id:
+            self.task_formats[task_id] = response_format
+            
+        queued = self.task_executor.queue_task(
+            func,
+            args=args,
+            command_type=command_type,
+            task_id=task_id,
+            lane=self._get_lane(command_type),
+            priority=self._get_priority(command_type, params),
+            timeout=self._get_timeout(command_type, params),
+            coalesce_key=self._get_coalesce_key(command_type, params)
+        )
+        
+        if not queued:
+            self.journal.record_finished(task_id, TASK_STATUS_FAILED)
+            self.task_formats.pop(task_id, None)
+            
+        return queued
+        
+    def _recover_journal_tasks(self):
+        """
+        Handle tasks left unfinished in the journal by a previous run
+        
+        Tasks that never started, and started tasks registered as idempotent,
+        are queued again under their original task ID. Started non-idempotent
+        tasks are reported to the server as interrupted. Called when the
+        connection becomes ready (auth_ok), so the results reach an
+        authenticated session; only the first ready transition recovers.
+        """
+        if self.journal_recovered:
+            return
+        self.journal_recovered = True
+        
+        for entry in self.unfinished_tasks:
+            command_type = entry["command_type"]
+            task_id = entry["task_id"]
+            registration = self.command_handlers.get(command_type, {})
+            
+            if registration.get("lane") and (entry["state"] == JOURNAL_ACCEPTED or registration.get("idempotent")):
+                logger.info(f"Replaying journaled task {task_id} ({command_type})")
+                response_data = self.handle_command(command_type, entry["params"])
+                if response_data:
+                    # Replay was rejected (e.g. invalid params), report it as failed
+                    self._on_task_completed(
+                        False, (False, response_data.get("message", "")), command_type, task_id, TASK_STATUS_FAILED
+                    )
+            else:
+                logger.warning(f"Reporting journaled task {task_id} ({command_type}) as interrupted")
+                self._on_task_completed(
+                    False, "Task was interrupted by an agent restart", command_type, task_id, TASK_STATUS_INTERRUPTED
+                )
+                
+        self.unfinished_tasks = []
+        
+    def _get_lane(self, command_type):
+        """
+        Returns the TaskExecutor lane registered for a command type
+        
+        Args:
+            command_type: Type of command
+            
+        Returns:
+            str or None: Lane name, or None to use the executor default
+        """
+        return self.command_handlers.get(command_type, {}).get("lane")
+        
+    def _get_priority(self, command_type, params):
+        """
+        Returns the priority class for a task, honouring a server override
+        
+        Args:
+            command_type: Type of command
+            params: Command parameters, may contain a "priority" override
+            
+        Returns:
+            str: Priority class of the task
+        """
+        requested = params.get("priority")
+        if requested in PRIORITY_OFFSETS:
+            return requested
+            
+        if requested is not None:
+            logger.warning(f"Ignoring unknown priority '{requested}' for {command_type}")
+            
+        return self.command_handlers.get(command_type, {}).get("priority", PRIORITY_NORMAL)
+        
+    def _get_timeout(self, command_type, params):
+        """
+        Returns the deadline for a task in seconds, honouring a server override
+        
+        Args:
+            command_type: Type of command
+            params: Command parameters, may contain a "timeout" override in seconds
+            
+        Returns:
+            float or None: Deadline in seconds, or None for no deadline
+        """
+        requested = params.get("timeout")
+        if requested is not None:
+            try:
+                timeout = float(requested)
+                if timeout > 0:
+                    return timeout
+            except (TypeError, ValueError):
+                pass
+            logger.warning(f"Ignoring invalid timeout '{requested}' for {command_type}")
+            
+        return self.command_handlers.get(command_type, {}).get("timeout")
+        
+    def _get_coalesce_key(self, command_type, params):
+        """
+        Returns the key identifying identical requests for coalescible commands
+        
+        The key is the command type plus the parameters that affect the result,
+        normalized so that key order and scheduling-only params do not matter.
+        
+        Args:
+            command_type: Type of command
+            params: Command parameters
+            
+        Returns:
+            str or None: Coalesce key, or None if the command must not be coalesced
+        """
+        if not self.command_handlers.get(command_type, {}).get("coalesce"):
+            return None
+            
+        # Each streamed request has its own chunk sequence and flow control
+        if params.get("stream"):
+            return None
+            
+        result_params = {
+            key: value for key, value in params.items()
+            if key not in ("task_id", "priority", "timeout")
+        }
+        return f"{command_type}:{json.dumps(result_params, sort_keys=True, default=str)}"
+        
+    def _on_task_started(self, command_type, task_ids):
+        """
+        Callback when an async task starts running
+        
+        Args:
+            command_type: Type of command being executed
+            task_ids: Task IDs waiting for the task's result
+        """
+        for task_id in task_ids:
+            self.journal.record_started(task_id)
+            
+    def _on_task_completed(self, success, result, command_type, task_id, status=TASK_STATUS_COMPLETED):
         """
         Callback when an async task completes
         
@@ -269,28 +951,44 @@ class CommandDispatcher:
             result: Result data from the task
             command_type: Type of command that was executed
             task_id: Task ID for tracking
+            status: Final task status (completed, failed, cancelled, timeout or interrupted)
         """
+        self.journal.record_finished(task_id, status)
+        response_format = self.task_formats.pop(task_id, None)
+        
         if not self.websocket:
             logger.warning(f"Cannot send task completion for {command_type} (Task ID: {task_id}): WebSocket is not connected.")
             return
             
         # Create response message
+        if status == TASK_STATUS_CANCELLED:
+            message = f"Task '{command_type}' was cancelled"
+        elif status == TASK_STATUS_TIMEOUT:
+            message = f"Task '{command_type}' timed out"
+        elif status == TASK_STATUS_INTERRUPTED:
+            message = f"Task '{command_type}' was interrupted by an agent restart and may not have completed"
+        elif isinstance(result, tuple) and len(result) > 1 and not success:
+            message = result[1]
+        else:
+            message = f"Task '{command_type}' completed {'successfully' if success else 'with errors'}"
+            
         response = {
             "type": "task_completed",
             "command_type": command_type,
             "task_id": task_id,
             "success": success,
-            "message": (
-                result[1] if isinstance(result, tuple) and len(result) > 1 and not success
-                else f"Task '{command_type}' completed {'successfully' if success else 'with errors'}"
-            ),
+            "status": status,
+            "message": message,
             "data": result if success else None,
         }
-        
+        if response_format:
+            response["format"] = response_format
+            
         # Log task completion
         logger.info("\n" + "=" * 30)
         logger.info(f"[TASK COMPLETED] {command_type} (Task ID: {task_id})")
         logger.info(f"[SUCCESS] {success}")
+        logger.info(f"[STATUS] {status}")
         logger.info(f"[MESSAGE] {response['message']}")
         
         if success and response['data']:
@@ -306,13 +1004,77 @@ class CommandDispatcher:
             logger.info(f"Sent task completion status for {command_type} (Task ID: {task_id})")
         except Exception as send_error:
             logger.error(f"Failed to send task completion status for {command_type} (Task ID: {task_id}): {send_error}")
+            return
             
+        # Start follow-up work that streams more data for the completed task
+        follow_up = self.command_handlers.get(command_type, {}).get("follow_up")
+        if follow_up and status == TASK_STATUS_COMPLETED and success:
+            try:
+                follow_up(task_id, result)
+            except Exception as e:
+                logger.error(f"Error starting follow-up for {command_type} (Task ID: {task_id}): {e}")
+                
+    def _send_task_update(self, command_type, task_id, data):
+        """
+        Send additional data for an already completed task
+        
+        Args:
+            command_type: Type of command the task executed
+            task_id: Task ID for tracking
+            data: Update payload
+        """
+        if not self.websocket:
+            logger.warning(f"Cannot send task update for {command_type} (Task ID: {task_id}): WebSocket is not connected.")
+            return
+            
+        try:
+            self.websocket.send({
+                "type": "task_update",
+                "command_type": command_type,
+                "task_id": task_id,
+                "data": data,
+            })
+        except Exception as send_error:
+            logger.error(f"Failed to send task update for {command_type} (Task ID: {task_id}): {send_error}")
+            
+    def _stream_network_hostnames(self, task_id, connections):
+        """
+        Follow-up of get_network_connections: stream the remote hostnames that were
+        not resolved yet, keyed by the index of the connection in the sent table
+        
+        Args:
+            task_id: Task ID of the completed get_network_connections task
+            connections: Connection table sent with the task completion
+        """
+        # Streamed results start their hostname updates themselves
+        if not isinstance(connections, list):
+            return
+            
+        def on_update(updates, done):
+            self._send_task_update("get_network_connections", task_id, {"remote_hosts": updates, "done": done})
+            
+        system_info.stream_remote_hostnames(connections, on_update)
+        
     def stop(self):
         """Stop the command dispatcher and its components"""
         logger.info("Stopping CommandDispatcher...")
         
+        # Stop dispatching new commands and pushing subscriptions first
+        self.dispatch_pool.stop()
+        self.subscriptions.stop()
+        
+        # Release workers waiting for stream credit
+        with self.result_streams_lock:
+            for stream in self.result_streams.values():
+                stream.abort()
+                
         # Stop task executor
         if self.task_executor:
             self.task_executor.stop()
             
+        self.journal.close()
+        dns_resolver.shutdown()
+        alert_rules.stop()
+        telemetry.stop()
+        
         logger.info("CommandDispatcher stopped.")
\ No newline at end of file
@@ -0,0 +1,152 @@
+# agent/core/command/dispatch_pool.py
+import queue
+import threading
+import time
+import agent.core.utils.logger as logger
+
+DEFAULT_DISPATCH_WORKERS = 4
+DEFAULT_DISPATCH_QUEUE_SIZE = 64
+
+class DispatchPool:
+    """
+    Small bounded thread pool that runs command handlers off the WebSocket
+    receive thread.
+    
+    The receive thread only parses and submits; if the hand-off queue is full
+    the submission is rejected immediately instead of blocking the receive
+    loop (and with it ping/pong handling).
+    """
+    
+    def __init__(self, worker_count=DEFAULT_DISPATCH_WORKERS, queue_size=DEFAULT_DISPATCH_QUEUE_SIZE):
+        """
+        Initialize the DispatchPool
+        
+        Args:
+            worker_count: Number of dispatch worker threads
+            queue_size: Maximum number of pending submissions
+        """
+        self.worker_count = worker_count
+        self.work_queue = queue.Queue(maxsize=queue_size)
+        self.worker_threads = []
+        self.is_running = False
+        
+        # Metrics
+        self.stats_lock = threading.Lock()
+        self.submitted_count = 0
+        self.rejected_count = 0
+        self.started_count = 0
+        self.completed_count = 0
+        self.max_queue_depth = 0
+        self.total_wait_time = 0.0
+        self.max_wait_time = 0.0
+        
+    def start(self):
+        """Start the dispatch worker threads"""
+        if self.is_running:
+            return
+            
+        self.is_running = True
+        self.worker_threads = []
+        for index in range(self.worker_count):
+            worker_thread = threading.Thread(
+                target=self._process_work,
+                name=f"DispatchWorker-{index}",
+                daemon=True
+            )
+            worker_thread.start()
+            self.worker_threads.append(worker_thread)
+            
+        logger.info(f"Dispatch pool started with {self.worker_count} workers")
+        
+    def submit(self, func, *args):
+        """
+        Hand a call off to the dispatch workers without blocking
+        
+        Args:
+            func: Function to call
+            *args: Positional arguments for the function
+            
+        Returns:
+            bool: True if the call was queued, False if the pool is stopped or full
+        """
+        if not self.is_running:
+            return False
+            
+        try:
+            self.work_queue.put_nowait((func, args, time.monotonic()))
+        except queue.Full:
+            with self.stats_lock:
+                self.rejected_count += 1
+            logger.warning(f"Dispatch queue is full ({self.work_queue.maxsize}), rejecting {func.__name__}")
+            return False
+            
+        with self.stats_lock:
+            self.submitted_count += 1
+            self.max_queue_depth = max(self.max_queue_depth, self.work_queue.qsize())
+        return True
+        
+    def _process_work(self):
+        """Worker thread function that runs submitted calls"""
+        while self.is_running:
+            try:
+                work = self.work_queue.get(timeout=1.0)
+            except queue.Empty:
+                continue
+                
+            if work is None:
+                break
+                
+            func, args, submitted_at = work
+            wait_time = time.monotonic() - submitted_at
+            with self.stats_lock:
+                self.started_count += 1
+                self.total_wait_time += wait_time
+                self.max_wait_time = max(self.max_wait_time, wait_time)
+                
+            try:
+                func(*args)
+            except Exception as e:
+                logger.error(f"Error in dispatched call {func.__name__}: {e}")
+            finally:
+                with self.stats_lock:
+                    self.completed_count += 1
+                    
+    def get_stats(self):
+        """
+        Returns queue depth and wait time metrics
+        
+        Returns:
+            dict: Current and maximum queue depth, submission counters and
+                  average/maximum time (ms) submissions waited for a worker
+        """
+        with self.stats_lock:
+            started_count = self.started_count or 1
+            return {
+                "workers": self.worker_count,
+                "queue_depth": self.work_queue.qsize(),
+                "max_queue_depth": self.max_queue_depth,
+                "queue_capacity": self.work_queue.maxsize,
+                "submitted": self.submitted_count,
+                "rejected": self.rejected_count,
+                "completed": self.completed_count,
+                "avg_wait_ms": round(self.total_wait_time / started_count * 1000, 2),
+                "max_wait_ms": round(self.max_wait_time * 1000, 2),
+            }
+            
+    def stop(self):
+        """Stop the dispatch worker threads"""
+        if not self.is_running:
+            return
+            
+        self.is_running = False
+        for _ in self.worker_threads:
+            try:
+                self.work_queue.put_nowait(None)
+            except queue.Full:
+                break
+                
+        for worker_thread in self.worker_threads:
+            if worker_thread.is_alive():
+                worker_thread.join(timeout=2)
+                
+        logger.info("Dispatch pool stopped")
\ No newline at end of file
@@ -0,0 +1,339 @@
+# agent/core/command/subscription_manager.py
+import math
+import time
+import threading
+import agent.core.utils.logger as logger
+from agent.core.command.dispatch_pool import DispatchPool
+from agent.core.network.columnar import FORMAT_COLUMNAR, encode_value
+
+MAX_SUBSCRIPTIONS = 16 # Active subscriptions per agent
+MIN_SUBSCRIPTION_INTERVAL = 1 # Seconds
+MAX_SUBSCRIPTION_INTERVAL = 300 # Seconds
+TICK_SLACK = 0.05 # Subscriptions due within this many seconds are pushed in the same frame
+COLLECTOR_WORKERS = 4 # Collectors run in parallel, so a slow one does not delay the others
+BATCH_WAIT = 0.5 # Seconds the results of one tick wait for its slower collectors before being sent
+
+class Subscription:
+    """
+    One collector pushed periodically to the server
+    """
+    
+    def __init__(self, subscription_id, collector, interval, options, response_format, epoch):
+        """
+        Initialize the Subscription
+        
+        Args:
+            subscription_id: ID chosen by the server
+            collector: Name of the registered collector
+            interval: Seconds between two pushes
+            options: Collector options (fields, query, ...)
+            response_format: Optional response format of the pushed data
+            epoch: Connection the subscription belongs to
+        """
+        self.subscription_id = subscription_id
+        self.collector = collector
+        self.interval = interval
+        self.options = options
+        self.response_format = response_format
+        self.epoch = epoch
+        # Collector state kept between pushes (e.g. the version the server holds)
+        self.state = {}
+        self.seq = 0
+        self.next_due = 0.0
+        # True while a collector run is queued or running; due ticks are skipped meanwhile
+        self.running = False
+        self.schedule(time.monotonic())
+        
+    def schedule(self, now):
+        """Set the next push time to the next multiple of the interval, so equal intervals share ticks"""
+        self.next_due = (math.floor(now / self.interval) + 1) * self.interval
+
+class SubscriptionManager:
+    """
+    Pushes collector results to the server at the interval each subscription
+    asked for, until it is cancelled or the connection it was made on ends.
+    
+    A single ticker thread hands every subscription that is due to a small
+    collector pool and sends their results together as one
+    subscription_update frame, so several collectors on one agent cost one
+    frame per tick instead of one request/response pair each. Push times are
+    aligned to multiples of the interval, which puts subscriptions with the
+    same (or a multiple) interval into the same tick.
+    
+    A slow collector only delays its own subscription: results of a tick wait
+    at most BATCH_WAIT for it and are sent without it, and its own due ticks
+    are skipped until its current run has finished.
+    """
+    
+    def __init__(self, websocket, collectors):
+        """
+        Initialize the SubscriptionManager
+        
+        Args:
+            websocket: WebSocketConnection used to push the updates
+            collectors: Dict mapping collector names to functions called with
+                        (state, options) that return the data to push; state is
+                        a dict the collector may keep between pushes
+        """
+        self.websocket = websocket
+        self.collectors = collectors
+        self.subscriptions = {}
+        self.lock = threading.Lock()
+        self.wake_event = threading.Event()
+        self.ticker_thread = None
+        self.is_running = False
+        self.collector_pool = DispatchPool(COLLECTOR_WORKERS, MAX_SUBSCRIPTIONS)
+        
+        # Collector results waiting to be sent, and the runs not finished yet
+        self.ready_updates = []
+        self.outstanding = 0
+        # Time the ready results are sent even if collectors are still running
+        self.batch_deadline = None
+        
+        # Metrics
+        self.run_count = 0
+        self.frames_sent = 0
+        self.updates_sent = 0
+        self.collector_errors = 0
+        self.skipped_ticks = 0
+        self.total_run_time = 0.0
+        self.max_run_time = 0.0
+        
+    def start(self):
+        """Start the ticker thread"""
+        if self.is_running:
+            return
+            
+        self.is_running = True
+        self.collector_pool.start()
+        self.ticker_thread = threading.Thread(target=self._run, name="SubscriptionTicker", daemon=True)
+        self.ticker_thread.start()
+        logger.info("Subscription manager started")
+        
+    def _current_epoch(self):
+        """Returns an identifier of the current authenticated connection"""
+        return self.websocket.get_connection_stats()["ready_count"]
+        
+    def subscribe(self, subscription_id, collector, interval, options=None, response_format=None):
+        """
+        Start pushing a collector
+        
+        Subscribing again with an existing ID replaces that subscription.
+        
+        Args:
+            subscription_id: ID chosen by the server
+            collector: Name of a registered collector
+            interval: Seconds between two pushes
+            options: Collector options
+            response_format: Optional response format of the pushed data
+            
+        Returns:
+            tuple: (success, message)
+        """
+        if not subscription_id:
+            return False, "Subscription ID is required"
+        if collector not in self.collectors:
+            return False, f"Unknown collector: {collector}. Available: {', '.join(sorted(self.collectors))}"
+        if not isinstance(interval, (int, float)) or isinstance(interval, bool):
+            return False, "Interval must be a number of seconds"
+            
+        interval = min(max(float(interval), MIN_SUBSCRIPTION_INTERVAL), MAX_SUBSCRIPTION_INTERVAL)
+        with self.lock:
+            if subscription_id not in self.subscriptions and len(self.subscriptions) >= MAX_SUBSCRIPTIONS:
+                return False, f"Too many subscriptions (maximum {MAX_SUBSCRIPTIONS})"
+            self.subscriptions[subscription_id] = Subscription(
+                subscription_id, collector, interval, options or {}, response_format, self._current_epoch()
+            )
+            
+        self.wake_event.set()
+        logger.info(f"Subscribed {subscription_id} to {collector} every {interval}s")
+        return True, f"Subscribed to {collector} every {interval}s"
+        
+    def unsubscribe(self, subscription_id):
+        """
+        Stop pushing a subscription
+        
+        Args:
+            subscription_id: ID of the subscription
+            
+        Returns:
+            tuple: (success, message)
+        """
+        with self.lock:
+            subscription = self.subscriptions.pop(subscription_id, None)
+            
+        if subscription is None:
+            return False, f"Subscription {subscription_id} not found"
+            
+        logger.info(f"Unsubscribed {subscription_id} ({subscription.collector})")
+        return True, f"Unsubscribed from {subscription.collector}"
+        
+    def _drop_stale(self):
+        """Drop subscriptions made on an earlier connection; the server subscribes again after auth"""
+        epoch = self._current_epoch()
+        with self.lock:
+            stale = [sid for sid, subscription in self.subscriptions.items() if subscription.epoch != epoch]
+            for subscription_id in stale:
+                del self.subscriptions[subscription_id]
+                
+        if stale:
+            logger.info(f"Dropped {len(stale)} subscription(s) of a closed connection")
+            
+    def _run(self):
+        """Ticker thread function"""
+        while self.is_running:
+            if self.websocket.is_ready():
+                self._drop_stale()
+                
+            now = time.monotonic()
+            with self.lock:
+                next_due = min((subscription.next_due for subscription in self.subscriptions.values()), default=None)
+                flush = bool(self.ready_updates) and (
+                    self.outstanding == 0 or (self.batch_deadline is not None and now >= self.batch_deadline)
+                )
+                if self.ready_updates and self.batch_deadline is not None:
+                    next_due = self.batch_deadline if next_due is None else min(next_due, self.batch_deadline)
+                    
+            if flush:
+                self._flush()
+                continue
+                
+            # Sleep until the next subscription or batch is due, a collector run
+            # completes or the set of subscriptions changes
+            delay = 1.0 if next_due is None else next_due - now
+            if delay > 0:
+                self.wake_event.wait(min(delay, 1.0))
+                self.wake_event.clear()
+                continue
+                
+            self._tick()
+            
+    def _tick(self):
+        """Hand every due subscription to the collector pool"""
+        now = time.monotonic()
+        with self.lock:
+            due = [
+                subscription for subscription in self.subscriptions.values()
+                if subscription.next_due <= now + TICK_SLACK
+            ]
+            for subscription in due:
+                subscription.schedule(now + TICK_SLACK)
+                
+        if not self.websocket.is_ready():
+            # Nothing can be delivered; the collector state is kept for the next push
+            return
+            
+        for subscription in due:
+            with self.lock:
+                if subscription.running:
+                    # The previous run is still going; its result stands in for this tick
+                    self.skipped_ticks += 1
+                    logger.debug(f"Collector {subscription.collector} is still running, skipping a tick of {subscription.subscription_id}")
+                    continue
+                subscription.running = True
+                self.outstanding += 1
+                if self.batch_deadline is None:
+                    self.batch_deadline = now + BATCH_WAIT
+                    
+            if not self.collector_pool.submit(self._collect, subscription):
+                with self.lock:
+                    subscription.running = False
+                    self.outstanding -= 1
+                    
+    def _collect(self, subscription):
+        """Collector pool function: run one subscription's collector and keep its update"""
+        started = time.monotonic()
+        update = None
+        try:
+            data = self.collectors[subscription.collector](subscription.state, subscription.options)
+            update = {
+                "subscription_id": subscription.subscription_id,
+                "collector": subscription.collector,
+                "seq": subscription.seq,
+                "data": data,
+            }
+            if subscription.response_format == FORMAT_COLUMNAR:
+                # Encoded per update, since each subscription chooses its own format
+                update["data"] = encode_value(data)
+                update["format"] = FORMAT_COLUMNAR
+            subscription.seq += 1
+        except Exception as e:
+            logger.error(f"Collector {subscription.collector} failed for subscription {subscription.subscription_id}: {e}")
+            
+        elapsed = time.monotonic() - started
+        with self.lock:
+            subscription.running = False
+            self.outstanding -= 1
+            self.run_count += 1
+            self.total_run_time += elapsed
+            self.max_run_time = max(self.max_run_time, elapsed)
+            if update is None:
+                self.collector_errors += 1
+            else:
+                self.ready_updates.append((subscription, update))
+            if self.outstanding == 0:
+                self.wake_event.set()
+                
+    def _flush(self):
+        """Send the collected updates as one frame"""
+        with self.lock:
+            # Updates of subscriptions cancelled while their collector ran are dropped
+            ready = [
+                (subscription, update) for subscription, update in self.ready_updates
+                if self.subscriptions.get(subscription.subscription_id) is subscription
+            ]
+            self.ready_updates = []
+            # Results of runs still going are sent when they finish or after another wait
+            self.batch_deadline = time.monotonic() + BATCH_WAIT if self.outstanding else None
+            
+        if not ready:
+            return
+            
+        message = {"type": "subscription_update", "updates": [update for _, update in ready]}
+        if self.websocket.send(message):
+            self.frames_sent += 1
+            self.updates_sent += len(ready)
+        else:
+            # The server never sees these updates; send full data next time
+            for subscription, _ in ready:
+                subscription.state.clear()
+                
+    def get_stats(self):
+        """
+        Returns subscription counters
+        
+        Returns:
+            dict: Active subscriptions per collector, frames and updates sent,
+                  collector errors, skipped ticks and average/maximum
+                  collector run time (ms)
+        """
+        with self.lock:
+            active = {}
+            for subscription in self.subscriptions.values():
+                active[subscription.collector] = active.get(subscription.collector, 0) + 1
+            runs = self.run_count or 1
+            return {
+                "active": active,
+                "frames_sent": self.frames_sent,
+                "updates_sent": self.updates_sent,
+                "collector_errors": self.collector_errors,
+                "skipped_ticks": self.skipped_ticks,
+                "avg_collector_ms": round(self.total_run_time / runs * 1000, 2),
+                "max_collector_ms": round(self.max_run_time * 1000, 2),
+            }
+            
+    def stop(self):
+        """Stop the ticker thread and drop every subscription"""
+        if not self.is_running:
+            return
+            
+        self.is_running = False
+        self.wake_event.set()
+        if self.ticker_thread and self.ticker_thread.is_alive():
+            self.ticker_thread.join(timeout=2)
+        self.collector_pool.stop()
+        
+        with self.lock:
+            self.subscriptions.clear()
+            self.ready_updates = []
+        logger.info("Subscription manager stopped")
\ No newline at end of file
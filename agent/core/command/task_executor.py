@@ -2,40 +2,114 @@
 import queue
 import threading
 import agent.core.utils.logger as logger
+import agent.core.helper.process_handle as process_handle
+from agent.core.command.task_queue import (
+    Task, PriorityTaskQueue, DEFAULT_PRIORITY,
+    TASK_STATUS_COMPLETED, TASK_STATUS_FAILED, TASK_STATUS_CANCELLED, TASK_STATUS_TIMEOUT
+)
+
+# Lane names used by CommandDispatcher when registering commands
+LANE_CHOCO = "choco"            # Chocolatey operations, must run one at a time
+LANE_COLLECTOR = "collector"    # Read-only system collectors, safe to run in parallel
+LANE_IO = "io"                  # Network downloads and other I/O bound work
+DEFAULT_LANE = LANE_COLLECTOR
+
+# Number of worker threads per lane
+DEFAULT_LANES = {
+    LANE_CHOCO: 1,
+    LANE_COLLECTOR: 4,
+    LANE_IO: 2,
+}
+
+WATCHDOG_INTERVAL = 1.0 # Seconds between deadline checks
 
 class TaskExecutor:
     """
     Responsible for executing heavy or long-running tasks asynchronously
-    in a background thread to keep the main thread and UI responsive.
+    in background threads to keep the main thread and UI responsive.
+    
+    Tasks are routed to named lanes. Each lane has its own queue and its
+    own set of worker threads, so a slow task in one lane (for example a
+    Chocolatey install) never blocks tasks queued in another lane. Within a
+    lane, tasks are scheduled by priority class with aging.
+    
+    Tasks can be cancelled and can carry a deadline, counted from when they
+    start running. A watchdog thread reports expired tasks as timed out and
+    kills the child process tree they started, which also frees the worker
+    blocked on that process.
+    
+    Tasks queued with a coalesce key are shared: a duplicate request that
+    arrives while a task with the same key is queued or running attaches to
+    it, and the single result is reported once per waiting task ID.
     """
     
-    def __init__(self, completion_callback=None):
+    def __init__(self, completion_callback=None, lanes=None, start_callback=None):
         """
-        Initialize the TaskExecutor with a task queue and worker thread
+        Initialize the TaskExecutor with one task queue and worker pool per lane
         
         Args:
             completion_callback: Function to call when a task completes,
-                                 with signature (success, result, command_type, task_id)
+                                 with signature (success, result, command_type, task_id, status)
+            lanes: Optional dict mapping lane name to worker count,
+                   merged over DEFAULT_LANES
+            start_callback: Optional function to call when a task starts running,
+                            with signature (command_type, task_ids)
         """
-        self.task_queue = queue.Queue()
-        self.worker_thread = None
+        self.lanes = dict(DEFAULT_LANES)
+        if lanes:
+            for lane_name, worker_count in lanes.items():
+                try:
+                    self.lanes[lane_name] = max(1, int(worker_count))
+                except (TypeError, ValueError):
+                    logger.warning(f"Ignoring invalid worker count for lane '{lane_name}': {worker_count}")
+                    
+        self.task_queues = {lane_name: PriorityTaskQueue() for lane_name in self.lanes}
+        self.worker_threads = []
+        self.watchdog_thread = None
+        self.watchdog_stop = threading.Event()
         self.is_running = False
         self.completion_callback = completion_callback
+        self.start_callback = start_callback
+        
+        # Tasks that are queued or running, keyed by task ID and by coalesce key
+        self.active_tasks = {}
+        self.inflight_tasks = {}
+        self.active_tasks_lock = threading.Lock()
         
     def start(self):
-        """Start the task executor worker thread"""
-        if not self.worker_thread or not self.worker_thread.is_alive():
-            self.is_running = True
-            self.worker_thread = threading.Thread(
-                target=self._process_tasks,
-                daemon=True
-            )
-            self.worker_thread.start()
-            logger.info("Task executor worker thread started")
+        """Start the worker threads for every lane and the deadline watchdog"""
+        if any(thread.is_alive() for thread in self.worker_threads):
+            return
             
-    def queue_task(self, func, args=(), kwargs=None, command_type=None, task_id=None):
+        self.task_queues = {lane_name: PriorityTaskQueue() for lane_name in self.lanes}
+        self.is_running = True
+        self.worker_threads = []
+        
+        for lane_name, worker_count in self.lanes.items():
+            for index in range(worker_count):
+                worker_thread = threading.Thread(
+                    target=self._process_tasks,
+                    args=(lane_name,),
+                    name=f"TaskWorker-{lane_name}-{index}",
+                    daemon=True
+                )
+                worker_thread.start()
+                self.worker_threads.append(worker_thread)
+                
+        self.watchdog_stop.clear()
+        self.watchdog_thread = threading.Thread(
+            target=self._watchdog,
+            name="TaskWatchdog",
+            daemon=True
+        )
+        self.watchdog_thread.start()
+        
+        logger.info(f"Task executor started with lanes: {self.lanes}")
+        
+    def queue_task(self, func, args=(), kwargs=None, command_type=None, task_id=None, lane=None,
+                   priority=DEFAULT_PRIORITY, timeout=None, coalesce_key=None):
         """
-        Add a task to the execution queue
+        Add a task to the execution queue of a lane
         
         Args:
             func: Function to execute
@@ -43,44 +117,186 @@ class TaskExecutor:
             kwargs: Keyword arguments for the function (dict)
             command_type: Type of command this task is for (for reporting)
             task_id: ID of the task for tracking
-            
+            lane: Name of the lane to run the task in (defaults to DEFAULT_LANE)
+            priority: Priority class of the task (interactive, normal or background)
+            timeout: Optional deadline in seconds, counted from when the task starts
+                     running, after which it is reported as timed out
+            coalesce_key: Optional key; if a task with the same key is queued or running,
+                          this request attaches to it instead of queueing a new task
+                          
         Returns:
-            bool: True if task was queued successfully
+            bool: True if task was queued (or attached to an identical task) successfully
         """
         if not self.is_running:
             logger.error("Cannot queue task: TaskExecutor is not running")
             return False
             
-        if kwargs is None:
-            kwargs = {}
+        lane = lane or DEFAULT_LANE
+        if lane not in self.task_queues:
+            logger.warning(f"Unknown lane '{lane}' for {command_type}, using '{DEFAULT_LANE}'")
+            lane = DEFAULT_LANE
+            
+        with self.active_tasks_lock:
+            # Attach to an identical task that is still queued or running
+            if coalesce_key is not None and task_id:
+                inflight_task = self.inflight_tasks.get(coalesce_key)
+                if inflight_task and inflight_task.attach_task_id(task_id):
+                    self.active_tasks[task_id] = inflight_task
+                    logger.info(
+                        f"Coalesced task {task_id} ({command_type}) into in-flight task {inflight_task.task_id}"
+                    )
+                    return True
+                    
+            task = Task(func, args, kwargs, command_type, task_id, priority, timeout, coalesce_key)
+            if task_id:
+                self.active_tasks[task_id] = task
+            if coalesce_key is not None:
+                self.inflight_tasks[coalesce_key] = task
+                
+        logger.info(
+            f"Queueing task: {func.__name__} (Command: {command_type}, Task ID: {task_id}, "
+            f"Lane: {lane}, Priority: {task.priority}, Timeout: {timeout})"
+        )
+        self.task_queues[lane].put(task)
+        return True
+        
+    def cancel_task(self, task_id):
+        """
+        Cancel a queued or running task
+        
+        Queued tasks are dropped before they start. Running tasks are reported
+        as cancelled immediately and the child processes they started are killed.
+        If other requests are coalesced into the same task, only this request
+        is detached and reported as cancelled; the task keeps running.
+        
+        Args:
+            task_id: ID of the task to cancel
+            
+        Returns:
+            tuple[bool, str]: Whether the task was cancelled and a status message
+        """
+        with self.active_tasks_lock:
+            task = self.active_tasks.get(task_id)
+            
+        if not task:
+            return False, f"Task {task_id} is not queued or running"
+            
+        if task.detach_task_id(task_id):
+            with self.active_tasks_lock:
+                self.active_tasks.pop(task_id, None)
+            self._report(False, "Task was cancelled", task.command_type, task_id, TASK_STATUS_CANCELLED)
+            logger.info(f"Detached task {task_id} from shared task {task.task_id}")
+            return True, f"Task {task_id} cancelled"
+            
+        if not self._finish_task(task, TASK_STATUS_CANCELLED, False, "Task was cancelled"):
+            return False, f"Task {task_id} has already finished"
+            
+        self._kill_task_processes(task)
+        logger.info(f"Cancelled task {task_id} ({task.command_type})")
+        return True, f"Task {task_id} cancelled"
+        
+    def _finish_task(self, task, status, success, result):
+        """
+        Move a task to its final status and report it, unless it already finished
+        
+        Args:
+            task: Task instance
+            status: Final status of the task
+            success: Whether the task was successful
+            result: Result data or error message
+            
+        Returns:
+            bool: True if the task was finished and reported by this call
+        """
+        if not task.finish(status):
+            return False
+            
+        task_ids = task.get_task_ids()
+        with self.active_tasks_lock:
+            for waiting_task_id in task_ids:
+                if self.active_tasks.get(waiting_task_id) is task:
+                    del self.active_tasks[waiting_task_id]
+            if task.coalesce_key is not None and self.inflight_tasks.get(task.coalesce_key) is task:
+                del self.inflight_tasks[task.coalesce_key]
+                
+        # Fan the result out to every request waiting on this task
+        for waiting_task_id in task_ids or [None]:
+            self._report(success, result, task.command_type, waiting_task_id, status)
             
-        logger.info(f"Queueing task: {func.__name__} (Command: {command_type}, Task ID: {task_id})")
-        self.task_queue.put((func, args, kwargs, command_type, task_id))
         return True
         
-    def _process_tasks(self):
-        """Worker thread function to process tasks from the queue"""
-        logger.info("Task processing worker thread started")
+    def _report(self, success, result, command_type, task_id, status):
+        """Report a task result through the completion callback, if any"""
+        if self.completion_callback:
+            try:
+                self.completion_callback(success, result, command_type, task_id, status)
+            except Exception as callback_error:
+                logger.error(f"Error in task completion callback: {callback_error}")
+                
+    def _kill_task_processes(self, task):
+        """Kill every child process tree started by a task"""
+        for process in task.get_processes():
+            try:
+                process_handle.kill_process_tree(process.pid)
+            except Exception as e:
+                logger.error(f"Error killing process tree of PID {process.pid} for task {task.task_id}: {e}")
+                
+    def _watchdog(self):
+        """Watchdog thread function that times out tasks past their deadline"""
+        logger.info("Task watchdog thread started")
+        
+        while not self.watchdog_stop.wait(WATCHDOG_INTERVAL):
+            with self.active_tasks_lock:
+                expired = [task for task in self.active_tasks.values() if task.is_expired()]
+                
+            for task in expired:
+                logger.warning(f"Task {task.task_id} ({task.command_type}) exceeded its deadline")
+                if self._finish_task(task, TASK_STATUS_TIMEOUT, False, "Task exceeded its deadline"):
+                    self._kill_task_processes(task)
+                    
+        logger.info("Task watchdog thread stopped")
+        
+    def _process_tasks(self, lane_name):
+        """
+        Worker thread function to process tasks from a lane queue
+        
+        Args:
+            lane_name: Name of the lane this worker serves
+        """
+        logger.info(f"Task processing worker thread started (Lane: {lane_name})")
+        task_queue = self.task_queues[lane_name]
         
         while self.is_running:
             try:
                 # Get a task from the queue with timeout for checking is_running
                 try:
-                    task = self.task_queue.get(timeout=1.0)
+                    task = task_queue.get(timeout=1.0)
                 except queue.Empty:
                     continue
                     
-                # Check for stop signal
+                # Check for stop signal (queue closed)
                 if task is None:
-                    logger.info("Task processing worker thread received stop signal")
+                    logger.info(f"Task processing worker thread received stop signal (Lane: {lane_name})")
                     break
                     
+                # Skip tasks cancelled or timed out after being picked from the queue
+                if not task.mark_running():
+                    continue
+                    
                 # Unpack task data
-                func, args, kwargs, command_type, task_id = task
+                func, args, kwargs = task.func, task.args, task.kwargs
+                command_type, task_id = task.command_type, task.task_id
                 
-                logger.info(f"Processing task: {func.__name__} (Command: {command_type}, Task ID: {task_id})")
+                logger.info(f"Processing task: {func.__name__} (Command: {command_type}, Task ID: {task_id}, Lane: {lane_name})")
                 
-                # Execute the task
+                if self.start_callback:
+                    try:
+                        self.start_callback(command_type, task.get_task_ids())
+                    except Exception as callback_error:
+                        logger.error(f"Error in task start callback: {callback_error}")
+                        
+                # Execute the task, tracking any child process it starts
+                process_handle.set_current_task(task)
                 try:
                     result = func(*args, **kwargs)
                     success = True
@@ -89,43 +305,57 @@ class TaskExecutor:
                     logger.error(f"Error executing task {func.__name__}: {e}")
                     result = str(e)
                     success = False
+                finally:
+                    process_handle.set_current_task(None)
+                    
+                status = TASK_STATUS_COMPLETED if success else TASK_STATUS_FAILED
+                if not self._finish_task(task, status, success, result):
+                    logger.info(f"Discarding result of task {task_id}: already reported as {task.status}")
                     
-                # Report completion if callback exists
-                if self.completion_callback:
-                    try:
-                        self.completion_callback(success, result, command_type, task_id)
-                    except Exception as callback_error:
-                        logger.error(f"Error in task completion callback: {callback_error}")
-                        
-                # Mark task as done in the queue
-                self.task_queue.task_done()
-                
             except Exception as e:
                 logger.error(f"Unexpected error in task processing loop: {e}")
                 continue
                 
-        logger.info("Task processing worker thread stopped")
+        logger.info(f"Task processing worker thread stopped (Lane: {lane_name})")
+        
+    def get_stats(self):
+        """
+        Returns the current queue depth of every lane
+        
+        Returns:
+            dict: Mapping of lane name to worker count and queued task count
+        """
+        return {
+            lane_name: {
+                "workers": self.lanes[lane_name],
+                "queued": self.task_queues[lane_name].qsize(),
+            }
+            for lane_name in self.lanes
+        }
         
     def stop(self):
-        """Stop the task executor and its worker thread"""
+        """Stop the task executor, its worker threads and the watchdog"""
         if not self.is_running:
             logger.info("TaskExecutor already stopped")
             return
             
         logger.info("Stopping TaskExecutor...")
         self.is_running = False
+        self.watchdog_stop.set()
         
-        # Add a sentinel value to signal the worker to stop
-        self.task_queue.put(None)
-        
-        # Wait for worker thread to finish
-        if self.worker_thread and self.worker_thread.is_alive():
-            logger.info("Waiting for worker thread to finish...")
-            self.worker_thread.join(timeout=2)
+        # Close every lane queue to wake up and stop its workers
+        for task_queue in self.task_queues.values():
+            task_queue.close()
             
-            if self.worker_thread.is_alive():
-                logger.warning("Worker thread did not stop within timeout")
-            else:
-                logger.info("Worker thread stopped successfully")
+        # Wait for worker threads to finish
+        for worker_thread in self.worker_threads:
+            if worker_thread.is_alive():
+                worker_thread.join(timeout=2)
                 
+                if worker_thread.is_alive():
+                    logger.warning(f"Worker thread {worker_thread.name} did not stop within timeout")
+                    
+        if self.watchdog_thread and self.watchdog_thread.is_alive():
+            self.watchdog_thread.join(timeout=2)
+            
         logger.info("TaskExecutor stopped")
\ No newline at end of file
@@ -0,0 +1,193 @@
+# agent/core/command/task_journal.py
+import os
+import json
+import time
+import threading
+import agent.core.utils.logger as logger
+
+# Journal entry states
+JOURNAL_ACCEPTED = "accepted"
+JOURNAL_STARTED = "started"
+JOURNAL_FINISHED = "finished"
+
+COMPACT_THRESHOLD = 500 # Finished records after which the journal file is rewritten
+
+class TaskJournal:
+    """
+    Append-only, on-disk write-ahead journal of accepted async tasks.
+    
+    Every accepted, started and finished transition is appended as one JSON
+    line and flushed to the OS, so the journal survives os._exit() and
+    crashes without paying for an fsync per command. On startup the journal
+    is replayed to find the tasks that never finished, then compacted so it
+    only holds those tasks.
+    """
+    
+    def __init__(self, journal_path):
+        """
+        Initialize the TaskJournal
+        
+        Args:
+            journal_path: Path of the journal file
+        """
+        self.journal_path = journal_path
+        self.file = None
+        self.lock = threading.Lock()
+        # Unfinished tasks keyed by task ID, kept in memory for compaction
+        self.pending = {}
+        self.finished_since_compaction = 0
+        
+    def open(self):
+        """
+        Load the journal, compact it and open it for appending
+        
+        Returns:
+            list[dict]: Entries of tasks that were accepted but never finished,
+                        in the order they were accepted. Each entry has the keys
+                        task_id, command_type, params and state.
+        """
+        with self.lock:
+            self.pending = self._load()
+            try:
+                os.makedirs(os.path.dirname(self.journal_path), exist_ok=True)
+                self._compact()
+            except OSError as e:
+                logger.error(f"Failed to open task journal {self.journal_path}: {e}")
+                self.file = None
+                
+            unfinished = [dict(entry) for entry in self.pending.values()]
+            
+        if unfinished:
+            logger.info(f"Task journal has {len(unfinished)} unfinished task(s) from a previous run")
+        return unfinished
+        
+    def _load(self):
+        """
+        Read every record in the journal file
+        
+        Returns:
+            dict: Unfinished entries keyed by task ID, in acceptance order
+        """
+        pending = {}
+        if not os.path.exists(self.journal_path):
+            return pending
+            
+        try:
+            with open(self.journal_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        # A torn last line from a crash mid-write; skip it
+                        continue
+                        
+                    task_id = record.get("task_id")
+                    state = record.get("state")
+                    if state == JOURNAL_ACCEPTED:
+                        pending[task_id] = {
+                            "task_id": task_id,
+                            "command_type": record.get("command_type"),
+                            "params": record.get("params") or {},
+                            "state": JOURNAL_ACCEPTED,
+                        }
+                    elif state == JOURNAL_STARTED and task_id in pending:
+                        pending[task_id]["state"] = JOURNAL_STARTED
+                    elif state == JOURNAL_FINISHED:
+                        pending.pop(task_id, None)
+        except OSError as e:
+            logger.error(f"Failed to read task journal {self.journal_path}: {e}")
+            
+        return pending
+        
+    def _compact(self):
+        """Rewrite the journal with only the unfinished entries (caller holds the lock)"""
+        if self.file:
+            self.file.close()
+            self.file = None
+            
+        temp_path = f"{self.journal_path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            for entry in self.pending.values():
+                f.write(json.dumps({**entry, "state": JOURNAL_ACCEPTED, "ts": time.time()}) + "\n")
+                if entry["state"] == JOURNAL_STARTED:
+                    f.write(json.dumps({"task_id": entry["task_id"], "state": JOURNAL_STARTED, "ts": time.time()}) + "\n")
+        os.replace(temp_path, self.journal_path)
+        
+        self.file = open(self.journal_path, "a", encoding="utf-8")
+        self.finished_since_compaction = 0
+        
+    def _append(self, record):
+        """Append one record and flush it (caller holds the lock)"""
+        if not self.file:
+            return
+            
+        try:
+            record["ts"] = time.time()
+            self.file.write(json.dumps(record, default=str) + "\n")
+            self.file.flush()
+        except (OSError, ValueError) as e:
+            logger.error(f"Failed to write task journal record: {e}")
+            
+    def record_accepted(self, task_id, command_type, params):
+        """
+        Record that a task was accepted and queued
+        
+        Args:
+            task_id: ID of the task
+            command_type: Type of command
+            params: Command parameters needed to replay the task
+        """
+        if not task_id:
+            return
+            
+        with self.lock:
+            self.pending[task_id] = {
+                "task_id": task_id,
+                "command_type": command_type,
+                "params": params,
+                "state": JOURNAL_ACCEPTED,
+            }
+            self._append({"task_id": task_id, "state": JOURNAL_ACCEPTED, "command_type": command_type, "params": params})
+            
+    def record_started(self, task_id):
+        """
+        Record that a task started executing
+        
+        Args:
+            task_id: ID of the task
+        """
+        with self.lock:
+            if task_id not in self.pending:
+                return
+            self.pending[task_id]["state"] = JOURNAL_STARTED
+            self._append({"task_id": task_id, "state": JOURNAL_STARTED})
+            
+    def record_finished(self, task_id, status):
+        """
+        Record that a task reached a final status
+        
+        Args:
+            task_id: ID of the task
+            status: Final task status
+        """
+        with self.lock:
+            if self.pending.pop(task_id, None) is None:
+                return
+            self._append({"task_id": task_id, "state": JOURNAL_FINISHED, "status": status})
+            
+            self.finished_since_compaction += 1
+            if self.finished_since_compaction >= COMPACT_THRESHOLD:
+                try:
+                    self._compact()
+                except OSError as e:
+                    logger.error(f"Failed to compact task journal: {e}")
+                    
+    def close(self):
+        """Close the journal file"""
+        with self.lock:
+            if self.file:
+                try:
+                    self.file.close()
+                except OSError as e:
+                    logger.error(f"Failed to close task journal: {e}")
+                self.file = None
\ No newline at end of file
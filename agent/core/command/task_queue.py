@@ -0,0 +1,242 @@
+# agent/core/command/task_queue.py
+import heapq
+import itertools
+import queue
+import threading
+import time
+
+# Priority classes a task can be queued with
+PRIORITY_INTERACTIVE = "interactive"
+PRIORITY_NORMAL = "normal"
+PRIORITY_BACKGROUND = "background"
+DEFAULT_PRIORITY = PRIORITY_NORMAL
+
+# Aging offsets in seconds. A task is ordered by (enqueue time + offset), so a
+# background task that has waited longer than the offset difference is picked
+# before a newer interactive task and can never be starved.
+PRIORITY_OFFSETS = {
+    PRIORITY_INTERACTIVE: 0.0,
+    PRIORITY_NORMAL: 10.0,
+    PRIORITY_BACKGROUND: 60.0,
+}
+
+# Task lifecycle states, reported to the server as the task "status"
+TASK_STATUS_QUEUED = "queued"
+TASK_STATUS_RUNNING = "running"
+TASK_STATUS_COMPLETED = "completed"
+TASK_STATUS_FAILED = "failed"
+TASK_STATUS_CANCELLED = "cancelled"
+TASK_STATUS_TIMEOUT = "timeout"
+TASK_STATUS_INTERRUPTED = "interrupted" # Started before an agent restart and not replayed
+FINAL_TASK_STATUSES = (
+    TASK_STATUS_COMPLETED, TASK_STATUS_FAILED, TASK_STATUS_CANCELLED, TASK_STATUS_TIMEOUT,
+    TASK_STATUS_INTERRUPTED
+)
+
+class Task:
+    """
+    A unit of work queued in the TaskExecutor
+    """
+    
+    def __init__(self, func, args=(), kwargs=None, command_type=None, task_id=None, priority=DEFAULT_PRIORITY,
+                 timeout=None, coalesce_key=None):
+        """
+        Initialize a Task
+        
+        Args:
+            func: Function to execute
+            args: Positional arguments for the function (tuple)
+            kwargs: Keyword arguments for the function (dict)
+            command_type: Type of command this task is for (for reporting)
+            task_id: ID of the task for tracking
+            priority: One of the PRIORITY_* classes
+            timeout: Optional run time limit in seconds, counted from when the task
+                     starts running; time spent waiting in the queue does not count
+            coalesce_key: Optional key identifying identical requests that can share this task
+        """
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs or {}
+        self.command_type = command_type
+        self.task_id = task_id
+        self.coalesce_key = coalesce_key
+        # Every task ID waiting for this task's result (duplicates attach here)
+        self.task_ids = [task_id] if task_id else []
+        self.priority = priority if priority in PRIORITY_OFFSETS else DEFAULT_PRIORITY
+        self.enqueued_at = time.monotonic()
+        self.timeout = timeout
+        # Set when the task starts running, so a long queue does not time it out
+        self.started_at = None
+        self.deadline = None
+        self.status = TASK_STATUS_QUEUED
+        self.processes = []
+        self._lock = threading.Lock()
+        
+    def mark_running(self):
+        """
+        Move the task from queued to running and start its deadline clock
+        
+        Returns:
+            bool: False if the task was already finished (cancelled or timed out)
+        """
+        with self._lock:
+            if self.status != TASK_STATUS_QUEUED:
+                return False
+            self.status = TASK_STATUS_RUNNING
+            self.started_at = time.monotonic()
+            if self.timeout:
+                self.deadline = self.started_at + self.timeout
+            return True
+            
+    def finish(self, status):
+        """
+        Move the task to a final status. Only the first call wins, so a task
+        cancelled by the server is not reported again when its function returns.
+        
+        Args:
+            status: One of FINAL_TASK_STATUSES
+            
+        Returns:
+            bool: True if this call finished the task
+        """
+        with self._lock:
+            if self.status in FINAL_TASK_STATUSES:
+                return False
+            self.status = status
+            return True
+            
+    def is_finished(self):
+        """Returns True if the task has reached a final status"""
+        return self.status in FINAL_TASK_STATUSES
+        
+    def is_expired(self, now=None):
+        """Returns True if the task is running with a deadline and it has passed; queued tasks never expire"""
+        return self.deadline is not None and (now or time.monotonic()) >= self.deadline
+        
+    def attach_task_id(self, task_id):
+        """
+        Attach the task ID of a duplicate request so it receives this task's result
+        
+        Args:
+            task_id: ID of the duplicate request
+            
+        Returns:
+            bool: False if the task already finished and cannot be shared
+        """
+        with self._lock:
+            if self.status in FINAL_TASK_STATUSES:
+                return False
+            if task_id not in self.task_ids:
+                self.task_ids.append(task_id)
+            return True
+            
+    def detach_task_id(self, task_id):
+        """
+        Detach one waiting task ID, leaving the task running for the others
+        
+        Args:
+            task_id: ID of the request to detach
+            
+        Returns:
+            bool: True if the ID was detached and other IDs still wait on the task,
+                  False if it is the last one (the task itself should be cancelled)
+        """
+        with self._lock:
+            if self.status in FINAL_TASK_STATUSES or task_id not in self.task_ids or len(self.task_ids) < 2:
+                return False
+            self.task_ids.remove(task_id)
+            return True
+            
+    def get_task_ids(self):
+        """Returns a snapshot of the task IDs waiting for this task's result"""
+        with self._lock:
+            return list(self.task_ids)
+            
+    def attach_process(self, process):
+        """
+        Track a child process started by the task
+        
+        Args:
+            process: subprocess.Popen instance
+            
+        Returns:
+            bool: False if the task is already finished and the process should be killed
+        """
+        with self._lock:
+            if self.status in FINAL_TASK_STATUSES:
+                return False
+            self.processes.append(process)
+            return True
+            
+    def detach_process(self, process):
+        """Stop tracking a child process once it has exited"""
+        with self._lock:
+            if process in self.processes:
+                self.processes.remove(process)
+                
+    def get_processes(self):
+        """Returns a snapshot of the child processes started by the task"""
+        with self._lock:
+            return list(self.processes)
+
+class PriorityTaskQueue:
+    """
+    Thread-safe priority queue for tasks with aging.
+    
+    Tasks are ordered by their enqueue time plus the offset of their priority
+    class, with FIFO order between tasks of equal score. Tasks finished while
+    still queued (cancelled or timed out) are dropped when they reach the top.
+    """
+    
+    def __init__(self):
+        """Initialize an empty queue"""
+        self._heap = []
+        self._counter = itertools.count()
+        self._condition = threading.Condition()
+        self._closed = False
+        
+    def put(self, task):
+        """
+        Add a task to the queue
+        
+        Args:
+            task: Task instance to add
+        """
+        score = task.enqueued_at + PRIORITY_OFFSETS[task.priority]
+        with self._condition:
+            heapq.heappush(self._heap, (score, next(self._counter), task))
+            self._condition.notify()
+            
+    def get(self, timeout=None):
+        """
+        Remove and return the task with the lowest score
+        
+        Args:
+            timeout: Maximum seconds to wait for a task (None waits forever)
+            
+        Returns:
+            Task or None: The next task, or None if the queue has been closed
+            
+        Raises:
+            queue.Empty: If no task became available within the timeout
+        """
+        with self._condition:
+            while True:
+                if not self._condition.wait_for(lambda: self._heap or self._closed, timeout=timeout):
+                    raise queue.Empty
+                if self._closed:
+                    return None
+                task = heapq.heappop(self._heap)[2]
+                if not task.is_finished():
+                    return task
+                    
+    def qsize(self):
+        """Returns the number of queued tasks that are still pending"""
+        with self._condition:
+            return sum(1 for _, _, task in self._heap if not task.is_finished())
+            
+    def close(self):
+        """Close the queue and wake up every waiting consumer"""
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
\ No newline at end of file
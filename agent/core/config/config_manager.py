@@ -291,15 +291,10 @@ class ConfigManager:
             # Construct test URL
             test_url = f"{server_link}/api/agent/connect"
             
-            # Get system information for the connection test
-            import socket
-            import platform
-            try:
-                hostname = socket.gethostname()
-                ip_address = socket.gethostbyname(hostname)
-            except Exception as e:
-                logger.warning(f"Could not determine hostname or IP address: {e}")
-                hostname = platform.node() or "Unknown"
+            # Get system information for the connection test (cached by the inventory)
+            hostname, ip_address, mac_address = system_info.get_basic_info()
+            if ip_address == "Unknown":
+                logger.warning("Could not determine the IP address, using 127.0.0.1 instead")
                 ip_address = "127.0.0.1"  # Fallback to localhost
                 
             # Connection test payload
@@ -309,7 +304,7 @@ class ConfigManager:
                 "column_index": column_index, 
                 "hostname": hostname,
                 "ip_address": ip_address,
-                "mac_address": system_info.get_system_info().get("mac_address", "Unknown")
+                "mac_address": mac_address
             }
             
             # Set a timeout for the connection test
@@ -0,0 +1,314 @@
+# Standard library imports
+import json
+import operator
+import os
+import threading
+import time
+import uuid
+
+# Local imports
+from agent.core.utils.logger import info, warning, error
+import agent.core.helper.telemetry as telemetry
+
+# Constants
+MAX_RULES = 64
+MAX_DURATION = 24 * 60 * 60 # Seconds a condition may have to hold before firing
+COMPARATORS = {">": operator.gt, ">=": operator.ge, "<": operator.lt, "<=": operator.le}
+STATE_OK = "ok"
+STATE_PENDING = "pending" # Condition holds, waiting for the duration to pass
+STATE_FIRING = "firing"
+STATE_RESOLVED = "resolved" # Only used in alert messages: a firing rule cleared
+
+class _Rule:
+    """Compiled alert rule: the comparison functions and the state of one rule."""
+
+    __slots__ = (
+        "rule_id", "metric", "comparator", "threshold", "duration", "hysteresis",
+        "breached", "cleared", "clear_threshold", "column", "state", "since", "value",
+    )
+
+    def __init__(self, rule_id, metric, comparator, threshold, duration, hysteresis):
+        self.rule_id = rule_id
+        self.metric = metric
+        self.comparator = comparator
+        self.threshold = threshold
+        self.duration = duration
+        self.hysteresis = hysteresis
+        self.breached = COMPARATORS[comparator]
+        # A firing rule clears once the value is past the threshold by the hysteresis
+        self.clear_threshold = threshold - hysteresis if comparator in (">", ">=") else threshold + hysteresis
+        self.cleared = COMPARATORS[{">": "<=", ">=": "<", "<": ">=", "<=": ">"}[comparator]]
+        self.column = None # Index of the metric in the telemetry row, resolved per column set
+        self.state = STATE_OK
+        self.since = None # Time the current state began
+        self.value = None
+
+    def definition(self):
+        """Returns the rule as installed."""
+        return {
+            "id": self.rule_id,
+            "metric": self.metric,
+            "comparator": self.comparator,
+            "threshold": self.threshold,
+            "duration": self.duration,
+            "hysteresis": self.hysteresis,
+        }
+
+# Engine state
+_lock = threading.Lock()
+_rules = [] # Compiled rules, in installation order
+_columns = None # Telemetry column list the rule columns were resolved against
+_rules_path = None # File the installed rules are saved to
+_on_transition = None # Function called with the alert of every state transition
+_stats = {"evaluations": 0, "transitions": 0, "total_time": 0.0, "max_time": 0.0}
+
+def _number(spec, key, default=None, minimum=None, maximum=None):
+    """Reads a numeric rule field, raising ValueError when it is missing or invalid."""
+    value = spec.get(key, default)
+    if not isinstance(value, (int, float)) or isinstance(value, bool):
+        raise ValueError(f"'{key}' must be a number")
+    if (minimum is not None and value < minimum) or (maximum is not None and value > maximum):
+        raise ValueError(f"'{key}' must be between {minimum} and {maximum}")
+    return float(value)
+
+def compile_rule(spec):
+    """Validates a rule definition and compiles it.
+
+    Args:
+        spec (dict): {"id": str, "metric": telemetry column name,
+                      "comparator": ">", ">=", "<" or "<=", "threshold": number,
+                      "duration": seconds the condition must hold (default 0),
+                      "hysteresis": margin past the threshold to clear (default 0)}
+
+    Returns:
+        _Rule: The compiled rule, in the ok state.
+
+    Raises:
+        ValueError: If the definition is invalid.
+    """
+    if not isinstance(spec, dict):
+        raise ValueError("Rule must be an object")
+    rule_id = spec.get("id")
+    if not isinstance(rule_id, str) or not rule_id:
+        raise ValueError("'id' is required")
+    metric = spec.get("metric")
+    if not isinstance(metric, str) or not metric:
+        raise ValueError(f"Rule {rule_id}: 'metric' is required")
+    comparator = spec.get("comparator")
+    if comparator not in COMPARATORS:
+        raise ValueError(f"Rule {rule_id}: 'comparator' must be one of {', '.join(COMPARATORS)}")
+
+    try:
+        return _Rule(
+            rule_id,
+            metric,
+            comparator,
+            _number(spec, "threshold"),
+            _number(spec, "duration", 0, 0, MAX_DURATION),
+            _number(spec, "hysteresis", 0, 0),
+        )
+    except ValueError as e:
+        raise ValueError(f"Rule {rule_id}: {e}") from e
+
+def _save_rules():
+    """Writes the installed rules to the rules file (caller holds the lock)."""
+    if not _rules_path:
+        return
+    temp_path = f"{_rules_path}.tmp"
+    try:
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump([rule.definition() for rule in _rules], f)
+        os.replace(temp_path, _rules_path)
+    except OSError as e:
+        error(f"Failed to save alert rules: {e}")
+
+def _load_rules():
+    """Reads the rules saved by a previous run; invalid rules are skipped."""
+    if not _rules_path or not os.path.exists(_rules_path):
+        return []
+    try:
+        with open(_rules_path, "r", encoding="utf-8") as f:
+            specs = json.load(f)
+    except (OSError, json.JSONDecodeError) as e:
+        warning(f"Ignoring unreadable alert rules file: {e}")
+        return []
+
+    rules = []
+    for spec in specs if isinstance(specs, list) else []:
+        try:
+            rules.append(compile_rule(spec))
+        except ValueError as e:
+            warning(f"Skipping saved alert rule: {e}")
+    return rules[:MAX_RULES]
+
+def set_rules(specs):
+    """Replaces the installed rules.
+
+    Either every rule is installed or none is. A rule installed again with an
+    unchanged definition keeps its state, so re-sending the same set does not
+    fire its alerts again.
+
+    Args:
+        specs (list[dict]): Rule definitions (see compile_rule).
+
+    Returns:
+        tuple: (success, message)
+    """
+    global _rules, _columns
+
+    if not isinstance(specs, list):
+        return False, "'rules' must be a list"
+    if len(specs) > MAX_RULES:
+        return False, f"Too many rules (maximum {MAX_RULES})"
+
+    try:
+        compiled = [compile_rule(spec) for spec in specs]
+    except ValueError as e:
+        return False, str(e)
+    if len({rule.rule_id for rule in compiled}) != len(compiled):
+        return False, "Rule IDs must be unique"
+
+    with _lock:
+        existing = {rule.rule_id: rule for rule in _rules}
+        rules = []
+        for rule in compiled:
+            previous = existing.get(rule.rule_id)
+            rules.append(previous if previous and previous.definition() == rule.definition() else rule)
+        _rules = rules
+        _columns = None
+        _save_rules()
+
+    info(f"Installed {len(compiled)} alert rule(s).")
+    return True, f"Installed {len(compiled)} alert rule(s)"
+
+def get_rules():
+    """Returns the installed rules with their current state.
+
+    Returns:
+        list[dict]: Rule definitions plus "state", "since" and "value".
+    """
+    with _lock:
+        return [
+            dict(rule.definition(), state=rule.state, since=rule.since, value=rule.value)
+            for rule in _rules
+        ]
+
+def _resolve_columns(columns):
+    """Maps every rule to the index of its metric in the row (caller holds the lock)."""
+    global _columns
+
+    indexes = {column: index for index, column in enumerate(columns)}
+    for rule in _rules:
+        rule.column = indexes.get(rule.metric)
+        if rule.column is None:
+            warning(f"Alert rule {rule.rule_id}: metric {rule.metric} is not recorded.")
+    _columns = columns
+
+def _alert(rule, state, timestamp):
+    """Builds the alert message data of a firing or resolved transition."""
+    return {
+        "alert_id": str(uuid.uuid4()),
+        "rule_id": rule.rule_id,
+        "metric": rule.metric,
+        "state": state,
+        "value": round(rule.value, 2),
+        "comparator": rule.comparator,
+        "threshold": rule.threshold,
+        "timestamp": timestamp,
+    }
+
+def evaluate(timestamp, columns, row):
+    """Evaluates every rule against one telemetry sample (telemetry listener).
+
+    Each rule costs one comparison per sample: the metric's column index is
+    resolved once per column set and the comparison functions at compile time.
+
+    Args:
+        timestamp (float): Unix time of the sample.
+        columns (list[str]): Telemetry column names.
+        row (list[float]): One value per column.
+    """
+    started = time.perf_counter()
+    alerts = []
+    with _lock:
+        if columns is not _columns:
+            _resolve_columns(columns)
+
+        for rule in _rules:
+            if rule.column is None:
+                continue
+            value = rule.value = row[rule.column]
+
+            # Only firing and resolved transitions are reported; pending is internal
+            if rule.state == STATE_FIRING:
+                if rule.cleared(value, rule.clear_threshold):
+                    rule.state, rule.since = STATE_OK, None
+                    alerts.append(_alert(rule, STATE_RESOLVED, timestamp))
+            elif rule.breached(value, rule.threshold):
+                if rule.state == STATE_OK:
+                    rule.state, rule.since = STATE_PENDING, timestamp
+                if timestamp - rule.since >= rule.duration:
+                    rule.state, rule.since = STATE_FIRING, timestamp
+                    alerts.append(_alert(rule, STATE_FIRING, timestamp))
+            elif rule.state == STATE_PENDING:
+                rule.state, rule.since = STATE_OK, None
+
+        elapsed = time.perf_counter() - started
+        _stats["evaluations"] += 1
+        _stats["transitions"] += len(alerts)
+        _stats["total_time"] += elapsed
+        _stats["max_time"] = max(_stats["max_time"], elapsed)
+
+    for alert in alerts:
+        info(f"Alert {alert['rule_id']} {alert['state']}: {alert['metric']} = {alert['value']}")
+        if _on_transition:
+            try:
+                _on_transition(alert)
+            except Exception as e:
+                error(f"Failed to deliver alert {alert['rule_id']}: {e}")
+
+def start(rules_path, on_transition):
+    """Loads the saved rules and evaluates them on every telemetry sample.
+
+    Args:
+        rules_path (str): File the installed rules are saved to.
+        on_transition (callable): Called with the alert dict of every firing or
+            resolved transition.
+    """
+    global _rules, _columns, _rules_path, _on_transition
+
+    with _lock:
+        _rules_path = rules_path
+        _on_transition = on_transition
+        _rules = _load_rules()
+        _columns = None
+    telemetry.add_listener(evaluate)
+    info(f"Alert rules started with {len(_rules)} saved rule(s).")
+
+def stop():
+    """Stops evaluating the rules; the installed rules stay saved."""
+    global _on_transition
+
+    telemetry.remove_listener(evaluate)
+    _on_transition = None
+
+def get_stats():
+    """Returns engine counters.
+
+    Returns:
+        dict: Rule counts per state, evaluated samples, transitions and
+              average/maximum evaluation time (us).
+    """
+    with _lock:
+        states = {STATE_OK: 0, STATE_PENDING: 0, STATE_FIRING: 0}
+        for rule in _rules:
+            states[rule.state] += 1
+        evaluations = _stats["evaluations"] or 1
+        return {
+            "rules": len(_rules),
+            "states": states,
+            "evaluations": _stats["evaluations"],
+            "transitions": _stats["transitions"],
+            "avg_evaluation_us": round(_stats["total_time"] / evaluations * 1e6, 2),
+            "max_evaluation_us": round(_stats["max_time"] * 1e6, 2),
+        }
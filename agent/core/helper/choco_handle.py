@@ -1,6 +1,7 @@
 import subprocess
 import os
 from agent.core.utils.logger import info, error, warning # Assuming logger is setup
+import agent.core.helper.process_handle as process_handle
 
 # Constants
 CHOCO_INSTALL_ENV_VAR = "ChocolateyInstall"
@@ -113,10 +114,9 @@ def install_package(package_name, version=None):
 
     info(f"Running Chocolatey command: {' '.join(command)}")
     try:
-        # Use CREATE_NO_WINDOW to hide the console window
-        result = subprocess.run(
-            command, capture_output=True, text=True, check=False, creationflags=subprocess.CREATE_NO_WINDOW
-        )
+        # Use CREATE_NO_WINDOW to hide the console window. process_handle tracks the
+        # child so a task deadline or cancellation can kill the whole process tree.
+        result = process_handle.run(command, creationflags=subprocess.CREATE_NO_WINDOW)
 
         if result.returncode == 0:
             # Check stdout/stderr for potential warnings or non-fatal errors
@@ -160,9 +160,7 @@ def uninstall_package(package_name):
     info(f"Running Chocolatey command: {' '.join(command)}")
     try:
         # Use CREATE_NO_WINDOW
-        result = subprocess.run(
-            command, capture_output=True, text=True, check=False, creationflags=subprocess.CREATE_NO_WINDOW
-        )
+        result = process_handle.run(command, creationflags=subprocess.CREATE_NO_WINDOW)
 
         # Chocolatey uninstall might return 0 even if the package wasn't installed
         # or if there were non-fatal issues. Check output carefully.
@@ -215,9 +213,7 @@ def list_installed_packages():
     info(f"Running Chocolatey command: {' '.join(command)}")
     try:
         # Use CREATE_NO_WINDOW
-        result = subprocess.run(
-            command, capture_output=True, text=True, check=False, creationflags=subprocess.CREATE_NO_WINDOW
-        )
+        result = process_handle.run(command, creationflags=subprocess.CREATE_NO_WINDOW)
 
         if result.returncode == 0:
             packages = []
@@ -0,0 +1,147 @@
+# Standard library imports
+import socket
+import ipaddress
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, Future, TimeoutError
+
+# Local imports
+from agent.core.utils.logger import info, warning
+
+# Constants
+DNS_RESOLVER_WORKERS = 8 # Threads shared by all reverse DNS lookups
+DNS_CACHE_SIZE = 4096 # Maximum number of cached IP addresses
+DNS_POSITIVE_TTL = 600 # Seconds a resolved hostname stays cached
+DNS_NEGATIVE_TTL = 120 # Seconds a failed lookup stays cached
+
+# Shared resolver state
+_lock = threading.Lock()
+_executor = None
+_cache = OrderedDict() # ip -> (hostname or None, expires_at), in LRU order
+_inflight = {} # ip -> Future of the running lookup
+_stats = {"hits": 0, "negative_hits": 0, "misses": 0, "coalesced": 0, "failures": 0}
+
+def is_private_address(ip):
+    """Checks whether an IP address is not publicly routable.
+
+    Covers private, loopback, link-local, shared, reserved and multicast ranges
+    for both IPv4 and IPv6 (e.g. 172.16.0.0/12 but not the rest of 172.x).
+
+    Args:
+        ip (str): The IP address to check.
+
+    Returns:
+        bool: True if the address is not global or cannot be parsed.
+    """
+    try:
+        address = ipaddress.ip_address(ip)
+    except ValueError:
+        return True
+    if getattr(address, "ipv4_mapped", None):
+        address = address.ipv4_mapped
+    return not address.is_global
+
+def _get_executor():
+    """Returns the shared lookup pool, creating it on first use (caller holds the lock)."""
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=DNS_RESOLVER_WORKERS, thread_name_prefix="DnsResolver")
+    return _executor
+
+def _gethostbyaddr(ip):
+    """Runs the blocking reverse lookup and maps DNS failures to None."""
+    try:
+        hostname, _, _ = socket.gethostbyaddr(ip)
+        return hostname
+    except (socket.herror, socket.gaierror, OSError):
+        return None
+
+def _on_lookup_done(ip, future):
+    """Caches the result of a finished lookup and releases its in-flight slot."""
+    try:
+        hostname = future.result()
+    except Exception as e:
+        warning(f"Unexpected error resolving hostname for {ip}: {e}")
+        hostname = None
+
+    ttl = DNS_POSITIVE_TTL if hostname else DNS_NEGATIVE_TTL
+    with _lock:
+        _inflight.pop(ip, None)
+        if not hostname:
+            _stats["failures"] += 1
+        _cache[ip] = (hostname, time.monotonic() + ttl)
+        _cache.move_to_end(ip)
+        while len(_cache) > DNS_CACHE_SIZE:
+            _cache.popitem(last=False)
+
+def resolve(ip):
+    """Starts (or joins) a reverse DNS lookup for an IP address.
+
+    Cached answers, including cached failures, are returned as an already completed
+    future. Concurrent requests for the same IP share one lookup. A lookup keeps
+    running after a caller stops waiting for it, so its answer is cached for the
+    next request.
+
+    Args:
+        ip (str): The IP address to look up.
+
+    Returns:
+        concurrent.futures.Future: Resolves to the hostname (str) or None.
+    """
+    with _lock:
+        cached = _cache.get(ip)
+        if cached is not None:
+            hostname, expires_at = cached
+            if expires_at > time.monotonic():
+                _cache.move_to_end(ip)
+                _stats["hits" if hostname else "negative_hits"] += 1
+                future = Future()
+                future.set_result(hostname)
+                return future
+            del _cache[ip]
+
+        future = _inflight.get(ip)
+        if future is not None:
+            _stats["coalesced"] += 1
+            return future
+
+        _stats["misses"] += 1
+        future = _get_executor().submit(_gethostbyaddr, ip)
+        _inflight[ip] = future
+
+    future.add_done_callback(lambda done: _on_lookup_done(ip, done))
+    return future
+
+def lookup(ip, timeout):
+    """Resolves the hostname of an IP address, waiting at most `timeout` seconds.
+
+    Args:
+        ip (str): The IP address to look up.
+        timeout (float): Maximum seconds to wait for an uncached answer.
+
+    Returns:
+        str or None: The resolved hostname, or None if lookup fails or times out.
+    """
+    try:
+        return resolve(ip).result(timeout=timeout)
+    except TimeoutError:
+        return None
+
+def get_stats():
+    """Returns cache and lookup counters of the shared resolver.
+
+    Returns:
+        dict: Cache size, in-flight lookups and hit/miss/coalesced/failure counters.
+    """
+    with _lock:
+        return {"cache_size": len(_cache), "inflight": len(_inflight), **_stats}
+
+def shutdown():
+    """Stops the shared lookup pool without waiting for running lookups."""
+    global _executor
+    with _lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=False)
+        info("Reverse DNS resolver stopped.")
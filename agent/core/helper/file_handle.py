@@ -161,32 +161,47 @@ def remove_file(file_name):
         error(f"Unexpected error removing file '{safe_file_name}': {e}")
         return False, f"An unexpected error occurred during file removal: {e}"
 
-def get_files():
-    """Lists the names of all files present in the managed files directory.
+def iter_files():
+    """Yields the files present in the managed files directory, one at a time.
 
-    Returns:
-        list[str]: A list of file names found in the directory. Returns an empty list
-                   if the directory doesn't exist or an error occurs.
+    Yields:
+        dict: One entry per file with the keys name, size (bytes) and modified
+              (POSIX timestamp). Nothing is yielded if the directory doesn't exist
+              or an error occurs.
     """
     if not os.path.exists(BASE_DOWNLOAD_DIR):
         info(f"Managed files directory does not exist: {BASE_DOWNLOAD_DIR}")
-        return [] # Directory not found, return empty list
+        return # Directory not found, nothing to list
     if not os.path.isdir(BASE_DOWNLOAD_DIR):
         error(f"Expected directory but found file at path: {BASE_DOWNLOAD_DIR}")
-        return [] # Path exists but is not a directory
+        return # Path exists but is not a directory
 
-    files = []
+    count = 0
     try:
         info(f"Listing files in directory: {BASE_DOWNLOAD_DIR}")
         # Use os.scandir for potentially better performance on many files
-        for entry in os.scandir(BASE_DOWNLOAD_DIR):
-            if entry.is_file():
-                files.append(entry.name)
-        info(f"Found {len(files)} files.")
-        return files
+        with os.scandir(BASE_DOWNLOAD_DIR) as entries:
+            for entry in entries:
+                if not entry.is_file():
+                    continue
+                try:
+                    stat = entry.stat()
+                    size, modified = stat.st_size, stat.st_mtime
+                except OSError:
+                    size, modified = None, None
+                count += 1
+                yield {"name": entry.name, "size": size, "modified": modified}
+        info(f"Found {count} files.")
     except OSError as e:
         error(f"OS error listing files in '{BASE_DOWNLOAD_DIR}': {e}")
-        return [] # Return empty list on error
     except Exception as e:
         error(f"Unexpected error listing files in '{BASE_DOWNLOAD_DIR}': {e}")
-        return []
+
+def get_files():
+    """Lists the names of all files present in the managed files directory.
+
+    Returns:
+        list[str]: A list of file names found in the directory. Returns an empty list
+                   if the directory doesn't exist or an error occurs.
+    """
+    return [entry["name"] for entry in iter_files()]
@@ -0,0 +1,299 @@
+# Standard library imports
+import hashlib
+import json
+import platform
+import socket
+import threading
+import time
+import uuid
+
+# Third-party library imports
+import psutil
+
+# Local imports
+from agent.core.utils.logger import info, warning, error
+
+try:
+    import winreg
+except ImportError:
+    winreg = None
+
+# Constants
+STATIC_CHECK_INTERVAL = 60 # Seconds between two checks for hardware or network changes
+ROUTE_PROBE_ADDRESS = ("8.8.8.8", 80) # Only used to pick the outgoing interface; nothing is sent
+CPU_REGISTRY_KEY = r"HARDWARE\DESCRIPTION\System\CentralProcessor\0"
+LINK_FAMILY = getattr(psutil, "AF_LINK", -1)
+
+# Cache state
+_lock = threading.Lock()
+_static = None # Static inventory of the last build
+_fingerprint = None # Fingerprint the static inventory was built for
+_last_check = 0.0 # time.monotonic() of the last change check
+_stats = {"builds": 0, "checks": 0, "hits": 0, "last_build_ms": 0.0}
+
+def _read_signature():
+    """Reads the cheap facts whose change invalidates the static inventory.
+
+    Returns:
+        tuple: (signature dict, NIC addresses, partitions) so a rebuild can
+               reuse the readings.
+    """
+    addresses = psutil.net_if_addrs()
+    partitions = psutil.disk_partitions(all=False)
+    signature = {
+        "hostname": socket.gethostname(),
+        "cpus": psutil.cpu_count(logical=True),
+        "memory": psutil.virtual_memory().total,
+        "nics": sorted(
+            (name, sorted(address.address for address in nic_addresses))
+            for name, nic_addresses in addresses.items()
+        ),
+        "partitions": sorted((part.device, part.mountpoint, part.fstype) for part in partitions),
+    }
+    return signature, addresses, partitions
+
+def _hash_signature(signature):
+    """Returns a short stable hash of a signature."""
+    return hashlib.sha1(json.dumps(signature, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+
+def _get_cpu_model():
+    """Returns the CPU model name, from the registry on Windows."""
+    if winreg:
+        try:
+            with winreg.OpenKey(winreg.HKEY_LOCAL_MACHINE, CPU_REGISTRY_KEY) as key:
+                return winreg.QueryValueEx(key, "ProcessorNameString")[0].strip()
+        except OSError as e:
+            warning(f"Could not read the CPU model from the registry: {e}")
+    return platform.processor() or platform.machine() or "Unknown"
+
+def _get_route_address():
+    """Returns the local IPv4 address of the default route, or None without one."""
+    probe = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    try:
+        # Connecting a UDP socket only selects a route; no packet is sent
+        probe.connect(ROUTE_PROBE_ADDRESS)
+        return probe.getsockname()[0]
+    except OSError:
+        return None
+    finally:
+        probe.close()
+
+def _format_mac(address):
+    """Normalizes a MAC address to lower-case colon-separated form."""
+    return address.replace("-", ":").lower()
+
+def _build_nics(addresses):
+    """Builds the NIC list and picks the primary NIC."""
+    stats = psutil.net_if_stats()
+    route_address = _get_route_address()
+
+    nics = []
+    primary = None
+    for name, nic_addresses in addresses.items():
+        nic = {"name": name, "mac_address": None, "ipv4": [], "ipv6": []}
+        for address in nic_addresses:
+            if address.family == LINK_FAMILY:
+                nic["mac_address"] = _format_mac(address.address)
+            elif address.family == socket.AF_INET:
+                nic["ipv4"].append({"address": address.address, "netmask": address.netmask})
+            elif address.family == socket.AF_INET6:
+                nic["ipv6"].append(address.address.split("%")[0])
+
+        nic_stats = stats.get(name)
+        nic["speed_mbps"] = nic_stats.speed if nic_stats else None
+        nic["mtu"] = nic_stats.mtu if nic_stats else None
+        if any(entry["address"].startswith("127.") for entry in nic["ipv4"]):
+            continue
+        nics.append(nic)
+
+        # The NIC of the default route, else the first NIC that is up with an IPv4 address
+        ipv4 = [entry["address"] for entry in nic["ipv4"]]
+        if route_address and route_address in ipv4:
+            primary = nic
+        elif primary is None and ipv4 and nic_stats and nic_stats.isup:
+            primary = nic
+
+    return nics, primary
+
+def _build_static(addresses, partitions):
+    """Collects the facts that only change with the hardware, the OS or the network."""
+    hostname = socket.gethostname() or platform.node() or "Unknown"
+    nics, primary = _build_nics(addresses)
+
+    ip_address = primary["ipv4"][0]["address"] if primary and primary["ipv4"] else None
+    if not ip_address:
+        try:
+            ip_address = socket.gethostbyname(hostname)
+        except socket.gaierror:
+            warning(f"Could not resolve hostname '{hostname}' to an IP address.")
+            ip_address = "Unknown"
+
+    try:
+        physical_disks = sorted(psutil.disk_io_counters(perdisk=True) or {})
+    except Exception as e:
+        warning(f"Could not list physical disks: {e}")
+        physical_disks = []
+
+    win_release, win_version, _, _ = platform.win32_ver()
+    return {
+        "hostname": hostname,
+        "ip_address": ip_address,
+        "mac_address": (primary and primary["mac_address"]) or "Unknown",
+        "os": {
+            "system": platform.system(),
+            "release": win_release or platform.release(),
+            "version": win_version or platform.version(),
+            "edition": platform.win32_edition() if hasattr(platform, "win32_edition") and win_release else None,
+            "architecture": platform.machine(),
+            "boot_time": psutil.boot_time(),
+        },
+        "cpu": {
+            "model": _get_cpu_model(),
+            "physical_cores": psutil.cpu_count(logical=False),
+            "logical_cores": psutil.cpu_count(logical=True),
+        },
+        "memory": {"total_bytes": psutil.virtual_memory().total},
+        "disks": physical_disks,
+        "partitions": [
+            {"device": part.device, "mountpoint": part.mountpoint, "fstype": part.fstype}
+            for part in partitions
+            if part.fstype and "cdrom" not in part.opts
+        ],
+        "nics": nics,
+        "primary_nic": primary["name"] if primary else None,
+    }
+
+def get_static(force=False):
+    """Returns the static inventory, rebuilt only when the hardware or network changed.
+
+    The cache is checked at most every STATIC_CHECK_INTERVAL seconds by
+    comparing a fingerprint of the hostname, CPU count, total memory, NIC
+    addresses and partitions; the inventory is rebuilt when it differs.
+
+    Args:
+        force (bool): Rebuild without checking the fingerprint.
+
+    Returns:
+        tuple[dict, str]: The static inventory and its fingerprint.
+    """
+    global _static, _fingerprint, _last_check
+
+    with _lock:
+        now = time.monotonic()
+        if _static is not None and not force and now - _last_check < STATIC_CHECK_INTERVAL:
+            _stats["hits"] += 1
+            return _static, _fingerprint
+
+        _last_check = now
+        _stats["checks"] += 1
+        signature, addresses, partitions = _read_signature()
+        fingerprint = _hash_signature(signature)
+        if _static is not None and not force and fingerprint == _fingerprint:
+            return _static, _fingerprint
+
+        started = time.perf_counter()
+        static = _build_static(addresses, partitions)
+        _stats["builds"] += 1
+        _stats["last_build_ms"] = round((time.perf_counter() - started) * 1000, 2)
+        if _fingerprint is not None and fingerprint != _fingerprint:
+            info(f"Hardware or network change detected, inventory rebuilt (fingerprint {fingerprint}).")
+        else:
+            info(f"Static inventory collected in {_stats['last_build_ms']} ms.")
+        _static, _fingerprint = static, fingerprint
+        return _static, _fingerprint
+
+def get_dynamic(static):
+    """Reads the volatile figures: uptime, memory, swap, partition usage and link state.
+
+    Args:
+        static (dict): Static inventory whose partitions and NICs are reported.
+
+    Returns:
+        dict: Current figures.
+    """
+    memory = psutil.virtual_memory()
+    swap = psutil.swap_memory()
+
+    usage = []
+    for part in static["partitions"]:
+        try:
+            disk = psutil.disk_usage(part["mountpoint"])
+        except OSError:
+            # Removable drive without media, or the partition went away
+            continue
+        usage.append({
+            "mountpoint": part["mountpoint"],
+            "total_bytes": disk.total,
+            "free_bytes": disk.free,
+            "percent": disk.percent,
+        })
+
+    stats = psutil.net_if_stats()
+    return {
+        "uptime_seconds": int(time.time() - static["os"]["boot_time"]),
+        "memory": {"available_bytes": memory.available, "used_bytes": memory.used, "percent": memory.percent},
+        "swap": {"total_bytes": swap.total, "used_bytes": swap.used, "percent": swap.percent},
+        "partitions": usage,
+        "nics": {nic["name"]: bool(stats.get(nic["name"]) and stats[nic["name"]].isup) for nic in static["nics"]},
+    }
+
+def get_inventory(refresh=False):
+    """Returns the full inventory: the cached static facts and fresh volatile figures.
+
+    Args:
+        refresh (bool): Rebuild the static inventory instead of using the cache.
+
+    Returns:
+        dict: {"fingerprint": str, "static": dict, "dynamic": dict, "collected_at": unix time}
+    """
+    static, fingerprint = get_static(refresh)
+    try:
+        dynamic = get_dynamic(static)
+    except Exception as e:
+        error(f"Failed to read volatile inventory figures: {e}")
+        dynamic = {}
+    return {"fingerprint": fingerprint, "static": static, "dynamic": dynamic, "collected_at": time.time()}
+
+def format_identity_mac(mac_int):
+    """Formats a uuid.getnode() value as the MAC address agents register with.
+
+    Registered computers are matched by this exact string, so it keeps the
+    format agents have always sent, including its nibble-swapped digits
+    (0x1a2b3c4d5e6f -> "a1:b2:c3:d4:e5:f6"). The real MAC addresses are
+    reported in the inventory NICs.
+
+    Args:
+        mac_int (int): 48-bit node value from uuid.getnode().
+
+    Returns:
+        str: The identity MAC string, or "Locally Administered".
+    """
+    if (mac_int >> 40) % 2:
+        return "Locally Administered"
+    return ":".join(f"{(mac_int >> elements) & 0xFF:02x}" for elements in range(0, 8 * 6, 8))[::-1]
+
+def get_identity():
+    """Returns the hostname, primary IPv4 address and registration MAC address.
+
+    The hostname and address come from the cached inventory; the MAC address
+    is the uuid.getnode() value in the registration format (see
+    format_identity_mac), which uuid caches after the first call.
+
+    Returns:
+        tuple[str, str, str]: (hostname, ip_address, mac_address)
+    """
+    static, _ = get_static()
+    mac_address = format_identity_mac(uuid.getnode())
+    if mac_address == "Locally Administered":
+        warning("MAC address appears to be locally administered.")
+    return static["hostname"], static["ip_address"], mac_address
+
+def get_stats():
+    """Returns cache counters.
+
+    Returns:
+        dict: Static builds, change checks, cache hits, last build time (ms)
+              and the current fingerprint.
+    """
+    with _lock:
+        return dict(_stats, fingerprint=_fingerprint)
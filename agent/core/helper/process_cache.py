@@ -0,0 +1,90 @@
+# Standard library imports
+import threading
+from collections import OrderedDict
+
+# Third-party library imports
+import psutil
+
+# Local imports
+from agent.core.utils.logger import info
+
+# Constants
+PROCESS_CACHE_SIZE = 4096 # Maximum number of processes whose metadata is cached
+CACHED_ATTRS = ('name', 'exe', 'username', 'cmdline') # Attributes that never change for a running process
+
+# Shared metadata cache: (pid, create_time) -> {attribute: value}, in LRU order
+_cache = OrderedDict()
+_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+def get_attributes(proc, create_time, attrs=CACHED_ATTRS):
+    """Returns stable attributes of a process, reading each one from psutil at most once.
+
+    Entries are keyed by (pid, create_time), so a reused PID never sees the metadata
+    of the process that previously owned it. Attributes are fetched lazily, only
+    when first requested. Like psutil's as_dict(), attributes that cannot be read
+    because of access restrictions are returned as None.
+
+    Args:
+        proc (psutil.Process): The process to read.
+        create_time (float): The process creation time, from proc.create_time().
+        attrs (iterable[str]): Attributes to return, a subset of CACHED_ATTRS.
+
+    Returns:
+        dict: The requested attributes.
+
+    Raises:
+        psutil.NoSuchProcess: If the process exited before a missing attribute was read.
+    """
+    key = (proc.pid, create_time)
+    with _lock:
+        entry = _cache.get(key)
+        if entry is not None:
+            _cache.move_to_end(key)
+            missing = [attr for attr in attrs if attr not in entry]
+            if not missing:
+                _stats["hits"] += 1
+                return {attr: entry[attr] for attr in attrs}
+        else:
+            missing = list(attrs)
+        _stats["misses"] += 1
+
+    # Read outside the lock: username and exe lookups can be slow on Windows
+    values = {}
+    for attr in missing:
+        try:
+            value = getattr(proc, attr)()
+        except psutil.AccessDenied:
+            value = None
+        values[attr] = value
+
+    with _lock:
+        entry = _cache.setdefault(key, {})
+        entry.update(values)
+        _cache.move_to_end(key)
+        while len(_cache) > PROCESS_CACHE_SIZE:
+            _cache.popitem(last=False)
+            _stats["evictions"] += 1
+        return {attr: entry.get(attr) for attr in attrs}
+
+def prune(live_keys):
+    """Drops cached entries of processes that are no longer running.
+
+    Args:
+        live_keys (set[tuple]): (pid, create_time) of every running process.
+    """
+    with _lock:
+        stale_keys = [key for key in _cache if key not in live_keys]
+        for key in stale_keys:
+            del _cache[key]
+    if stale_keys:
+        info(f"Process metadata cache pruned {len(stale_keys)} exited processes.")
+
+def get_stats():
+    """Returns size and hit/miss counters of the process metadata cache.
+
+    Returns:
+        dict: Cache size plus hit, miss and eviction counters.
+    """
+    with _lock:
+        return {"size": len(_cache), **_stats}
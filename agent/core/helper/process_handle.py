@@ -0,0 +1,91 @@
+import subprocess
+import threading
+
+# Third-party library imports
+import psutil
+
+# Local imports
+from agent.core.utils.logger import info, warning
+
+# Constants
+KILL_WAIT_TIMEOUT = 5 # Seconds to wait for killed processes to exit
+
+# Task currently executed by the calling worker thread (set by TaskExecutor)
+_context = threading.local()
+
+def set_current_task(task):
+    """Binds a task to the calling thread so that child processes it starts can be tracked.
+
+    Args:
+        task: The task being executed by this thread, or None to clear the binding.
+              The task must provide attach_process(process) and detach_process(process).
+    """
+    _context.task = task
+
+def get_current_task():
+    """Returns the task bound to the calling thread.
+
+    Returns:
+        object or None: The bound task, or None if the thread is not running a task.
+    """
+    return getattr(_context, "task", None)
+
+def run(command, **popen_kwargs):
+    """Runs a command to completion, like subprocess.run(capture_output=True, text=True).
+
+    The child process is attached to the task bound to the calling thread, so the
+    task watchdog can kill the whole process tree when the task is cancelled or
+    exceeds its deadline.
+
+    Args:
+        command (list[str]): The command and its arguments.
+        **popen_kwargs: Extra keyword arguments passed to subprocess.Popen.
+
+    Returns:
+        subprocess.CompletedProcess: The finished process with captured stdout/stderr.
+    """
+    task = get_current_task()
+    process = subprocess.Popen(
+        command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, **popen_kwargs
+    )
+
+    if task is not None and not task.attach_process(process):
+        # Task was cancelled or timed out before the process could be tracked
+        kill_process_tree(process.pid)
+
+    try:
+        stdout, stderr = process.communicate()
+    finally:
+        if task is not None:
+            task.detach_process(process)
+
+    return subprocess.CompletedProcess(command, process.returncode, stdout, stderr)
+
+def kill_process_tree(pid):
+    """Kills a process and all of its descendants.
+
+    Args:
+        pid (int): The PID of the root process.
+
+    Returns:
+        int: The number of processes that were signalled.
+    """
+    try:
+        root = psutil.Process(pid)
+        processes = root.children(recursive=True) + [root]
+    except psutil.NoSuchProcess:
+        return 0
+
+    for proc in processes:
+        try:
+            proc.kill()
+        except psutil.NoSuchProcess:
+            continue
+        except psutil.AccessDenied:
+            warning(f"Access denied while killing process PID {proc.pid}")
+
+    _, alive = psutil.wait_procs(processes, timeout=KILL_WAIT_TIMEOUT)
+    if alive:
+        warning(f"{len(alive)} process(es) still alive after killing process tree of PID {pid}")
+    info(f"Killed process tree of PID {pid} ({len(processes)} process(es))")
+    return len(processes)
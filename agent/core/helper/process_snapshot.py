@@ -0,0 +1,238 @@
+# Standard library imports
+import time
+import json
+import threading
+from collections import OrderedDict
+
+# Third-party library imports
+import psutil
+
+# Local imports
+from agent.core.utils.logger import info, warning
+import agent.core.helper.process_cache as process_cache
+import agent.core.helper.query_filter as query_filter
+
+# Constants
+PROCESS_CPU_WINDOW = 0.5 # Seconds between priming and reading CPU counters, shared by all processes
+MAX_PROCESS_CPU_WINDOW = 5 # Longest CPU window a request may ask for, in seconds
+PROCESS_FIELDS = ('pid', 'name', 'status', 'username', 'create_time', 'cpu_percent', 'memory_mb')
+SNAPSHOT_HISTORY = 8 # Number of recent versioned snapshots kept for computing deltas
+
+# Versioned snapshot history: version -> (view, {(pid, create_time): row}), view = (fields, query)
+_history = OrderedDict()
+_history_lock = threading.Lock()
+_last_version = 0
+
+def normalize_fields(fields, available=PROCESS_FIELDS, required=('pid',)):
+    """Turns a requested field list into the fields a collector will produce.
+
+    Args:
+        fields (list[str] or None): Requested fields; None or an empty list means all.
+        available (tuple[str]): Fields the collector can produce, in output order.
+        required (tuple[str]): Fields that are always included.
+
+    Returns:
+        tuple[str]: The fields to produce, in output order.
+    """
+    if not fields:
+        return tuple(available)
+    requested = set(fields) | set(required)
+    unknown = requested - set(available)
+    if unknown:
+        warning(f"Ignoring unknown fields: {', '.join(sorted(map(str, unknown)))}")
+    return tuple(field for field in available if field in requested)
+
+def _read_attr(proc, attr):
+    """Reads one psutil attribute, returning None when access is denied (like as_dict())."""
+    try:
+        return getattr(proc, attr)()
+    except psutil.AccessDenied:
+        return None
+
+def _iter_rows(processes, fields, live_keys, progress):
+    """Reads the requested fields of each process, yielding one row at a time.
+
+    Args:
+        processes (list[psutil.Process]): Processes to read.
+        fields (tuple[str]): Fields to read, in output order.
+        live_keys (set): Receives (pid, create_time) of every process that was read.
+        progress (dict): Its 'exhausted' key is set to True once every process was read.
+
+    Yields:
+        dict: One row per readable process.
+    """
+    cached_attrs = tuple(field for field in ('name', 'username') if field in fields)
+
+    for proc in processes:
+        try:
+            with proc.oneshot():
+                create_time = _read_attr(proc, "create_time")
+                live_keys.add((proc.pid, create_time))
+                metadata = process_cache.get_attributes(proc, create_time, cached_attrs) if cached_attrs else {}
+
+                pinfo = {}
+                for field in fields:
+                    if field == "pid":
+                        pinfo["pid"] = proc.pid
+                    elif field == "create_time":
+                        pinfo["create_time"] = create_time
+                    elif field == "status":
+                        pinfo["status"] = _read_attr(proc, "status")
+                    elif field in metadata:
+                        pinfo[field] = metadata[field]
+                    elif field == "cpu_percent":
+                        pinfo["cpu_percent"] = round(proc.cpu_percent(None), 1)
+                    elif field == "memory_mb":
+                        # Get memory usage in MB (rounded so unchanged processes compare equal between snapshots)
+                        pinfo["memory_mb"] = round(proc.memory_info().rss / (1024 * 1024), 1)
+        except (psutil.NoSuchProcess, psutil.AccessDenied):
+            # Process might have terminated or access denied during the window
+            continue
+        except Exception as e:
+            warning(f"Error getting info for process PID {proc.pid}: {e}")
+            continue
+        yield pinfo
+
+    progress["exhausted"] = True
+
+def take_snapshot(cpu_window=PROCESS_CPU_WINDOW, fields=None, query=None):
+    """Takes a snapshot of all running processes with a single CPU measurement window.
+
+    CPU counters of every process are primed first, then the engine sleeps once for
+    `cpu_window` seconds and reads every process in one pass inside psutil's
+    oneshot() context. The cost is roughly `cpu_window` no matter how many processes
+    exist, and each CPU figure is measured over the full window.
+
+    Only the requested fields are collected. Without cpu_percent there is no
+    priming pass and no measurement window; without username or memory_mb the
+    SID lookup and memory query are skipped.
+
+    A query (see query_filter.compile_query) is evaluated while the processes are
+    read, so only matching rows, or the top `limit` rows, are kept.
+
+    Args:
+        cpu_window (float): Length of the CPU measurement window in seconds.
+        fields (list[str], optional): Fields to collect (see PROCESS_FIELDS); all by default.
+        query (dict, optional): Filter, sort and limit to apply.
+
+    Returns:
+        list[dict]: A list of dictionaries, each representing a process with the
+                    requested keys out of pid, name, status, username, create_time,
+                    cpu_percent and memory_mb.
+    """
+    start_time = time.time()
+    fields = normalize_fields(fields)
+    compiled = query_filter.compile_query(query)
+    # Fields the query reads are collected too, and dropped again afterwards
+    collect_fields = fields
+    if compiled:
+        collect_fields = tuple(field for field in PROCESS_FIELDS if field in fields or field in compiled.fields)
+
+    if "cpu_percent" in collect_fields:
+        # Pass 1: prime the CPU counters of every process
+        processes = []
+        for proc in psutil.process_iter():
+            try:
+                proc.cpu_percent(None)
+                processes.append(proc)
+            except (psutil.NoSuchProcess, psutil.AccessDenied):
+                continue
+            except Exception as e:
+                warning(f"Error priming CPU counters for process PID {proc.pid}: {e}")
+                continue
+
+        # Single measurement window shared by all processes
+        time.sleep(max(0.0, cpu_window))
+    else:
+        processes = list(psutil.process_iter())
+
+    # Pass 2: read every process once, filtering as rows are produced
+    live_keys = set()
+    progress = {"exhausted": False}
+    process_list = query_filter.apply_query(_iter_rows(processes, collect_fields, live_keys, progress), compiled)
+
+    if collect_fields != fields:
+        process_list = [{field: pinfo[field] for field in fields} for pinfo in process_list]
+
+    # A query limit can stop the iteration early; only prune after a full pass
+    if progress["exhausted"]:
+        process_cache.prune(live_keys)
+
+    info(f"Process snapshot of {len(process_list)} processes taken in {time.time() - start_time:.2f}s.")
+    return process_list
+
+def _row_key(row):
+    """Returns the identity of a process row; create_time guards against PID reuse."""
+    return (row.get("pid"), row.get("create_time"))
+
+def get_versioned_snapshot(since_version=None, cpu_window=PROCESS_CPU_WINDOW, fields=None, query=None):
+    """Takes a snapshot and returns it as a delta against a previous version when possible.
+
+    Every call stores the new snapshot under a monotonically increasing version. If
+    `since_version` is one of the recent versions still kept in memory, only the
+    differences are returned; otherwise (unknown, expired or None) a full snapshot is
+    returned. A delta is only computed against a version taken with the same fields
+    and query; create_time is always included so rows can be matched across versions.
+
+    Args:
+        since_version (int, optional): Version the caller already holds.
+        cpu_window (float): Length of the CPU measurement window in seconds.
+        fields (list[str], optional): Fields to collect (see PROCESS_FIELDS); all by default.
+        query (dict, optional): Filter, sort and limit to apply (see take_snapshot).
+
+    Returns:
+        dict: Either a full snapshot:
+                  {"version": int, "full": True, "processes": list[dict]}
+              or a delta:
+                  {"version": int, "full": False, "since_version": int,
+                   "added": list[dict],
+                   "removed": list[[pid, create_time]],
+                   "changed": list[dict]}  # pid, create_time and the changed fields only
+    """
+    global _last_version
+
+    fields = normalize_fields(fields, required=('pid', 'create_time'))
+    process_list = take_snapshot(cpu_window, fields, query)
+    current = {_row_key(row): row for row in process_list}
+    view = (fields, json.dumps(query, sort_keys=True, default=str))
+
+    with _history_lock:
+        _last_version += 1
+        version = _last_version
+        previous_view, previous = _history.get(since_version, (None, None))
+        if previous_view != view:
+            previous = None
+
+        _history[version] = (view, current)
+        while len(_history) > SNAPSHOT_HISTORY:
+            _history.popitem(last=False)
+
+    if previous is None:
+        if since_version:
+            info(f"Process snapshot version {since_version} is unknown, sending full snapshot {version}.")
+        return {"version": version, "full": True, "processes": process_list}
+
+    added = [row for key, row in current.items() if key not in previous]
+    removed = [list(key) for key in previous if key not in current]
+    changed = []
+    for key, row in current.items():
+        old_row = previous.get(key)
+        if old_row is None:
+            continue
+        diff = {field: value for field, value in row.items() if old_row.get(field) != value}
+        if diff:
+            diff["pid"], diff["create_time"] = key
+            changed.append(diff)
+
+    info(
+        f"Process snapshot delta {since_version}->{version}: "
+        f"{len(added)} added, {len(removed)} removed, {len(changed)} changed."
+    )
+    return {
+        "version": version,
+        "full": False,
+        "since_version": since_version,
+        "added": added,
+        "removed": removed,
+        "changed": changed,
+    }
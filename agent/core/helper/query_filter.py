@@ -0,0 +1,143 @@
+# Standard library imports
+import heapq
+import itertools
+from collections import namedtuple
+from fnmatch import fnmatchcase
+
+# Local imports
+from agent.core.utils.logger import warning
+
+# Constants
+MAX_QUERY_LIMIT = 10000 # Upper bound for the 'limit' of a query
+
+# A compiled query: row predicate, sort field, sort direction, row limit and the fields it reads
+CompiledQuery = namedtuple('CompiledQuery', ['match', 'sort_field', 'descending', 'limit', 'fields'])
+
+def _as_list(value):
+    """Wraps a scalar query value in a list."""
+    return value if isinstance(value, list) else [value]
+
+def _remote_port(row):
+    """Returns the remote port of a connection row, or None."""
+    remote_addr = row.get("remote_addr")
+    if not remote_addr:
+        return None
+    try:
+        return int(remote_addr.rsplit(":", 1)[1])
+    except (IndexError, ValueError):
+        return None
+
+def compile_query(query):
+    """Compiles a declarative row query into a predicate and sort/limit settings.
+
+    Supported keys (all optional):
+        name (str): Case-insensitive glob on the 'name' field, e.g. "chrome*".
+        user (str): Case-insensitive glob on the 'username' field.
+        status (str or list[str]): Allowed values of the 'status' field.
+        min_cpu (float): Minimum 'cpu_percent'.
+        min_memory_mb (float): Minimum 'memory_mb'.
+        remote_port (int or list[int]): Allowed remote ports of a connection.
+        sort (str): Field to sort by; prefix with '-' for descending order.
+        limit (int): Maximum number of rows to return.
+
+    Args:
+        query (dict or None): The query.
+
+    Returns:
+        CompiledQuery or None: The compiled query, or None if there is nothing to apply.
+    """
+    if not isinstance(query, dict) or not query:
+        return None
+
+    checks = []
+    fields = set()
+
+    for key, field in (("name", "name"), ("user", "username")):
+        pattern = query.get(key)
+        if isinstance(pattern, str) and pattern:
+            pattern = pattern.lower()
+            checks.append(lambda row, field=field, pattern=pattern: fnmatchcase((row.get(field) or "").lower(), pattern))
+            fields.add(field)
+
+    if query.get("status"):
+        statuses = {str(status).lower() for status in _as_list(query["status"])}
+        checks.append(lambda row: str(row.get("status") or "").lower() in statuses)
+        fields.add("status")
+
+    for key, field in (("min_cpu", "cpu_percent"), ("min_memory_mb", "memory_mb")):
+        threshold = query.get(key)
+        if isinstance(threshold, (int, float)):
+            checks.append(lambda row, field=field, threshold=threshold: (row.get(field) or 0) >= threshold)
+            fields.add(field)
+
+    if query.get("remote_port") is not None:
+        ports = {port for port in _as_list(query["remote_port"]) if isinstance(port, int)}
+        checks.append(lambda row: _remote_port(row) in ports)
+        fields.add("remote_addr")
+
+    sort_field = None
+    descending = False
+    sort = query.get("sort")
+    if isinstance(sort, str) and sort.strip("-"):
+        descending = sort.startswith("-")
+        sort_field = sort.lstrip("-")
+        fields.add(sort_field)
+
+    limit = query.get("limit")
+    if isinstance(limit, int) and limit > 0:
+        limit = min(limit, MAX_QUERY_LIMIT)
+    else:
+        if limit is not None:
+            warning(f"Ignoring invalid query limit: {limit}")
+        limit = None
+
+    if not checks and sort_field is None and limit is None:
+        return None
+
+    def match(row):
+        return all(check(row) for check in checks)
+
+    return CompiledQuery(match, sort_field, descending, limit, frozenset(fields))
+
+def _sort_key(field):
+    """Sort key that orders missing values first and never compares mixed types."""
+    def key(row):
+        value = row.get(field)
+        if value is None:
+            return (0, 0, "")
+        if isinstance(value, (int, float)):
+            return (1, value, "")
+        return (2, 0, str(value).lower())
+    return key
+
+def apply_query(rows, compiled):
+    """Filters, sorts and limits rows while iterating over them.
+
+    With a limit and a sort field only the best `limit` rows are kept, using a
+    bounded heap, so rows that would be discarded are never collected. With a
+    limit but no sort field, `rows` is not consumed past the limit.
+
+    Args:
+        rows (iterable[dict]): The rows, typically a generator.
+        compiled (CompiledQuery or None): Query from compile_query().
+
+    Returns:
+        list[dict]: The matching rows.
+    """
+    if compiled is None:
+        return list(rows)
+
+    matching = (row for row in rows if compiled.match(row))
+
+    if compiled.sort_field is None:
+        if compiled.limit is None:
+            return list(matching)
+        # Without a sort order the iteration stops at the limit
+        return list(itertools.islice(matching, compiled.limit))
+
+    key = _sort_key(compiled.sort_field)
+    if compiled.limit is None:
+        return sorted(matching, key=key, reverse=compiled.descending)
+    if compiled.descending:
+        return heapq.nlargest(compiled.limit, matching, key=key)
+    return heapq.nsmallest(compiled.limit, matching, key=key)
@@ -1,47 +1,43 @@
 # Standard library imports
 import socket
-import uuid
 import time
-from concurrent.futures import ThreadPoolExecutor, as_completed, TimeoutError
+import threading
+from concurrent.futures import wait, as_completed, TimeoutError
 
 # Third-party library imports
 import psutil
 
 # Local imports
 from agent.core.utils.logger import info, error, warning
+import agent.core.helper.process_snapshot as process_snapshot
+import agent.core.helper.dns_resolver as dns_resolver
+import agent.core.helper.process_cache as process_cache
+import agent.core.helper.query_filter as query_filter
+import agent.core.helper.inventory as inventory
 
 # Constants
 NETWORK_CONN_TIMEOUT = 15 # Maximum seconds allowed for network connection retrieval
 REMOTE_HOSTNAME_TIMEOUT = 0.3 # Timeout for individual remote hostname DNS lookups
-PROCESS_CPU_INTERVAL = 0.01 # Interval for cpu_percent calculation
+REMOTE_HOSTNAMES_WAIT = 2.0 # Maximum seconds to wait for all outstanding hostname lookups of one request
+HOSTNAME_UPDATE_INTERVAL = 0.25 # Minimum seconds between two streamed hostname updates
+CONNECTION_FIELDS = ('pid', 'username', 'name', 'local_addr', 'remote_addr', 'status', 'type', 'remote_host')
+REMOTE_HOST_SOURCE_FIELDS = ('remote_addr', 'status', 'type') # Kept with remote_host so it can be streamed later
 
 def get_basic_info():
     """Retrieves basic system identification information.
 
+    Served from the cached static inventory, so repeated calls (every connect)
+    do not resolve the hostname or read the MAC address again.
+
     Returns:
         tuple[str, str, str]: A tuple containing:
             - hostname (str): The system's hostname.
-            - ip_address (str): The primary IPv4 address associated with the hostname.
-            - mac_address (str): The MAC address of the primary network interface.
+            - ip_address (str): The IPv4 address of the primary network interface.
+            - mac_address (str): The MAC address the agent registers with
+              (see inventory.format_identity_mac).
     """
     try:
-        hostname = socket.gethostname()
-        # Resolve hostname to get the primary IP, handle potential errors
-        try:
-            ip_address = socket.gethostbyname(hostname)
-        except socket.gaierror:
-            warning(f"Could not resolve hostname '{hostname}' to an IP address.")
-            ip_address = "Unknown"
-
-        # Get MAC address
-        mac_int = uuid.getnode()
-        if (mac_int >> 40) % 2:
-             # Locally administered MAC, may not be useful
-             warning("MAC address appears to be locally administered.")
-             mac_address = "Locally Administered"
-        else:
-            mac_address = ":".join(f"{(mac_int >> elements) & 0xFF:02x}" for elements in range(0, 8 * 6, 8))[::-1]
-
+        hostname, ip_address, mac_address = inventory.get_identity()
         info(f"Basic info retrieved: Host={hostname}, IP={ip_address}, MAC={mac_address}")
         return hostname, ip_address, mac_address
 
@@ -49,43 +45,56 @@ def get_basic_info():
         error(f"Failed to get basic system info: {e}")
         return "Unknown", "Unknown", "Unknown"
 
-def get_process_list():
+def get_process_list(cpu_window=process_snapshot.PROCESS_CPU_WINDOW, fields=None, query=None):
     """Retrieves a list of running processes and their basic information.
 
+    CPU usage is measured over one shared window for all processes
+    (see process_snapshot.take_snapshot).
+
+    Args:
+        cpu_window (float): Length of the CPU measurement window in seconds.
+        fields (list[str], optional): Fields to collect; expensive ones are skipped
+                                      when not requested. All fields by default.
+        query (dict, optional): Filter, sort and limit evaluated while processes are
+                                read (see query_filter.compile_query).
+
     Returns:
         list[dict]: A list of dictionaries, each representing a process.
                     Returns an empty list if errors occur during iteration.
     """
-    process_list = []
     info("Retrieving process list...")
     try:
-        for proc in psutil.process_iter(['pid', 'name', 'status', 'username', 'create_time']):
-            try:
-                pinfo = proc.info
-                # Get CPU percent with a short interval
-                pinfo["cpu_percent"] = proc.cpu_percent(interval=PROCESS_CPU_INTERVAL)
-                # Get memory usage in MB
-                pinfo["memory_mb"] = proc.memory_info().rss / (1024 * 1024)
-                # Convert create_time (timestamp) to human-readable format (optional)
-                # pinfo["create_time_str"] = datetime.datetime.fromtimestamp(pinfo['create_time']).strftime("%Y-%m-%d %H:%M:%S")
-                process_list.append(pinfo)
-            except (psutil.NoSuchProcess, psutil.AccessDenied):
-                # Process might have terminated or access denied between iterations
-                continue
-            except Exception as e:
-                # Log specific process error but continue iteration
-                warning(f"Error getting info for process PID {proc.pid if proc else 'N/A'}: {e}")
-                continue
-
+        process_list = process_snapshot.take_snapshot(cpu_window, fields, query)
         info(f"Successfully retrieved information for {len(process_list)} processes.")
         return process_list
     except Exception as e:
         error(f"Failed to iterate through processes: {e}")
         return [] # Return empty list on major iteration error
 
+def get_process_snapshot(since_version=None, cpu_window=process_snapshot.PROCESS_CPU_WINDOW, fields=None, query=None):
+    """Retrieves a versioned process snapshot, as a delta when the caller's version is known.
+
+    Args:
+        since_version (int, optional): Snapshot version the caller already holds.
+        cpu_window (float): Length of the CPU measurement window in seconds.
+        fields (list[str], optional): Fields to collect; all by default.
+        query (dict, optional): Filter, sort and limit to apply.
+
+    Returns:
+        dict: Full or delta snapshot (see process_snapshot.get_versioned_snapshot).
+    """
+    info(f"Retrieving process snapshot (since version {since_version})...")
+    try:
+        return process_snapshot.get_versioned_snapshot(since_version, cpu_window, fields, query)
+    except Exception as e:
+        error(f"Failed to take process snapshot: {e}")
+        return {"version": None, "full": True, "processes": []}
+
 def get_remote_hostname(ip):
     """Performs a reverse DNS lookup for an IP address with a timeout.
 
+    Uses the shared resolver, so repeated lookups are answered from its cache.
+
     Args:
         ip (str): The IP address to look up.
 
@@ -93,148 +102,285 @@ def get_remote_hostname(ip):
         str or None: The resolved hostname, or None if lookup fails or times out.
     """
     try:
-        # socket.gethostbyaddr can block, run it in a thread with timeout
-        with ThreadPoolExecutor(max_workers=1) as executor:
-            future = executor.submit(socket.gethostbyaddr, ip)
-            try:
-                # Wait for the result with a specific timeout
-                hostname, _, _ = future.result(timeout=REMOTE_HOSTNAME_TIMEOUT)
-                return hostname
-            except TimeoutError:
-                # info(f"Timeout resolving hostname for {ip}") # Optional: log timeouts
-                return None
-            except (socket.herror, socket.gaierror) as dns_error:
-                # info(f"DNS lookup failed for {ip}: {dns_error}") # Optional: log DNS errors
-                return None
+        return dns_resolver.lookup(ip, REMOTE_HOSTNAME_TIMEOUT)
     except Exception as e:
         warning(f"Unexpected error resolving hostname for {ip}: {e}")
         return None
 
-def get_network_connections():
-    """Retrieves active network connections (TCP/UDP) with associated process info.
+def _needs_remote_hostname(conn_info):
+    """Checks whether a connection row should get a remote hostname lookup.
 
-    Attempts to resolve remote hostnames for non-private IPs with a timeout.
-    Implements an overall timeout to prevent excessive runtime.
+    Args:
+        conn_info (dict): A connection row from get_network_connections.
 
     Returns:
-        list[dict]: A list of dictionaries, each representing a connection.
+        str or None: The remote IP to look up, or None if no lookup is needed.
     """
-    info("Retrieving network connections...")
-    start_time = time.time()
-    connections_data = []
-    connection_count = 0
-    processed_count = 0
-    error_count = 0
+    if "remote_host" not in conn_info or conn_info["remote_host"] or not conn_info.get("remote_addr"):
+        return None
+    # Only established TCP connections to public addresses
+    if conn_info.get("status") != psutil.CONN_ESTABLISHED or conn_info.get("type") != socket.SOCK_STREAM:
+        return None
+    remote_ip = conn_info["remote_addr"].rsplit(":", 1)[0]
+    if dns_resolver.is_private_address(remote_ip):
+        return None
+    return remote_ip
 
-    try:
+def iter_network_connections(fields=None, query=None, pending_hostnames=None):
+    """Yields active network connections (TCP/UDP) with associated process info.
+
+    Rows are produced one at a time so they can be sent as they are read. Remote
+    hostnames are filled in from the shared resolver's cache only; lookups for the
+    missing ones are started but never waited for. Rows come in psutil order unless
+    the query sorts them.
+
+    Args:
+        fields (list[str], optional): Fields to return (see CONNECTION_FIELDS). Process
+                                      owner lookups are skipped without name/username,
+                                      DNS lookups without remote_host. All by default.
+        query (dict, optional): Filter, sort and limit evaluated while connections are
+                                read (see query_filter.compile_query). Hostnames are
+                                only looked up for the rows that are returned.
+        pending_hostnames (dict, optional): Receives remote IP -> indexes of the yielded
+                                            rows whose hostname is still being resolved,
+                                            for stream_pending_hostnames().
+
+    Yields:
+        dict: One row per connection.
+    """
+    start_time = time.time()
+    required_fields = ('pid',) + (REMOTE_HOST_SOURCE_FIELDS if fields and "remote_host" in fields else ())
+    fields = process_snapshot.normalize_fields(fields, CONNECTION_FIELDS, required_fields)
+    compiled = query_filter.compile_query(query)
+    query_fields = compiled.fields if compiled else frozenset()
+    owner_attrs = tuple(field for field in ('name', 'username') if field in fields or field in query_fields)
+    counters = {"connections": 0, "processed": 0, "errors": 0, "returned": 0}
+
+    # PID -> {name, username} for this request, so sockets of one process share a lookup
+    owners = {}
+
+    def read_connections():
+        """Yields one full row per connection; the query filters them as they are produced."""
         # Get all internet connections (TCP & UDP)
         all_connections = psutil.net_connections(kind="inet")
-        connection_count = len(all_connections)
-        info(f"Found {connection_count} total network connections.")
+        counters["connections"] = len(all_connections)
+        info(f"Found {len(all_connections)} total network connections.")
+
+        for conn in all_connections:
+            # Check for overall timeout
+            if time.time() - start_time > NETWORK_CONN_TIMEOUT:
+                warning(f"Network connection processing timed out after {NETWORK_CONN_TIMEOUT} seconds.")
+                break # Stop processing further connections
+
+            # Skip connections without a PID or in specific states if desired (e.g., LISTEN)
+            if not conn.pid or conn.status == psutil.CONN_LISTEN:
+                continue
+
+            try:
+                if owner_attrs and conn.pid not in owners:
+                    proc = psutil.Process(conn.pid)
+                    owners[conn.pid] = process_cache.get_attributes(proc, proc.create_time(), owner_attrs)
+                owner = owners.get(conn.pid, {})
+
+                conn_info = {
+                    "pid": conn.pid,
+                    "username": owner.get("username"),
+                    "name": owner.get("name"),
+                    "local_addr": f"{conn.laddr.ip}:{conn.laddr.port}" if conn.laddr else None,
+                    "remote_addr": f"{conn.raddr.ip}:{conn.raddr.port}" if conn.raddr else None,
+                    "status": conn.status,
+                    "type": conn.type, # SOCK_STREAM (TCP) or SOCK_DGRAM (UDP)
+                    "remote_host": None # Placeholder
+                }
+            except (psutil.NoSuchProcess, psutil.AccessDenied):
+                # Process ended or access denied, skip this connection
+                continue
+            except Exception as e:
+                counters["errors"] += 1
+                warning(f"Error processing connection for PID {conn.pid}: {e}")
+                continue
+
+            counters["processed"] += 1
+            yield conn_info
 
-        # Use a ThreadPoolExecutor for potentially faster hostname lookups
-        # Adjust max_workers based on testing and expected load
-        with ThreadPoolExecutor(max_workers=10) as executor:
-            future_to_conn = {}
+    rows = read_connections()
+    if compiled and (compiled.sort_field is not None or compiled.limit is not None):
+        # Sorting and top-N need every row; the heap keeps at most `limit` of them
+        rows = query_filter.apply_query(rows, compiled)
+    elif compiled:
+        rows = (conn_info for conn_info in rows if compiled.match(conn_info))
 
-            # Iterate through connections and prepare data, submit hostname lookups
-            for conn in all_connections:
-                 # Check for overall timeout
-                if time.time() - start_time > NETWORK_CONN_TIMEOUT:
-                    warning(f"Network connection processing timed out after {NETWORK_CONN_TIMEOUT} seconds.")
-                    break # Stop processing further connections
+    try:
+        for conn_info in rows:
+            # Only attempt hostname lookup for established TCP connections to public addresses
+            remote_ip = _needs_remote_hostname(conn_info) if "remote_host" in fields else None
+            if remote_ip:
+                future = dns_resolver.resolve(remote_ip)
+                if future.done():
+                    conn_info["remote_host"] = future.result()
+                elif pending_hostnames is not None:
+                    pending_hostnames.setdefault(remote_ip, []).append(counters["returned"])
+
+            if len(fields) < len(CONNECTION_FIELDS):
+                conn_info = {field: conn_info[field] for field in fields}
+            counters["returned"] += 1
+            yield conn_info
+    finally:
+        elapsed_time = time.time() - start_time
+        info(
+            f"Network connections processing finished in {elapsed_time:.2f}s. "
+            f"Processed: {counters['processed']}/{counters['connections']}. "
+            f"Errors: {counters['errors']}. Returned: {counters['returned']}."
+        )
+
+def get_network_connections(hostname_wait=REMOTE_HOSTNAMES_WAIT, fields=None, query=None):
+    """Retrieves active network connections (TCP/UDP) with associated process info.
 
-                # Skip connections without a PID or in specific states if desired (e.g., LISTEN)
-                if not conn.pid or conn.status == psutil.CONN_LISTEN:
-                     continue
+    Attempts to resolve remote hostnames for public IPs through the shared, cached
+    resolver. Implements an overall timeout to prevent excessive runtime.
 
+    Args:
+        hostname_wait (float): Maximum seconds to wait for uncached hostname lookups.
+                               With 0 only cached hostnames are filled in; the rest can
+                               be delivered later with stream_remote_hostnames().
+        fields (list[str], optional): Fields to return (see iter_network_connections).
+        query (dict, optional): Filter, sort and limit (see iter_network_connections).
+
+    Returns:
+        list[dict]: A list of dictionaries, each representing a connection.
+    """
+    info("Retrieving network connections...")
+    start_time = time.time()
+    connections_data = []
+
+    try:
+        connections_data = list(iter_network_connections(fields, query))
+        if not (query and query.get("sort")):
+            # Sort results for consistency
+            connections_data.sort(key=lambda x: (x.get("name") or "", x.get("pid", 0)))
+
+        # Remote IP -> connections waiting for its hostname
+        lookups = {}
+        for conn_info in connections_data:
+            remote_ip = _needs_remote_hostname(conn_info)
+            if remote_ip:
+                lookups.setdefault(remote_ip, []).append(conn_info)
+
+        # Wait for uncached lookups; unfinished ones keep running and fill the cache
+        if lookups and hostname_wait > 0:
+            info(f"Waiting for {len(lookups)} remote hostname lookups...")
+            futures = {dns_resolver.resolve(remote_ip): conn_infos for remote_ip, conn_infos in lookups.items()}
+            remaining = max(0.0, min(hostname_wait, NETWORK_CONN_TIMEOUT - (time.time() - start_time)))
+            done, not_done = wait(futures, timeout=remaining)
+            if not_done:
+                info(f"{len(not_done)} remote hostname lookups still pending, returning without them.")
+
+            for future in done:
                 try:
-                    proc = psutil.Process(conn.pid)
-                    proc_name = proc.name()
-                    proc_user = proc.username()
-
-                    conn_info = {
-                        "pid": conn.pid,
-                        "username": proc_user,
-                        "name": proc_name,
-                        "local_addr": f"{conn.laddr.ip}:{conn.laddr.port}" if conn.laddr else None,
-                        "remote_addr": f"{conn.raddr.ip}:{conn.raddr.port}" if conn.raddr else None,
-                        "status": conn.status,
-                        "type": conn.type, # SOCK_STREAM (TCP) or SOCK_DGRAM (UDP)
-                        "remote_host": None # Placeholder
-                    }
-
-                    # Only attempt hostname lookup for established TCP connections with a remote address
-                    if conn.raddr and conn.status == psutil.CONN_ESTABLISHED and conn.type == socket.SOCK_STREAM:
-                        remote_ip = conn.raddr.ip
-                        # Basic check for private/local IPs to avoid unnecessary lookups
-                        if not (remote_ip.startswith(('10.', '172.', '192.168.', '127.')) or remote_ip == '::1'):
-                            future = executor.submit(get_remote_hostname, remote_ip)
-                            future_to_conn[future] = conn_info # Map future back to its connection info
-                        # else: Private/local IP, skip lookup
-
-                    connections_data.append(conn_info)
-                    processed_count += 1
-
-                except (psutil.NoSuchProcess, psutil.AccessDenied):
-                    # Process ended or access denied, skip this connection
-                    continue
+                    hostname = future.result()
                 except Exception as e:
-                    error_count += 1
-                    warning(f"Error processing connection for PID {conn.pid}: {e}")
+                    warning(f"Error retrieving result from hostname lookup future: {e}")
                     continue
-
-            # Process completed hostname lookups
-            info(f"Waiting for {len(future_to_conn)} remote hostname lookups...")
-            for future in as_completed(future_to_conn): # Process as they complete
-                 if time.time() - start_time > NETWORK_CONN_TIMEOUT:
-                     warning("Timeout reached while waiting for hostname lookups.")
-                     # Optionally cancel remaining futures: future.cancel()
-                     break
-                 conn_info_ref = future_to_conn[future]
-                 try:
-                     hostname = future.result(timeout=0.1) # Small timeout here as bulk are waited on
-                     if hostname:
-                         conn_info_ref["remote_host"] = hostname
-                 except TimeoutError:
-                     pass # Timeout handled within get_remote_hostname or here
-                 except Exception as e:
-                     warning(f"Error retrieving result from hostname lookup future: {e}")
+                if hostname:
+                    for conn_info_ref in futures[future]:
+                        conn_info_ref["remote_host"] = hostname
 
     except Exception as e:
+        # Whatever was collected so far is returned, or an empty list
         error(f"Critical error during network connection retrieval: {e}")
-        # Return whatever was collected so far, or an empty list
-        return connections_data
-
-    finally:
-        elapsed_time = time.time() - start_time
-        info(f"Network connections processing finished in {elapsed_time:.2f}s. Processed: {processed_count}/{connection_count}. Errors: {error_count}.")
-        # Sort results for consistency
-        connections_data.sort(key=lambda x: (x.get("name", ""), x.get("pid", 0)))
 
     return connections_data
 
-def get_system_info():
-    """Gathers various system information points.
+def stream_remote_hostnames(connections, on_update, timeout=NETWORK_CONN_TIMEOUT):
+    """Resolves the missing remote hostnames of a connection table in the background.
+
+    Args:
+        connections (list[dict]): Connection table returned by get_network_connections().
+        on_update (callable): See stream_pending_hostnames().
+        timeout (float): Maximum seconds to keep waiting for lookups.
 
     Returns:
-        dict: A dictionary containing system information like IP, MAC, hostname.
+        threading.Thread: The started streaming thread.
+    """
+    # Remote IP -> indexes of the connections waiting for its hostname
+    pending = {}
+    for index, conn_info in enumerate(connections):
+        remote_ip = _needs_remote_hostname(conn_info)
+        if remote_ip:
+            pending.setdefault(remote_ip, []).append(index)
+    return stream_pending_hostnames(pending, on_update, timeout)
+
+def stream_pending_hostnames(pending, on_update, timeout=NETWORK_CONN_TIMEOUT):
+    """Reports hostnames of pending lookups in the background as they resolve.
+
+    Lookups started while the connections were collected are still in flight in
+    the shared resolver, so they are joined rather than repeated. Results are
+    reported in batches, at most every HOSTNAME_UPDATE_INTERVAL seconds, keyed by
+    connection index. A final call with done=True is always made.
+
+    Args:
+        pending (dict): Remote IP -> indexes of the connections waiting for its hostname.
+        on_update (callable): Called as on_update(updates, done) where updates is a
+                              list of {"index": int, "remote_host": str}.
+        timeout (float): Maximum seconds to keep waiting for lookups.
+
+    Returns:
+        threading.Thread: The started streaming thread.
+    """
+    def stream():
+        futures = {dns_resolver.resolve(remote_ip): indexes for remote_ip, indexes in pending.items()}
+        updates = []
+        last_flush = 0.0 # First resolved batch is sent right away
+        try:
+            for future in as_completed(futures, timeout=timeout):
+                hostname = future.result()
+                if hostname:
+                    updates.extend({"index": index, "remote_host": hostname} for index in futures[future])
+                if updates and time.time() - last_flush >= HOSTNAME_UPDATE_INTERVAL:
+                    on_update(updates, False)
+                    updates = []
+                    last_flush = time.time()
+        except TimeoutError:
+            info(f"Hostname streaming stopped after {timeout}s with lookups still pending.")
+        except Exception as e:
+            warning(f"Error while streaming remote hostnames: {e}")
+        on_update(updates, True)
+
+    info(f"Streaming {len(pending)} remote hostname lookups...")
+    stream_thread = threading.Thread(target=stream, name="HostnameStream", daemon=True)
+    stream_thread.start()
+    return stream_thread
+
+def get_system_info(refresh=False):
+    """Gathers the hardware and OS inventory.
+
+    Static facts (CPU, memory size, disks, partitions, NICs, OS build) come
+    from the inventory cache, which is rebuilt when a hardware or network
+    change is detected; volatile figures (uptime, memory and disk usage,
+    link state) are read on every call.
+
+    Args:
+        refresh (bool): Rebuild the static inventory instead of using the cache.
+
+    Returns:
+        dict: hostname, ip_address and registration mac_address (as get_basic_info),
+              plus the inventory (see inventory.get_inventory).
     """
     info("Gathering system information...")
-    hostname, ip_address, mac_address = get_basic_info()
-    # Add more system info points here as needed
-    # e.g., os_version = platform.platform()
-    #       cpu_info = platform.processor()
-    #       memory_info = psutil.virtual_memory()
+    try:
+        inventory_data = inventory.get_inventory(refresh)
+    except Exception as e:
+        error(f"Failed to gather system inventory: {e}")
+        hostname, ip_address, mac_address = get_basic_info()
+        return {"ip_address": ip_address, "mac_address": mac_address, "hostname": hostname}
 
+    # The top-level fields keep the registration identity; the inventory holds the real MACs
+    hostname, ip_address, mac_address = inventory.get_identity()
     system_data = {
         "ip_address": ip_address,
         "mac_address": mac_address,
         "hostname": hostname,
-        # "os_version": os_version,
-        # "cpu_info": cpu_info,
-        # "total_memory_gb": memory_info.total / (1024**3),
-        # "available_memory_gb": memory_info.available / (1024**3),
+        **inventory_data,
     }
     info("System information gathered.")
     return system_data
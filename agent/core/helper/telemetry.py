@@ -0,0 +1,326 @@
+# Standard library imports
+import math
+import os
+import threading
+import time
+from array import array
+
+# Third-party library imports
+import psutil
+
+# Local imports
+from agent.core.utils.logger import info, warning, error
+
+# Constants
+DEFAULT_SAMPLE_INTERVAL = 2 # Seconds between two samples
+MIN_SAMPLE_INTERVAL = 1
+MAX_SAMPLE_INTERVAL = 5
+RECENT_SPAN = 10 * 60 # Seconds of history kept at full sample resolution
+ROLLUP_RESOLUTION = 60 # Seconds averaged into one downsampled point
+ROLLUP_SPAN = 24 * 60 * 60 # Seconds of history kept as downsampled points
+MAX_NICS = 8 # Network interfaces recorded; the set is fixed at the first sample
+SYSTEM_METRICS = ("cpu_percent", "memory_percent", "memory_used_mb", "disk_read_bps", "disk_write_bps", "disk_free_percent")
+SYSTEM_DRIVE = os.environ.get("SystemDrive", "") + os.sep # Drive reported by disk_free_percent
+
+class _RingBuffer:
+    """Fixed-capacity time series: one timestamp array and one float32 array per column."""
+
+    def __init__(self, capacity, columns):
+        self.capacity = capacity
+        self.timestamps = array('d', bytes(8 * capacity))
+        self.values = [array('f', bytes(4 * capacity)) for _ in columns]
+        self.start = 0
+        self.count = 0
+
+    def append(self, timestamp, row):
+        """Stores one point, overwriting the oldest one when the buffer is full."""
+        if self.count < self.capacity:
+            index = (self.start + self.count) % self.capacity
+            self.count += 1
+        else:
+            index = self.start
+            self.start = (self.start + 1) % self.capacity
+        self.timestamps[index] = timestamp
+        for column_values, value in zip(self.values, row):
+            column_values[index] = value
+
+    def window(self, since, column_indexes):
+        """Returns the timestamps and the selected columns of every point at or after `since`."""
+        indexes = [
+            (self.start + offset) % self.capacity
+            for offset in range(self.count)
+            if self.timestamps[(self.start + offset) % self.capacity] >= since
+        ]
+        timestamps = [round(self.timestamps[index], 1) for index in indexes]
+        columns = [[round(self.values[column][index], 1) for index in indexes] for column in column_indexes]
+        return timestamps, columns
+
+    def nbytes(self):
+        """Returns the memory used by the arrays."""
+        return self.timestamps.itemsize * self.capacity + sum(
+            column_values.itemsize * self.capacity for column_values in self.values
+        )
+
+# Sampler state
+_lock = threading.Lock()
+_stop_event = threading.Event()
+_thread = None
+_interval = DEFAULT_SAMPLE_INTERVAL
+_columns = None # Metric names, system metrics followed by <nic>.rx_bps / <nic>.tx_bps
+_recent = None # _RingBuffer at sample resolution
+_rollup = None # _RingBuffer at ROLLUP_RESOLUTION
+_previous = None # Counters of the previous sample, for rates
+_bucket = None # [bucket number, per-column sums, sample count] of the rollup point being built
+_stats = {"samples": 0, "errors": 0, "total_time": 0.0, "max_time": 0.0}
+_listeners = [] # Functions called with (timestamp, columns, row) after every sample
+
+def _clamp_interval(interval):
+    """Returns a valid sample interval, the default for invalid values."""
+    if not isinstance(interval, (int, float)) or isinstance(interval, bool):
+        return DEFAULT_SAMPLE_INTERVAL
+    return min(max(interval, MIN_SAMPLE_INTERVAL), MAX_SAMPLE_INTERVAL)
+
+def _select_nics(net_counters):
+    """Picks the network interfaces to record, skipping loopback adapters."""
+    names = [
+        name for name in sorted(net_counters)
+        if name != "lo" and not name.lower().startswith("loopback")
+    ]
+    if len(names) > MAX_NICS:
+        warning(f"Telemetry records only the first {MAX_NICS} of {len(names)} network interfaces.")
+    return names[:MAX_NICS]
+
+def _cpu_busy_and_total(cpu_times):
+    """Returns the busy and total CPU time from psutil.cpu_times()."""
+    total = sum(cpu_times)
+    idle = cpu_times.idle + getattr(cpu_times, "iowait", 0.0)
+    return total - idle, total
+
+def _rate(current, previous, elapsed):
+    """Returns a per-second rate, 0 if a counter was reset."""
+    delta = current - previous
+    return delta / elapsed if delta > 0 and elapsed > 0 else 0.0
+
+def _read_counters():
+    """Reads the raw system counters for one sample."""
+    disk = psutil.disk_io_counters()
+    return {
+        "time": time.monotonic(),
+        "cpu": _cpu_busy_and_total(psutil.cpu_times()),
+        "memory": psutil.virtual_memory(),
+        "disk": (disk.read_bytes, disk.write_bytes) if disk else (0, 0),
+        "disk_free": 100.0 - psutil.disk_usage(SYSTEM_DRIVE).percent,
+        "net": {name: (counters.bytes_recv, counters.bytes_sent) for name, counters in psutil.net_io_counters(pernic=True).items()},
+    }
+
+def _init_buffers(net_counters):
+    """Creates the ring buffers for the metric columns (caller holds the lock)."""
+    global _columns, _recent, _rollup, _bucket
+
+    columns = list(SYSTEM_METRICS)
+    for name in _select_nics(net_counters):
+        columns.extend((f"{name}.rx_bps", f"{name}.tx_bps"))
+
+    _columns = columns
+    _recent = _RingBuffer(math.ceil(RECENT_SPAN / _interval), columns)
+    _rollup = _RingBuffer(ROLLUP_SPAN // ROLLUP_RESOLUTION, columns)
+    _bucket = None
+    info(f"Telemetry buffers use {_recent.nbytes() + _rollup.nbytes()} bytes for {len(columns)} metrics.")
+
+def _take_sample():
+    """Reads the counters and appends one point to the history."""
+    global _previous, _bucket
+
+    current = _read_counters()
+    timestamp = time.time()
+
+    with _lock:
+        previous, _previous = _previous, current
+        if _columns is None:
+            _init_buffers(current["net"])
+        if previous is None:
+            # Rates need two readings
+            return
+
+        elapsed = current["time"] - previous["time"]
+        busy = current["cpu"][0] - previous["cpu"][0]
+        total = current["cpu"][1] - previous["cpu"][1]
+        memory = current["memory"]
+
+        row = [
+            min(max(busy / total * 100, 0.0), 100.0) if total > 0 else 0.0,
+            memory.percent,
+            memory.used / (1024 * 1024),
+            _rate(current["disk"][0], previous["disk"][0], elapsed),
+            _rate(current["disk"][1], previous["disk"][1], elapsed),
+            current["disk_free"],
+        ]
+        for column in _columns[len(SYSTEM_METRICS)::2]:
+            name = column[:-len(".rx_bps")]
+            now_counters = current["net"].get(name)
+            before_counters = previous["net"].get(name)
+            if now_counters and before_counters:
+                row.append(_rate(now_counters[0], before_counters[0], elapsed))
+                row.append(_rate(now_counters[1], before_counters[1], elapsed))
+            else:
+                row.extend((0.0, 0.0))
+
+        _recent.append(timestamp, row)
+
+        # Average the samples of each minute into one rollup point
+        bucket_number = int(timestamp // ROLLUP_RESOLUTION)
+        if _bucket is not None and _bucket[0] != bucket_number:
+            _rollup.append(_bucket[0] * ROLLUP_RESOLUTION, [total_value / _bucket[2] for total_value in _bucket[1]])
+            _bucket = None
+        if _bucket is None:
+            _bucket = [bucket_number, [0.0] * len(row), 0]
+        _bucket[1] = [total_value + value for total_value, value in zip(_bucket[1], row)]
+        _bucket[2] += 1
+        columns = _columns
+
+    # Listeners run outside the lock so they can read the history themselves
+    for listener in list(_listeners):
+        try:
+            listener(timestamp, columns, row)
+        except Exception as e:
+            error(f"Telemetry listener failed: {e}")
+
+def _run():
+    """Sampler thread: takes one sample per interval until stopped."""
+    next_run = time.monotonic()
+    while not _stop_event.is_set():
+        started = time.perf_counter()
+        try:
+            _take_sample()
+        except Exception as e:
+            with _lock:
+                _stats["errors"] += 1
+            error(f"Telemetry sample failed: {e}")
+        elapsed = time.perf_counter() - started
+
+        with _lock:
+            _stats["samples"] += 1
+            _stats["total_time"] += elapsed
+            _stats["max_time"] = max(_stats["max_time"], elapsed)
+
+        next_run += _interval
+        delay = next_run - time.monotonic()
+        if delay < 0:
+            # Fell behind (e.g. the machine was suspended); restart the cadence
+            next_run = time.monotonic()
+            delay = 0
+        _stop_event.wait(delay)
+
+def start(interval=DEFAULT_SAMPLE_INTERVAL):
+    """Starts the background sampler, or changes the interval of the running one.
+
+    Args:
+        interval (float): Seconds between samples, clamped to 1-5.
+    """
+    global _thread, _interval, _recent
+
+    interval = _clamp_interval(interval)
+    with _lock:
+        if interval != _interval:
+            # The full-resolution buffer is sized for the interval; the rollups are kept
+            _interval = interval
+            if _columns is not None:
+                _recent = _RingBuffer(math.ceil(RECENT_SPAN / _interval), _columns)
+        if _thread and _thread.is_alive():
+            return
+        _stop_event.clear()
+        _thread = threading.Thread(target=_run, name="TelemetrySampler", daemon=True)
+        _thread.start()
+    info(f"Telemetry sampler started (interval {interval}s).")
+
+def stop():
+    """Stops the background sampler; the recorded history is kept."""
+    global _thread
+
+    _stop_event.set()
+    thread = _thread
+    if thread and thread.is_alive():
+        thread.join(timeout=2)
+    _thread = None
+
+def add_listener(listener):
+    """Registers a function called with (timestamp, columns, row) after every sample.
+
+    Listeners run on the sampler thread and must return quickly.
+
+    Args:
+        listener (callable): Function to call; the row holds one value per column.
+    """
+    if listener not in _listeners:
+        _listeners.append(listener)
+
+def remove_listener(listener):
+    """Unregisters a function added with add_listener."""
+    if listener in _listeners:
+        _listeners.remove(listener)
+
+def get_history(window=RECENT_SPAN, resolution=None, metrics=None):
+    """Returns recorded metrics for a time window without taking a new sample.
+
+    Windows up to RECENT_SPAN are served at sample resolution, longer ones from
+    the one-minute rollups; resolution "1m" forces the rollups.
+
+    Args:
+        window (float): Seconds of history to return, up to ROLLUP_SPAN.
+        resolution (str or None): "1m" for rollups, anything else for automatic.
+        metrics (list[str] or None): Metric names to return; a network interface
+            name selects both of its columns. None returns every metric.
+
+    Returns:
+        dict: {"resolution": seconds per point, "interval": sample interval,
+               "columns": [name, ...], "timestamps": [unix time, ...],
+               "values": [[value, ...] per column]}
+    """
+    if not isinstance(window, (int, float)) or isinstance(window, bool) or window <= 0:
+        window = RECENT_SPAN
+    window = min(window, ROLLUP_SPAN)
+
+    with _lock:
+        if _columns is None:
+            return {"resolution": _interval, "interval": _interval, "columns": [], "timestamps": [], "values": []}
+
+        if metrics:
+            wanted = set(metrics)
+            column_indexes = [
+                index for index, column in enumerate(_columns)
+                if column in wanted or column.rsplit(".", 1)[0] in wanted
+            ]
+        else:
+            column_indexes = list(range(len(_columns)))
+
+        use_rollup = resolution == "1m" or window > RECENT_SPAN
+        buffer = _rollup if use_rollup else _recent
+        timestamps, values = buffer.window(time.time() - window, column_indexes)
+        return {
+            "resolution": ROLLUP_RESOLUTION if use_rollup else _interval,
+            "interval": _interval,
+            "columns": [_columns[index] for index in column_indexes],
+            "timestamps": timestamps,
+            "values": values,
+        }
+
+def get_stats():
+    """Returns sampler counters and buffer sizes.
+
+    Returns:
+        dict: Running flag, interval, sample and error counts, stored points,
+              buffer memory and average/maximum sampling time (ms).
+    """
+    with _lock:
+        samples = _stats["samples"] or 1
+        return {
+            "running": bool(_thread and _thread.is_alive()),
+            "interval": _interval,
+            "samples": _stats["samples"],
+            "errors": _stats["errors"],
+            "recent_points": _recent.count if _recent else 0,
+            "rollup_points": _rollup.count if _rollup else 0,
+            "buffer_bytes": (_recent.nbytes() + _rollup.nbytes()) if _recent else 0,
+            "avg_sample_ms": round(_stats["total_time"] / samples * 1000, 3),
+            "max_sample_ms": round(_stats["max_time"] * 1000, 3),
+        }
@@ -0,0 +1,168 @@
+# agent/core/network/codec.py
+import json
+import struct
+import agent.core.utils.logger as logger
+from agent.core.network.compression import is_compressed, decompress_frame
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+CODEC_JSON = "json"
+CODEC_MSGPACK = "msgpack"
+
+class JsonCodec:
+    """
+    Encodes messages as JSON text frames, with orjson when it is installed
+    """
+    
+    name = CODEC_JSON
+    binary = False
+    
+    def encode(self, message):
+        """
+        Encode a message
+        
+        Args:
+            message: JSON-serializable object
+            
+        Returns:
+            str: JSON text
+        """
+        if orjson:
+            return orjson.dumps(message, option=orjson.OPT_NON_STR_KEYS).decode("utf-8")
+        return json.dumps(message)
+        
+    def decode(self, data):
+        """
+        Decode a JSON text frame
+        
+        Args:
+            data: JSON text (str or UTF-8 bytes)
+            
+        Returns:
+            Decoded object
+        """
+        if orjson:
+            return orjson.loads(data)
+        return json.loads(data)
+
+class MsgpackCodec:
+    """
+    Encodes messages as MessagePack binary frames
+    """
+    
+    name = CODEC_MSGPACK
+    binary = True
+    
+    def encode(self, message):
+        """
+        Encode a message
+        
+        Args:
+            message: Object made of dicts, lists, strings, numbers, booleans and None
+            
+        Returns:
+            bytes: MessagePack data
+        """
+        return msgpack.packb(message, use_bin_type=True)
+        
+    def decode(self, data):
+        """
+        Decode a MessagePack binary frame
+        
+        Args:
+            data: MessagePack bytes
+            
+        Returns:
+            Decoded object
+        """
+        return msgpack.unpackb(data, raw=False, strict_map_key=False)
+
+JSON_CODEC = JsonCodec()
+MSGPACK_CODEC = MsgpackCodec() if msgpack else None
+
+def supported_codecs():
+    """
+    Returns the codecs this agent can use, most preferred first
+    
+    Returns:
+        list[str]: Codec names, offered to the server in the auth message
+    """
+    return [CODEC_MSGPACK, CODEC_JSON] if msgpack else [CODEC_JSON]
+
+def get_codec(name):
+    """
+    Returns the codec with the given name
+    
+    Args:
+        name: Codec name chosen by the server
+        
+    Returns:
+        JsonCodec or MsgpackCodec: The codec, JSON if the name is unknown or unavailable
+    """
+    if name == CODEC_MSGPACK and MSGPACK_CODEC:
+        return MSGPACK_CODEC
+    if name and name != CODEC_JSON:
+        logger.warning(f"Unsupported codec '{name}', using JSON")
+    return JSON_CODEC
+
+def decode_frame(frame):
+    """
+    Decode a received frame; binary frames are MessagePack, text frames are JSON,
+    and compressed envelopes are unwrapped first
+    
+    Args:
+        frame: Frame payload (bytes for binary frames, str for text frames)
+        
+    Returns:
+        Decoded object
+        
+    Raises:
+        ValueError: If the frame cannot be decoded
+    """
+    if is_compressed(frame):
+        frame = decompress_frame(frame)
+    if isinstance(frame, (bytes, bytearray)):
+        if not MSGPACK_CODEC:
+            raise ValueError("Received a binary frame but msgpack is not installed")
+        try:
+            return MSGPACK_CODEC.decode(frame)
+        except Exception as e:
+            raise ValueError(f"Invalid MessagePack frame: {e}") from e
+    return JSON_CODEC.decode(frame)
+
+def _msgpack_array_header(length):
+    """Returns the MessagePack header of an array with the given length"""
+    if length < 16:
+        return bytes([0x90 | length])
+    if length < 0x10000:
+        return b"\xdc" + struct.pack(">H", length)
+    return b"\xdd" + struct.pack(">I", length)
+
+def build_batch(payloads):
+    """
+    Combine encoded messages into one batch frame without re-encoding them
+    
+    All payloads must come from the same codec. JSON payloads are joined as
+    text; MessagePack payloads are prefixed with a map and array header.
+    
+    Args:
+        payloads: Encoded messages (all str or all bytes)
+        
+    Returns:
+        str or bytes: {"type": "batch", "messages": [...]} in the payloads' encoding
+    """
+    if isinstance(payloads[0], bytes):
+        return (
+            b"\x82" + MSGPACK_CODEC.encode("type") + MSGPACK_CODEC.encode("batch")
+            + MSGPACK_CODEC.encode("messages") + _msgpack_array_header(len(payloads))
+            + b"".join(payloads)
+        )
+    return '{"type": "batch", "messages": [' + ", ".join(payloads) + ']}'
\ No newline at end of file
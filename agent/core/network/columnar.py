@@ -0,0 +1,105 @@
+# agent/core/network/columnar.py
+import agent.core.utils.logger as logger
+
+FORMAT_COLUMNAR = "columnar"
+COLUMNAR_MARKER = "$columnar" # Key identifying an encoded table inside a message
+MIN_COLUMNAR_ROWS = 8 # Smaller tables are sent as plain lists of objects
+MAX_DICTIONARY_RATIO = 0.5 # String columns with at most this share of distinct values are dictionary-encoded
+
+def encode_table(rows):
+    """
+    Encode a list of row objects column by column
+    
+    Column names are sent once, followed by one array of values per column.
+    String columns with many repeated values (user names, process names,
+    statuses) carry a dictionary of distinct values and an array of indexes.
+    
+    Args:
+        rows: List of dicts
+        
+    Returns:
+        dict: Encoded table:
+              {"$columnar": 1, "count": n, "columns": [name, ...],
+               "values": [[...], ...], "dictionaries": {column: [value, ...]}}
+    """
+    columns = []
+    seen = set()
+    for row in rows:
+        for column in row:
+            if column not in seen:
+                seen.add(column)
+                columns.append(column)
+                
+    values = []
+    dictionaries = {}
+    for column in columns:
+        column_values = [row.get(column) for row in rows]
+        
+        distinct = {}
+        dictionary_encoded = True
+        for value in column_values:
+            if value is not None and not isinstance(value, str):
+                dictionary_encoded = False
+                break
+            if value not in distinct:
+                distinct[value] = len(distinct)
+                
+        if dictionary_encoded and len(distinct) <= len(column_values) * MAX_DICTIONARY_RATIO:
+            dictionaries[column] = list(distinct)
+            values.append([distinct[value] for value in column_values])
+        else:
+            values.append(column_values)
+            
+    return {
+        COLUMNAR_MARKER: 1,
+        "count": len(rows),
+        "columns": columns,
+        "values": values,
+        "dictionaries": dictionaries,
+    }
+
+def _is_table(value):
+    """Check whether a value is a list of row objects worth encoding"""
+    return (
+        isinstance(value, list)
+        and len(value) >= MIN_COLUMNAR_ROWS
+        and all(isinstance(row, dict) for row in value)
+    )
+
+def encode_value(value):
+    """
+    Encode every table found in a value
+    
+    Args:
+        value: Any JSON-serializable value
+        
+    Returns:
+        Value with each list of row objects replaced by its columnar encoding
+    """
+    if _is_table(value):
+        return encode_table(value)
+    if isinstance(value, dict):
+        return {key: encode_value(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [encode_value(item) for item in value]
+    return value
+
+def encode_message(message):
+    """
+    Encode the data of an outgoing message in the columnar format
+    
+    Args:
+        message: Message dict with "format": "columnar"
+        
+    Returns:
+        dict: A copy of the message with its tables encoded
+    """
+    try:
+        encoded = dict(message)
+        encoded["data"] = encode_value(message.get("data"))
+        return encoded
+    except Exception as e:
+        logger.error(f"Failed to encode message in columnar format, sending rows: {e}")
+        fallback = dict(message)
+        fallback.pop("format", None)
+        return fallback
\ No newline at end of file
@@ -0,0 +1,179 @@
+# agent/core/network/compression.py
+import time
+import zlib
+import threading
+import agent.core.utils.logger as logger
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+COMPRESSION_ZSTD = "zstd"
+COMPRESSION_ZLIB = "zlib"
+
+# Compressed frames are binary frames starting with 0xC1, a byte MessagePack never
+# uses, followed by the algorithm and the encoding of the uncompressed payload
+COMPRESSED_MARKER = 0xC1
+ALGORITHM_IDS = {COMPRESSION_ZLIB: 1, COMPRESSION_ZSTD: 2}
+PAYLOAD_JSON = 0
+PAYLOAD_MSGPACK = 1
+
+COMPRESSION_THRESHOLD = 1024 # Frames smaller than this many bytes are sent uncompressed
+ZLIB_LEVEL = 6
+ZSTD_LEVEL = 3
+
+def supported_compression():
+    """
+    Returns the compression algorithms this agent can use, most preferred first
+    
+    Returns:
+        list[str]: Algorithm names, offered to the server in the auth message
+    """
+    return [COMPRESSION_ZSTD, COMPRESSION_ZLIB] if zstandard else [COMPRESSION_ZLIB]
+
+def is_compressed(frame):
+    """Check whether a received frame is a compressed envelope"""
+    return isinstance(frame, (bytes, bytearray)) and len(frame) > 3 and frame[0] == COMPRESSED_MARKER
+
+def decompress_frame(frame):
+    """
+    Unwrap a compressed envelope
+    
+    Args:
+        frame: Compressed frame bytes
+        
+    Returns:
+        str or bytes: The original JSON text or MessagePack bytes
+        
+    Raises:
+        ValueError: If the algorithm is unknown or the data is corrupt
+    """
+    algorithm_id, payload_type = frame[1], frame[2]
+    try:
+        if algorithm_id == ALGORITHM_IDS[COMPRESSION_ZLIB]:
+            data = zlib.decompress(frame[3:])
+        elif algorithm_id == ALGORITHM_IDS[COMPRESSION_ZSTD] and zstandard:
+            data = zstandard.ZstdDecompressor().decompress(frame[3:])
+        else:
+            raise ValueError(f"Unsupported compression algorithm {algorithm_id}")
+    except Exception as e:
+        raise ValueError(f"Invalid compressed frame: {e}") from e
+        
+    return data.decode("utf-8") if payload_type == PAYLOAD_JSON else data
+
+class FrameCompressor:
+    """
+    Compresses outgoing frames with the algorithm negotiated for a connection.
+    
+    Frames below COMPRESSION_THRESHOLD (control messages, small updates) and
+    frames that do not get smaller are sent unchanged. Only the writer thread
+    calls compress(); the counters are read from other threads.
+    """
+    
+    def __init__(self, algorithm, threshold=COMPRESSION_THRESHOLD):
+        """
+        Initialize the FrameCompressor
+        
+        Args:
+            algorithm: COMPRESSION_ZLIB or COMPRESSION_ZSTD
+            threshold: Minimum frame size in bytes to compress
+        """
+        self.algorithm = algorithm
+        self.algorithm_id = ALGORITHM_IDS[algorithm]
+        self.threshold = threshold
+        self.zstd_compressor = zstandard.ZstdCompressor(level=ZSTD_LEVEL) if algorithm == COMPRESSION_ZSTD else None
+        
+        # Metrics
+        self.stats_lock = threading.Lock()
+        self.compressed_frames = 0
+        self.skipped_small = 0
+        self.skipped_incompressible = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.total_time = 0.0
+        self.max_time = 0.0
+        self.last_ratio = None
+        
+    def compress(self, frame):
+        """
+        Compress a frame if it is large enough and compression pays off
+        
+        Args:
+            frame: JSON text or MessagePack bytes
+            
+        Returns:
+            str or bytes: The compressed envelope, or the unchanged frame
+        """
+        if isinstance(frame, str):
+            data, payload_type = frame.encode("utf-8"), PAYLOAD_JSON
+        else:
+            data, payload_type = frame, PAYLOAD_MSGPACK
+            
+        if len(data) < self.threshold:
+            with self.stats_lock:
+                self.skipped_small += 1
+            return frame
+            
+        started = time.perf_counter()
+        if self.zstd_compressor:
+            compressed = self.zstd_compressor.compress(data)
+        else:
+            compressed = zlib.compress(data, ZLIB_LEVEL)
+        elapsed = time.perf_counter() - started
+        
+        envelope_size = len(compressed) + 3
+        with self.stats_lock:
+            self.total_time += elapsed
+            self.max_time = max(self.max_time, elapsed)
+            self.last_ratio = envelope_size / len(data)
+            if envelope_size >= len(data):
+                self.skipped_incompressible += 1
+                return frame
+            self.compressed_frames += 1
+            self.bytes_in += len(data)
+            self.bytes_out += envelope_size
+            
+        return bytes((COMPRESSED_MARKER, self.algorithm_id, payload_type)) + compressed
+        
+    def get_stats(self):
+        """
+        Returns compression counters
+        
+        Returns:
+            dict: Frame counters, bytes before and after compression, overall
+                  and last compression ratio (compressed / original) and
+                  average/maximum compression time (ms)
+        """
+        with self.stats_lock:
+            attempts = self.compressed_frames + self.skipped_incompressible
+            return {
+                "algorithm": self.algorithm,
+                "threshold": self.threshold,
+                "compressed_frames": self.compressed_frames,
+                "skipped_small": self.skipped_small,
+                "skipped_incompressible": self.skipped_incompressible,
+                "bytes_in": self.bytes_in,
+                "bytes_out": self.bytes_out,
+                "ratio": round(self.bytes_out / self.bytes_in, 3) if self.bytes_in else None,
+                "last_ratio": round(self.last_ratio, 3) if self.last_ratio is not None else None,
+                "avg_compress_ms": round(self.total_time / attempts * 1000, 3) if attempts else 0.0,
+                "max_compress_ms": round(self.max_time * 1000, 3),
+            }
+
+def create_compressor(algorithm):
+    """
+    Returns a compressor for the algorithm chosen by the server
+    
+    Args:
+        algorithm: Algorithm name from auth_ok, or None
+        
+    Returns:
+        FrameCompressor or None: None if compression is off or unsupported
+    """
+    if not algorithm:
+        return None
+    if algorithm not in supported_compression():
+        logger.warning(f"Unsupported compression '{algorithm}', sending uncompressed")
+        return None
+    return FrameCompressor(algorithm)
\ No newline at end of file
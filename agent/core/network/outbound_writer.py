@@ -0,0 +1,293 @@
+# agent/core/network/outbound_writer.py
+import time
+import queue
+import itertools
+import threading
+import agent.core.utils.logger as logger
+from agent.core.network.codec import build_batch
+
+# Send priorities, lower values are sent first
+PRIORITY_CONTROL = 0 # Authentication and other connection control frames
+PRIORITY_NORMAL = 1 # Command responses and small updates
+PRIORITY_BULK = 2 # Task results and result chunks
+
+MESSAGE_PRIORITIES = {
+    "auth": PRIORITY_CONTROL,
+    "error": PRIORITY_CONTROL,
+    "task_completed": PRIORITY_BULK,
+    "result_chunk": PRIORITY_BULK,
+}
+
+SEND_QUEUE_SIZE = 1024 # Maximum number of queued outbound messages
+BULK_ENQUEUE_TIMEOUT = 5.0 # Seconds a bulk sender waits for queue space
+COALESCE_WINDOW = 0.003 # Seconds to wait for more small messages to batch
+COALESCE_MAX_MESSAGES = 32 # Maximum messages per batch frame
+COALESCE_MAX_BYTES = 4096 # Messages up to this size can be batched
+BATCH_MAX_BYTES = 64 * 1024 # Maximum payload of one batch frame
+
+class OutboundWriter:
+    """
+    Single writer thread for all outbound WebSocket traffic.
+    
+    Senders on any thread enqueue already-serialized messages into a bounded
+    priority queue; only the writer thread touches the socket, so frames are
+    never interleaved and control frames overtake queued bulk results. Small
+    non-control messages that queue up within COALESCE_WINDOW are sent as one
+    {"type": "batch", "messages": [...]} frame.
+    """
+    
+    def __init__(self, send_frame, on_dropped=None):
+        """
+        Initialize the OutboundWriter
+        
+        Args:
+            send_frame: Function that writes one text frame to the socket and
+                        returns True on success
+            on_dropped: Optional function called with (payload, message_type)
+                        for every queued message without an on_result
+                        callback that could not be sent
+        """
+        self.send_frame = send_frame
+        self.on_dropped = on_dropped
+        self.send_queue = queue.PriorityQueue(maxsize=SEND_QUEUE_SIZE)
+        self.sequence = itertools.count()
+        self.writer_thread = None
+        self.is_running = False
+        # Item taken from the queue while batching that could not join the batch
+        self.carry = None
+        
+        # Metrics
+        self.stats_lock = threading.Lock()
+        self.enqueued_count = 0
+        self.rejected_count = 0
+        self.dropped_count = 0
+        self.sent_messages = 0
+        self.sent_frames = 0
+        self.sent_batches = 0
+        self.max_queue_depth = 0
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+        
+    def start(self):
+        """Start the writer thread"""
+        if self.is_running:
+            return
+            
+        self.is_running = True
+        self.writer_thread = threading.Thread(target=self._write_loop, name="OutboundWriter", daemon=True)
+        self.writer_thread.start()
+        logger.info("Outbound writer started")
+        
+    def enqueue(self, payload, message_type=None, priority=None, on_result=None):
+        """
+        Queue a serialized message for sending
+        
+        Args:
+            payload: Encoded message (JSON text or MessagePack bytes)
+            message_type: Message type, used to pick the default priority
+            priority: Explicit send priority (PRIORITY_*)
+            on_result: Optional function called with True once the message was
+                       written to the socket, or False if it could not be sent
+                       (instead of on_dropped)
+                       
+        Returns:
+            bool: True if the message was queued, False if the queue is full
+        """
+        if priority is None:
+            priority = MESSAGE_PRIORITIES.get(message_type, PRIORITY_NORMAL)
+            
+        item = (priority, next(self.sequence), time.monotonic(), payload, message_type, on_result)
+        try:
+            if priority == PRIORITY_BULK:
+                # Bulk senders are slowed down instead of failing right away
+                self.send_queue.put(item, timeout=BULK_ENQUEUE_TIMEOUT)
+            else:
+                self.send_queue.put_nowait(item)
+        except queue.Full:
+            with self.stats_lock:
+                self.rejected_count += 1
+            logger.warning(f"Outbound queue is full ({SEND_QUEUE_SIZE}), rejecting {message_type or 'message'}")
+            return False
+            
+        with self.stats_lock:
+            self.enqueued_count += 1
+            self.max_queue_depth = max(self.max_queue_depth, self.send_queue.qsize())
+        return True
+        
+    def _next_item(self, timeout):
+        """Return the carried-over item or the next queued one"""
+        if self.carry is not None:
+            item, self.carry = self.carry, None
+            return item
+        return self.send_queue.get(timeout=timeout)
+        
+    def _can_batch(self, item):
+        """Check whether a queued item may be part of a batch frame"""
+        return item[0] != PRIORITY_CONTROL and len(item[3]) <= COALESCE_MAX_BYTES
+        
+    def _collect_batch(self, first_item):
+        """
+        Collect small messages queued shortly after the first one
+        
+        Args:
+            first_item: Item that starts the batch
+            
+        Returns:
+            list: Items to send in one frame
+        """
+        items = [first_item]
+        if not self._can_batch(first_item):
+            return items
+            
+        batch_bytes = len(first_item[3])
+        deadline = time.monotonic() + COALESCE_WINDOW
+        while len(items) < COALESCE_MAX_MESSAGES:
+            remaining = deadline - time.monotonic()
+            try:
+                item = self.send_queue.get(timeout=remaining) if remaining > 0 else self.send_queue.get_nowait()
+            except queue.Empty:
+                break
+                
+            if (
+                item[3] is None
+                or not self._can_batch(item)
+                or type(item[3]) is not type(first_item[3])
+                or batch_bytes + len(item[3]) > BATCH_MAX_BYTES
+            ):
+                self.carry = item
+                break
+            items.append(item)
+            batch_bytes += len(item[3])
+            
+        return items
+        
+    def _write_loop(self):
+        """Writer thread function"""
+        while self.is_running:
+            try:
+                item = self._next_item(timeout=1.0)
+            except queue.Empty:
+                continue
+                
+            if item[3] is None:
+                # Stop sentinel
+                break
+                
+            items = self._collect_batch(item)
+            if len(items) == 1:
+                frame = items[0][3]
+            else:
+                frame = build_batch([entry[3] for entry in items])
+                
+            try:
+                sent = self.send_frame(frame)
+            except Exception as e:
+                logger.error(f"Error sending WebSocket frame: {e}")
+                sent = False
+                
+            if not sent:
+                self._drop(items)
+                continue
+                
+            now = time.monotonic()
+            with self.stats_lock:
+                self.sent_frames += 1
+                self.sent_messages += len(items)
+                if len(items) > 1:
+                    self.sent_batches += 1
+                for entry in items:
+                    latency = now - entry[2]
+                    self.total_latency += latency
+                    self.max_latency = max(self.max_latency, latency)
+                    
+            for entry in items:
+                if entry[5]:
+                    self._report(entry, True)
+                    
+    def _report(self, item, sent):
+        """Call the on_result callback of an item"""
+        try:
+            item[5](sent)
+        except Exception as e:
+            logger.error(f"Error handling outbound message result: {e}")
+            
+    def _drop(self, items):
+        """Count unsent items and hand them to their on_result or the on_dropped callback"""
+        with self.stats_lock:
+            self.dropped_count += len(items)
+            
+        for item in items:
+            if item[5]:
+                self._report(item, False)
+                continue
+            if not self.on_dropped:
+                continue
+            try:
+                self.on_dropped(item[3], item[4])
+            except Exception as e:
+                logger.error(f"Error handling dropped outbound message: {e}")
+                
+    def clear(self):
+        """
+        Drop every queued message (e.g. after the connection was lost)
+        
+        Returns:
+            int: Number of dropped messages
+        """
+        dropped = []
+        while True:
+            try:
+                item = self.send_queue.get_nowait()
+            except queue.Empty:
+                break
+            if item[3] is None:
+                # Keep the stop sentinel for the writer thread
+                self.send_queue.put_nowait(item)
+                break
+            dropped.append(item)
+            
+        if dropped:
+            logger.warning(f"Dropped {len(dropped)} queued outbound message(s)")
+            self._drop(dropped)
+        return len(dropped)
+        
+    def get_stats(self):
+        """
+        Returns queue depth and send latency metrics
+        
+        Returns:
+            dict: Queue depth, message/frame counters and average/maximum
+                  time (ms) from enqueue to send
+        """
+        with self.stats_lock:
+            sent_messages = self.sent_messages or 1
+            return {
+                "queue_depth": self.send_queue.qsize(),
+                "max_queue_depth": self.max_queue_depth,
+                "queue_capacity": SEND_QUEUE_SIZE,
+                "enqueued": self.enqueued_count,
+                "rejected": self.rejected_count,
+                "dropped": self.dropped_count,
+                "sent_messages": self.sent_messages,
+                "sent_frames": self.sent_frames,
+                "sent_batches": self.sent_batches,
+                "avg_send_latency_ms": round(self.total_latency / sent_messages * 1000, 2),
+                "max_send_latency_ms": round(self.max_latency * 1000, 2),
+            }
+            
+    def stop(self):
+        """Stop the writer thread"""
+        if not self.is_running:
+            return
+            
+        self.is_running = False
+        try:
+            # Sentinel sorts before every message so the writer wakes up at once
+            self.send_queue.put_nowait((-1, -1, 0.0, None, None, None))
+        except queue.Full:
+            pass
+            
+        if self.writer_thread and self.writer_thread.is_alive():
+            self.writer_thread.join(timeout=2)
+            
+        logger.info("Outbound writer stopped")
\ No newline at end of file
@@ -0,0 +1,289 @@
+# agent/core/network/outbox.py
+import os
+import json
+import time
+import threading
+from collections import OrderedDict
+import agent.core.utils.logger as logger
+
+OUTBOX_MESSAGE_TYPES = ("response", "task_completed", "alert") # Message types kept while disconnected
+MAX_OUTBOX_ENTRIES = 500 # Oldest messages are evicted beyond this count
+MAX_OUTBOX_BYTES = 16 * 1024 * 1024 # Oldest messages are evicted beyond this total payload size
+MAX_OUTBOX_AGE = 60 * 60 # Seconds a message is kept; the server gives up on a task after one hour
+
+class Outbox:
+    """
+    Bounded on-disk queue of results that could not be sent.
+    
+    Responses and task completions produced while the WebSocket is down are
+    appended to a JSON-lines file, so they also survive an agent restart.
+    A newer message for the same type and task ID replaces the older one.
+    The oldest messages are evicted when the outbox exceeds its entry or size
+    cap, and messages older than MAX_OUTBOX_AGE are discarded. After the next
+    successful authentication the messages are replayed in order; each one
+    is removed only once it was sent.
+    """
+    
+    def __init__(self, outbox_path):
+        """
+        Initialize the Outbox
+        
+        Args:
+            outbox_path: Path of the outbox file
+        """
+        self.outbox_path = outbox_path
+        self.file = None
+        self.lock = threading.Lock()
+        # Stored messages keyed by (message type, task ID), oldest first
+        self.entries = OrderedDict()
+        self.total_bytes = 0
+        # Entries handed out for replay and not yet acknowledged, by key
+        self.in_flight = {}
+        
+        # Metrics
+        self.stored_count = 0
+        self.replaced_count = 0
+        self.evicted_count = 0
+        self.expired_count = 0
+        self.replayed_count = 0
+        
+    def open(self):
+        """
+        Load messages left from a previous run and open the outbox for appending
+        
+        Returns:
+            int: Number of messages waiting to be sent
+        """
+        with self.lock:
+            if self.file:
+                return len(self.entries)
+                
+            self._load()
+            self._evict()
+            try:
+                os.makedirs(os.path.dirname(self.outbox_path), exist_ok=True)
+                self._rewrite()
+            except OSError as e:
+                logger.error(f"Failed to open outbox {self.outbox_path}: {e}")
+                self.file = None
+                
+            count = len(self.entries)
+            
+        if count:
+            logger.info(f"Outbox has {count} unsent message(s) from a previous run")
+        return count
+        
+    def _load(self):
+        """Read every record in the outbox file (caller holds the lock)"""
+        self.entries.clear()
+        self.total_bytes = 0
+        if not os.path.exists(self.outbox_path):
+            return
+            
+        try:
+            with open(self.outbox_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        # A torn last line from a crash mid-write; skip it
+                        continue
+                        
+                    if isinstance(record.get("ack"), list):
+                        # An entry sent after a replay
+                        previous = self.entries.pop(tuple(record["ack"]), None)
+                        if previous is not None:
+                            self.total_bytes -= len(previous[1])
+                        continue
+                        
+                    payload = record.get("payload")
+                    if not isinstance(payload, str):
+                        continue
+                    self._put((record.get("type"), record.get("task_id")), record.get("ts", 0), payload)
+        except OSError as e:
+            logger.error(f"Failed to read outbox {self.outbox_path}: {e}")
+            
+    def _put(self, key, timestamp, payload):
+        """
+        Add an entry in memory, replacing an older one for the same key (caller holds the lock)
+        
+        Returns:
+            bool: True if an older entry was replaced
+        """
+        previous = self.entries.pop(key, None)
+        if previous is not None:
+            self.total_bytes -= len(previous[1])
+        self.entries[key] = (timestamp, payload)
+        self.total_bytes += len(payload)
+        return previous is not None
+        
+    def _evict(self):
+        """
+        Drop expired entries and the oldest entries beyond the caps (caller holds the lock)
+        
+        Returns:
+            bool: True if any entry was dropped
+        """
+        dropped = False
+        cutoff = time.time() - MAX_OUTBOX_AGE
+        while self.entries:
+            key, (timestamp, payload) = next(iter(self.entries.items()))
+            if timestamp < cutoff:
+                self.expired_count += 1
+            elif len(self.entries) > MAX_OUTBOX_ENTRIES or self.total_bytes > MAX_OUTBOX_BYTES:
+                self.evicted_count += 1
+                logger.warning(f"Outbox is full, evicting unsent {key[0]} for task {key[1]}")
+            else:
+                break
+            del self.entries[key]
+            self.total_bytes -= len(payload)
+            dropped = True
+        return dropped
+        
+    def _rewrite(self):
+        """Rewrite the outbox file with the current entries (caller holds the lock)"""
+        if self.file:
+            self.file.close()
+            self.file = None
+            
+        temp_path = f"{self.outbox_path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            for key, (timestamp, payload) in self.entries.items():
+                f.write(self._format_record(key, timestamp, payload))
+        os.replace(temp_path, self.outbox_path)
+        
+        self.file = open(self.outbox_path, "a", encoding="utf-8")
+        
+    def _format_record(self, key, timestamp, payload):
+        """Returns the JSON line stored for one entry"""
+        return json.dumps({"type": key[0], "task_id": key[1], "ts": timestamp, "payload": payload}) + "\n"
+        
+    def add(self, payload, message_type, task_id):
+        """
+        Store a message that could not be sent
+        
+        Args:
+            payload: JSON text of the message
+            message_type: Message type, one of OUTBOX_MESSAGE_TYPES
+            task_id: Task ID (or alert ID) the message belongs to
+            
+        Returns:
+            bool: True if the message was stored
+        """
+        if message_type not in OUTBOX_MESSAGE_TYPES or not task_id:
+            return False
+            
+        key = (message_type, task_id)
+        timestamp = time.time()
+        with self.lock:
+            replaced = self._put(key, timestamp, payload)
+            self.stored_count += 1
+            if replaced:
+                self.replaced_count += 1
+                
+            try:
+                if replaced or self._evict():
+                    self._rewrite()
+                elif self.file:
+                    self.file.write(self._format_record(key, timestamp, payload))
+                    self.file.flush()
+            except (OSError, ValueError) as e:
+                logger.error(f"Failed to write outbox record: {e}")
+                
+        logger.info(f"Stored unsent {message_type} for task {task_id} in the outbox")
+        return True
+        
+    def take_pending(self):
+        """
+        Return the stored messages that are not being replayed yet, oldest first
+        
+        The messages stay in the outbox, also on disk, until ack() confirms
+        they were sent; release() makes them available again.
+        
+        Returns:
+            list[tuple]: (key, payload, message_type) of each message
+        """
+        with self.lock:
+            if self._evict():
+                try:
+                    self._rewrite()
+                except OSError as e:
+                    logger.error(f"Failed to rewrite outbox: {e}")
+                    
+            messages = []
+            for key, entry in self.entries.items():
+                if key not in self.in_flight:
+                    self.in_flight[key] = entry
+                    messages.append((key, entry[1], key[0]))
+                    
+        if messages:
+            logger.info(f"Replaying {len(messages)} message(s) from the outbox")
+        return messages
+        
+    def ack(self, key):
+        """
+        Remove a replayed message once it was sent
+        
+        A newer message stored for the same key while the old one was in
+        flight is kept.
+        
+        Args:
+            key: Key returned by take_pending()
+        """
+        with self.lock:
+            entry = self.in_flight.pop(key, None)
+            if entry is None or self.entries.get(key) is not entry:
+                return
+                
+            del self.entries[key]
+            self.total_bytes -= len(entry[1])
+            self.replayed_count += 1
+            try:
+                if not self.entries:
+                    self._rewrite()
+                elif self.file:
+                    # Removal record, applied when the file is loaded
+                    self.file.write(json.dumps({"ack": list(key)}) + "\n")
+                    self.file.flush()
+            except (OSError, ValueError) as e:
+                logger.error(f"Failed to write outbox record: {e}")
+                
+    def release(self, key):
+        """
+        Return a replayed message that could not be sent to the pending messages
+        
+        Args:
+            key: Key returned by take_pending()
+        """
+        with self.lock:
+            self.in_flight.pop(key, None)
+            
+    def get_stats(self):
+        """
+        Returns size and counters of the outbox
+        
+        Returns:
+            dict: Pending message count and bytes, messages being replayed,
+                  plus stored, replaced, evicted, expired and replayed counters
+        """
+        with self.lock:
+            return {
+                "pending": len(self.entries),
+                "in_flight": len(self.in_flight),
+                "pending_bytes": self.total_bytes,
+                "stored": self.stored_count,
+                "replaced": self.replaced_count,
+                "evicted": self.evicted_count,
+                "expired": self.expired_count,
+                "replayed": self.replayed_count,
+            }
+            
+    def close(self):
+        """Close the outbox file"""
+        with self.lock:
+            if self.file:
+                try:
+                    self.file.close()
+                except OSError as e:
+                    logger.error(f"Failed to close outbox: {e}")
+                self.file = None
\ No newline at end of file
@@ -0,0 +1,166 @@
+# agent/core/network/result_stream.py
+import time
+import threading
+import agent.core.utils.logger as logger
+
+CHUNK_ROWS = 200 # Rows per result_chunk message
+INITIAL_CREDIT = 4 # Chunks that may be sent before the server grants more
+STALL_TIMEOUT = 60 # Seconds to wait for credit before the stream is aborted
+
+class StreamAborted(Exception):
+    """Raised when a result stream stops before all rows were sent"""
+
+class ResultStream:
+    """
+    Sends the rows of one command result as a sequence of result_chunk messages.
+    
+    Rows are pulled from an iterator and sent CHUNK_ROWS at a time, so a large
+    result is never held in memory or written as one frame. Flow control is
+    credit based: each chunk consumes one credit, the stream starts with
+    INITIAL_CREDIT credits and waits for grant_credit messages from the server
+    when it runs out. The final task_completed message acts as the trailer;
+    it is only built if every chunk went out on one connection that is still
+    ready, since a queued chunk is lost when the connection drops.
+    """
+    
+    def __init__(self, websocket, command_type, task_id, response_format=None,
+                 chunk_rows=CHUNK_ROWS, initial_credit=INITIAL_CREDIT):
+        """
+        Initialize the ResultStream
+        
+        Args:
+            websocket: WebSocketConnection used to send the chunks
+            command_type: Type of command that produced the rows
+            task_id: Task ID the chunks belong to
+            response_format: Optional response format applied to each chunk
+            chunk_rows: Maximum rows per chunk
+            initial_credit: Chunks that may be sent without a grant
+        """
+        self.websocket = websocket
+        self.command_type = command_type
+        self.task_id = task_id
+        self.response_format = response_format
+        self.chunk_rows = chunk_rows
+        self.credit = initial_credit
+        self.credit_condition = threading.Condition()
+        self.is_aborted = False
+        self.chunk_count = 0
+        self.row_count = 0
+        # Connection the first chunk was sent on
+        self.generation = None
+        
+    def grant(self, credit):
+        """
+        Add send credit granted by the server
+        
+        Args:
+            credit: Number of additional chunks that may be sent
+        """
+        with self.credit_condition:
+            self.credit += credit
+            self.credit_condition.notify_all()
+            
+    def abort(self):
+        """Stop the stream; a send waiting for credit gives up immediately"""
+        with self.credit_condition:
+            self.is_aborted = True
+            self.credit_condition.notify_all()
+            
+    def _wait_for_credit(self, should_stop=None):
+        """
+        Block until one chunk may be sent and consume its credit
+        
+        Args:
+            should_stop: Optional callable returning True when the stream must stop
+            
+        Raises:
+            StreamAborted: If the stream was aborted, stopped or stalled
+        """
+        deadline = time.monotonic() + STALL_TIMEOUT
+        with self.credit_condition:
+            while True:
+                if self.is_aborted:
+                    raise StreamAborted("stream aborted")
+                if should_stop and should_stop():
+                    raise StreamAborted("stream stopped")
+                if self.credit > 0:
+                    break
+                    
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise StreamAborted(f"no credit granted within {STALL_TIMEOUT}s")
+                self.credit_condition.wait(min(remaining, 1.0))
+                
+            self.credit -= 1
+            
+    def _send_chunk(self, rows):
+        """Send one chunk of rows"""
+        message = {
+            "type": "result_chunk",
+            "command_type": self.command_type,
+            "task_id": self.task_id,
+            "seq": self.chunk_count,
+            "data": rows,
+        }
+        if self.response_format:
+            message["format"] = self.response_format
+            
+        if self.generation is None and self.websocket:
+            self.generation = self.websocket.get_generation()
+        if not self.websocket or not self.websocket.send(message):
+            raise StreamAborted("WebSocket is not connected")
+            
+        self.chunk_count += 1
+        self.row_count += len(rows)
+        
+    def _check_delivery(self):
+        """
+        Make sure no chunk was lost before the trailer is built
+        
+        Raises:
+            StreamAborted: If the connection changed or dropped since the first
+                           chunk, or a chunk of this task was dropped
+        """
+        if not self.chunk_count:
+            return
+        if (
+            not self.websocket.is_ready()
+            or self.websocket.get_generation() != self.generation
+            or self.websocket.has_dropped_chunks(self.task_id)
+        ):
+            raise StreamAborted("connection lost while streaming, result chunks may be missing")
+            
+    def send_rows(self, rows, should_stop=None):
+        """
+        Send every row from an iterator as result chunks
+        
+        Args:
+            rows: Iterable of rows, typically a generator
+            should_stop: Optional callable returning True when the stream must stop
+                         (e.g. the task was cancelled)
+                         
+        Returns:
+            dict: Stream summary for the task_completed trailer
+                  {"streamed": True, "chunks": int, "rows": int}
+                  
+        Raises:
+            StreamAborted: If the stream was aborted, stopped or stalled, or
+                           chunks may have been lost with the connection
+        """
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= self.chunk_rows:
+                self._wait_for_credit(should_stop)
+                self._send_chunk(batch)
+                batch = []
+                
+        if batch:
+            self._wait_for_credit(should_stop)
+            self._send_chunk(batch)
+            
+        self._check_delivery()
+        logger.info(
+            f"Streamed {self.row_count} rows in {self.chunk_count} chunks for {self.command_type} (Task ID: {self.task_id})"
+        )
+        return {"streamed": True, "chunks": self.chunk_count, "rows": self.row_count}
\ No newline at end of file
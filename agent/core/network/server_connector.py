@@ -1,10 +1,13 @@
 # agent/core/network/server_connector.py
-import socket
-import platform
+import os
+import json
 import requests
 import agent.core.utils.logger as logger
 import agent.core.helper.system_info as system_info
 
+# Configuration keys a saved session is bound to; changing any of them requires registration
+SESSION_CONFIG_KEYS = ("server_link", "room_name", "row_index", "column_index", "agent_uuid")
+
 class ServerConnector:
     """
     Responsible for connecting to the server API and handling communication
@@ -22,11 +25,88 @@ class ServerConnector:
         self.config_manager = config_manager
         self.ui_manager = ui_manager
         self.computer_id = None
+        self.resume_token = None
+        
+    def _get_session_path(self):
+        """Returns the path of the saved session file"""
+        return os.path.join(self.config_manager.config_dir, "session.json")
+        
+    def _load_session(self, config):
+        """
+        Load the saved session if it still matches the configuration
+        
+        Args:
+            config: Current configuration
+            
+        Returns:
+            dict or None: Saved session with computer_id and resume_token, or None
+                          if there is none, it is unreadable or the configuration changed
+        """
+        session_path = self._get_session_path()
+        if not os.path.exists(session_path):
+            return None
+            
+        try:
+            with open(session_path, "r", encoding="utf-8") as f:
+                session = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            logger.warning(f"Ignoring unreadable session file: {e}")
+            return None
+            
+        if not isinstance(session, dict) or not session.get("computer_id") or not session.get("resume_token"):
+            return None
+            
+        if any(session.get(key) != config.get(key) for key in SESSION_CONFIG_KEYS):
+            logger.info("Configuration changed since the last session, registering again")
+            return None
+            
+        return session
+        
+    def _save_session(self, config):
+        """
+        Save the computer ID and resume token together with the configuration they belong to
+        
+        Args:
+            config: Current configuration
+        """
+        session = {key: config.get(key) for key in SESSION_CONFIG_KEYS}
+        session["computer_id"] = self.computer_id
+        session["resume_token"] = self.resume_token
         
-    def connect_to_server(self):
+        session_path = self._get_session_path()
+        temp_path = f"{session_path}.tmp"
+        try:
+            os.makedirs(os.path.dirname(session_path), exist_ok=True)
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump(session, f)
+            os.replace(temp_path, session_path)
+        except OSError as e:
+            logger.error(f"Failed to save session: {e}")
+            
+    def clear_session(self):
+        """Forget the saved session so the next connection registers over HTTP"""
+        self.resume_token = None
+        try:
+            os.remove(self._get_session_path())
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.error(f"Failed to remove session file: {e}")
+            
+    def connect_to_server(self, force_register=False):
         """
         Connects to the server and obtains a computer ID
         
+        A saved session (computer ID and resume token) is reused without
+        contacting the server as long as the server link, room position and
+        agent UUID are unchanged; the WebSocket then authenticates with the
+        token. Otherwise, or with force_register, the agent registers through
+        the HTTP /connect endpoint.
+        
+        Args:
+            force_register: Register over HTTP even if a saved session exists
+                            (e.g. after the server rejected the resume token)
+                            
         Returns:
             bool: True if connection was successful, False otherwise
         """
@@ -36,24 +116,32 @@ class ServerConnector:
             logger.error("Cannot connect to server: No configuration available")
             return False
             
+        if force_register:
+            self.clear_session()
+        else:
+            session = self._load_session(config)
+            if session:
+                self.computer_id = session["computer_id"]
+                self.resume_token = session["resume_token"]
+                logger.info(f"Resuming saved session. Computer ID: {self.computer_id}")
+                
+                if self.ui_manager:
+                    self.ui_manager.update_status("Connected")
+                    
+                return True
+                
         api_url = self.config_manager.get_api_url()
         if not api_url:
             logger.error("Cannot connect to server: Invalid server link in configuration")
             return False
             
         try:
-            # Get system information for connection
-            hostname = socket.gethostname()
-            try:
-                ip_address = socket.gethostbyname(hostname)
-            except socket.gaierror:
-                logger.warning("Could not get IP address from hostname, using platform.node() instead")
-                hostname = platform.node()
+            # Get system information for connection (cached by the inventory)
+            hostname, ip_address, mac_address = system_info.get_basic_info()
+            if ip_address == "Unknown":
+                logger.warning("Could not determine the IP address, using 127.0.0.1 instead")
                 ip_address = "127.0.0.1"
-            
-            system_data = system_info.get_system_info()
-            mac_address = system_data.get("mac_address", "Unknown")
-            
+                
             # Prepare connection data
             data = {
                 "room_name": config["room_name"],
@@ -61,7 +149,8 @@ class ServerConnector:
                 "column_index": config["column_index"],
                 "hostname": hostname,
                 "ip_address": ip_address,
-                "mac_address": mac_address
+                "mac_address": mac_address,
+                "agent_uuid": config.get("agent_uuid"),
             }
             
             logger.info(f"Connecting to server: {api_url}/connect")
@@ -77,8 +166,12 @@ class ServerConnector:
             if response.status_code == 200:
                 response_data = response.json()
                 self.computer_id = response_data.get("id")
+                self.resume_token = response_data.get("resume_token")
                 logger.info(f"Successfully connected to server. Computer ID: {self.computer_id}")
                 
+                if self.resume_token:
+                    self._save_session(config)
+                    
                 if self.ui_manager:
                     self.ui_manager.update_status("Connected")
                     
@@ -165,6 +258,30 @@ class ServerConnector:
         """
         return self.computer_id
         
+    def get_resume_token(self):
+        """
+        Returns the token used to authenticate the WebSocket without registering
+        
+        Returns:
+            str: The resume token or None if the server did not issue one
+        """
+        return self.resume_token
+        
+    def update_resume_token(self, resume_token):
+        """
+        Store a renewed resume token sent by the server
+        
+        Args:
+            resume_token: The new token
+        """
+        if not resume_token or resume_token == self.resume_token:
+            return
+            
+        self.resume_token = resume_token
+        config = self.config_manager.get_config()
+        if config and self.computer_id:
+            self._save_session(config)
+            
     def set_ui_manager(self, ui_manager):
         """Set the UI manager for displaying status and errors"""
         self.ui_manager = ui_manager
\ No newline at end of file
@@ -1,17 +1,46 @@
 # agent/core/network/websocket_connection.py
+import os
+import functools
 import time
+import random
 import threading
-import json
 import websocket
+from collections import OrderedDict
 import agent.core.utils.logger as logger
+from agent.core.network.codec import JSON_CODEC, decode_frame, get_codec, supported_codecs
+from agent.core.network.columnar import FORMAT_COLUMNAR, encode_message
+from agent.core.network.compression import create_compressor, supported_compression
+from agent.core.network.outbound_writer import OutboundWriter, PRIORITY_CONTROL, PRIORITY_NORMAL
+from agent.core.network.outbox import Outbox, OUTBOX_MESSAGE_TYPES
+from agent.core.command.task_queue import TASK_STATUS_FAILED
+
+# Connection states
+STATE_DISCONNECTED = "disconnected"
+STATE_CONNECTING = "connecting"
+STATE_AUTHENTICATING = "authenticating"
+STATE_READY = "ready"
+
+BACKOFF_BASE = 1.0 # Seconds, upper bound of the first reconnect delay
+BACKOFF_CAP = 60.0 # Seconds, upper bound of any reconnect delay
+RETRY_AFTER_JITTER = 0.5 # Share of a server retry-after hint added as random spread
+MAX_RETRY_AFTER = 600.0 # Seconds, retry-after hints above this are capped
+MAX_DROPPED_STREAMS = 256 # Streamed results whose lost chunks are remembered
+PRE_AUTH_MESSAGE_TYPES = ("auth", "error") # Only these are sent before auth_ok
 
 class WebSocketConnection:
     """
     Responsible for managing the WebSocket connection to the server.
     Handles connection establishment, reconnection, and message passing.
+    
+    A single supervisor thread owns the connection lifecycle
+    (disconnected -> connecting -> authenticating -> ready). After a connection
+    is lost or fails, it waits a random delay between 0 and
+    min(BACKOFF_CAP, BACKOFF_BASE * 2^attempts) ("full jitter"), so agents
+    that lost the server at the same moment do not reconnect in lockstep.
+    A retry-after hint sent by the server replaces the backoff delay once.
     """
     
-    def __init__(self, config_manager, computer_id, agent_uuid, message_handler=None):
+    def __init__(self, config_manager, computer_id, agent_uuid, message_handler=None, server_connector=None, ready_handler=None):
         """
         Initialize WebSocket connection handler
         
@@ -19,18 +48,56 @@ class WebSocketConnection:
             config_manager: ConfigManager instance to get configuration
             computer_id: Computer ID from server connection
             agent_uuid: Agent UUID for authentication
-            message_handler: Function to handle incoming messages (optional)
+            message_handler: Function called with (ws, message) for every decoded
+                             incoming message (optional)
+            server_connector: ServerConnector holding the session resume token;
+                              used to register again if the server rejects it (optional)
+            ready_handler: Function called without arguments each time the server
+                           accepts the authentication (optional)
         """
         self.config_manager = config_manager
         self.computer_id = computer_id
         self.agent_uuid = agent_uuid
         self.message_handler = message_handler
+        self.ready_handler = ready_handler
+        self.server_connector = server_connector
+        self.auth_rejected = False
+        # Codec for outgoing messages, chosen by the server in auth_ok
+        self.codec = JSON_CODEC
+        # Frame compression chosen by the server in auth_ok; the compressor is
+        # kept across connections so its counters cover the agent's lifetime
+        self.compressor = None
+        self.compression_active = False
         self.ws = None
         self.is_connected = False
         self.is_stopping = False
-        self.reconnect_thread = None
+        self.stop_event = threading.Event()
+        self.supervisor_thread = None
         self.ws_url = self.config_manager.get_websocket_url()
         
+        # All outbound frames go through one writer thread
+        self.writer = OutboundWriter(self._send_frame, on_dropped=self._store_unsent)
+        
+        # Results that could not be sent are kept on disk until the next connection
+        self.outbox = Outbox(os.path.join(self.config_manager.config_dir, "outbox.jsonl"))
+        
+        # Task IDs of streamed results that lost result_chunk frames; their
+        # trailers are turned into failures instead of being sent as successes
+        self.dropped_streams = OrderedDict()
+        self.dropped_streams_lock = threading.Lock()
+        
+        # Connection state and reconnect metrics
+        self.state_lock = threading.Lock()
+        self.state = STATE_DISCONNECTED
+        self.failed_attempts = 0
+        self.retry_after = None
+        self.connect_attempts = 0
+        self.reconnect_count = 0
+        self.ready_count = 0
+        self.disconnected_since = time.monotonic()
+        self.total_disconnected_time = 0.0
+        self.last_backoff = 0.0
+        
     def start(self):
         """
         Start the WebSocket connection
@@ -50,36 +117,108 @@ class WebSocketConnection:
             logger.error("Cannot start WebSocket: No agent UUID")
             return False
             
+        if self.supervisor_thread and self.supervisor_thread.is_alive():
+            logger.warning("WebSocket connection is already running")
+            return True
+            
         self.is_stopping = False
+        self.stop_event.clear()
+        self.outbox.open()
+        self.writer.start()
         
-        # Start WebSocket in a separate thread to not block
-        connection_thread = threading.Thread(
-            target=self._connect_websocket,
+        # Start the supervisor in a separate thread to not block
+        self.supervisor_thread = threading.Thread(
+            target=self._supervise,
+            name="WebSocketSupervisor",
             daemon=True
         )
-        connection_thread.start()
+        self.supervisor_thread.start()
         
-        logger.info(f"WebSocket connection thread started for {self.ws_url}")
+        logger.info(f"WebSocket supervisor thread started for {self.ws_url}")
         return True
         
-    def _connect_websocket(self):
-        """Internal method to establish WebSocket connection with reconnection logic"""
+    def _set_state(self, state):
+        """
+        Move the connection state machine to a new state
+        
+        Args:
+            state: One of the STATE_* constants
+        """
+        with self.state_lock:
+            previous = self.state
+            if previous == state:
+                return
+            self.state = state
+            
+            now = time.monotonic()
+            if state == STATE_READY:
+                if self.disconnected_since is not None:
+                    self.total_disconnected_time += now - self.disconnected_since
+                    self.disconnected_since = None
+                self.failed_attempts = 0
+                self.ready_count += 1
+            elif previous == STATE_READY:
+                self.disconnected_since = now
+                
+        logger.info(f"WebSocket state: {previous} -> {state}")
+        
+    def _next_delay(self):
+        """
+        Returns the delay before the next connection attempt
+        
+        Returns:
+            float: Seconds to wait
+        """
+        with self.state_lock:
+            retry_after, self.retry_after = self.retry_after, None
+            attempts = self.failed_attempts
+            self.failed_attempts += 1
+            
+        if retry_after is not None:
+            # Honour the server's hint, spread out so its clients do not return together
+            delay = retry_after + random.uniform(0, retry_after * RETRY_AFTER_JITTER)
+        else:
+            delay = random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * (2 ** min(attempts, 16))))
+            
+        self.last_backoff = delay
+        return delay
+        
+    def _register_again(self):
+        """Register over HTTP after the server rejected the resume token"""
+        self.auth_rejected = False
+        if not self.server_connector:
+            return
+            
+        logger.info("Registering with the server again after the session was rejected")
+        if self.server_connector.connect_to_server(force_register=True):
+            self.computer_id = self.server_connector.get_computer_id()
+        else:
+            logger.error("Registration failed, retrying with the previous session")
+            
+    def _build_headers(self):
+        """Returns the Origin header expected by the server"""
+        config = self.config_manager.get_config()
+        link_parts = config["server_link"].split("://")
+        domain_part = link_parts[1].split("/")[0] if len(link_parts) > 1 else link_parts[0].split("/")[0]
+        origin_proto = "http" if config["server_link"].startswith("http:") else "https"
+        return {"Origin": f"{origin_proto}://{domain_part}"}
+        
+    def _supervise(self):
+        """Supervisor thread: connect, wait for the connection to end and reconnect with backoff"""
         websocket.enableTrace(False)
-        logger.info(f"Attempting to connect to WebSocket: {self.ws_url}")
         
         while not self.is_stopping:
+            self._set_state(STATE_CONNECTING)
+            with self.state_lock:
+                self.connect_attempts += 1
+                if self.connect_attempts > 1:
+                    self.reconnect_count += 1
+                    
             try:
-                # Extract domain for Origin header
-                config = self.config_manager.get_config()
-                link_parts = config["server_link"].split("://")
-                domain_part = link_parts[1].split("/")[0] if len(link_parts) > 1 else link_parts[0].split("/")[0]
-                origin_proto = "http" if config["server_link"].startswith("http:") else "https"
-                headers = {"Origin": f"{origin_proto}://{domain_part}"}
-                
                 # Set up WebSocket with callbacks
                 self.ws = websocket.WebSocketApp(
                     self.ws_url,
-                    header=headers,
+                    header=self._build_headers(),
                     on_message=self._on_message,
                     on_error=self._on_error,
                     on_close=self._on_close,
@@ -89,53 +228,172 @@ class WebSocketConnection:
                 
                 logger.info(f"Starting WebSocket connection to {self.ws_url}")
                 
-                # Run WebSocket loop with keep-alive
+                # Run WebSocket loop with keep-alive; returns when the connection ends
                 self.ws.run_forever(
                     skip_utf8_validation=True,
                     ping_interval=30,
                     ping_timeout=10,
                 )
                 
-                logger.warning("WebSocket run_forever loop exited. Reconnection handled by on_close.")
-                break
-                
             except websocket.WebSocketException as wse:
                 logger.error(f"WebSocket connection exception: {wse}")
             except Exception as e:
                 logger.error(f"Unexpected error in WebSocket connection loop: {e}")
                 
+            self.is_connected = False
+            self.ws = None
+            self._set_state(STATE_DISCONNECTED)
+            
+            # Messages queued for the lost connection cannot be delivered
+            self.writer.clear()
+            
             # Don't retry if stopping
             if self.is_stopping:
-                logger.info("WebSocket connection loop stopping as requested.")
+                logger.info("WebSocket supervisor stopping as requested.")
+                break
+                
+            if self.auth_rejected:
+                self._register_again()
+                
+            delay = self._next_delay()
+            logger.info(f"Reconnecting to WebSocket in {delay:.1f} seconds...")
+            if self.stop_event.wait(delay):
+                logger.info("Reconnection cancelled as stopping was requested.")
                 break
                 
-            logger.info("Waiting 5 seconds before retrying connection...")
-            time.sleep(5)
-            
     def _on_open(self, ws):
         """Callback when WebSocket connection is opened"""
         logger.info("WebSocket connection established.")
         self.is_connected = True
+        self.codec = JSON_CODEC
+        self.compression_active = False
+        self._set_state(STATE_AUTHENTICATING)
         
         try:
             # Send authentication message
             auth_message = {
                 "type": "auth", 
                 "computer_id": self.computer_id,
-                "agent_uuid": self.agent_uuid
+                "agent_uuid": self.agent_uuid,
+                "codecs": supported_codecs(),
+                "compression": supported_compression(),
             }
+            resume_token = self.server_connector.get_resume_token() if self.server_connector else None
+            if resume_token:
+                auth_message["resume_token"] = resume_token
             logger.info(f"Sending authentication message with computer_id: {self.computer_id} and agent_uuid: {self.agent_uuid}")
-            ws.send(json.dumps(auth_message))
+            self.send(auth_message, priority=PRIORITY_CONTROL)
         except Exception as e:
             logger.error(f"Failed to send auth message: {e}")
             
+    def _replay_outbox(self):
+        """
+        Queue the messages stored while disconnected, in order, once authenticated
+        
+        Each message stays in the outbox until the writer reports it sent, so
+        a connection lost during the replay loses nothing.
+        """
+        for key, payload, message_type in self.outbox.take_pending():
+            try:
+                message = JSON_CODEC.decode(payload)
+                message["replayed"] = True
+                # Chunks dropped after the trailer was stored are only known now
+                self._fail_incomplete_stream(message)
+                payload = self.codec.encode(message)
+            except (ValueError, TypeError) as e:
+                logger.error(f"Skipping unreadable outbox message: {e}")
+                self.outbox.ack(key)
+                continue
+                
+            # One priority for all replayed messages keeps them in their original order
+            on_result = functools.partial(self._on_replay_result, key)
+            if not self.writer.enqueue(payload, message_type, PRIORITY_NORMAL, on_result):
+                self.outbox.release(key)
+                
+    def _on_replay_result(self, key, sent):
+        """Remove a replayed message from the outbox once sent, or keep it for the next replay"""
+        if sent:
+            self.outbox.ack(key)
+        else:
+            self.outbox.release(key)
+            
     def _on_message(self, ws, message):
-        """Callback when message is received"""
+        """Callback when message is received; decodes it once for all handlers"""
+        try:
+            data = decode_frame(message)
+        except ValueError as e:
+            logger.error(f"[ERROR] Invalid message received: {e}")
+            self.send({"type": "error", "message": "Invalid message format"})
+            return
+            
+        if not isinstance(data, dict):
+            logger.error("[ERROR] Received a message that is not an object")
+            return
+            
+        if self._handle_control_message(data):
+            return
+            
         if self.message_handler:
-            self.message_handler(ws, message)
+            self.message_handler(ws, data)
         else:
             logger.warning("Received WebSocket message but no handler is registered")
             
+    def _handle_control_message(self, data):
+        """
+        Handle connection control messages from the server
+        
+        Args:
+            data: Decoded message
+            
+        Returns:
+            bool: True if the message was a control message
+        """
+        retry_after = data.get("retry_after")
+        if isinstance(retry_after, (int, float)) and retry_after >= 0:
+            with self.state_lock:
+                self.retry_after = min(float(retry_after), MAX_RETRY_AFTER)
+            logger.info(f"Server asked to retry after {retry_after} seconds")
+            
+        if data.get("type") == "auth_ok":
+            if self.server_connector:
+                self.server_connector.update_resume_token(data.get("resume_token"))
+            self.codec = get_codec(data.get("codec"))
+            self._set_compression(data.get("compression"))
+            logger.info(
+                f"Using the {self.codec.name} codec and "
+                f"{self.compressor.algorithm if self.compression_active else 'no'} compression for this connection"
+            )
+            # Replay before the ready state so older results go out before new
+            # ones, then again for anything stored while this ran
+            self._replay_outbox()
+            self._set_state(STATE_READY)
+            self._replay_outbox()
+            
+            if self.ready_handler:
+                try:
+                    self.ready_handler()
+                except Exception as e:
+                    logger.error(f"Error in connection ready handler: {e}")
+            return True
+            
+        if data.get("type") == "auth_failed":
+            # The server closes the connection; the supervisor registers again before reconnecting
+            logger.warning(f"Server rejected authentication: {data.get('code')}")
+            self.auth_rejected = True
+            return True
+        return data.get("type") == "retry_after"
+        
+    def _set_compression(self, algorithm):
+        """
+        Enable the frame compression chosen by the server for this connection
+        
+        Args:
+            algorithm: Algorithm name from auth_ok, or None for no compression
+        """
+        if algorithm and (not self.compressor or self.compressor.algorithm != algorithm):
+            self.compressor = create_compressor(algorithm)
+        self.compression_active = bool(algorithm) and self.compressor is not None
+        
     def _on_error(self, ws, error_obj):
         """Callback when error occurs in WebSocket"""
         error_message = str(error_obj) if error_obj else "Unknown WebSocket error"
@@ -143,86 +401,258 @@ class WebSocketConnection:
         self.is_connected = False
         
     def _on_close(self, ws, close_status_code, close_msg):
-        """Callback when WebSocket connection is closed"""
+        """Callback when WebSocket connection is closed; the supervisor reconnects"""
         logger.warning(f"WebSocket connection closed. Status: {close_status_code}, Message: {close_msg}")
         self.is_connected = False
-        self.ws = None
         
-        # Don't reconnect if stopping
-        if self.is_stopping:
-            logger.info("WebSocket closed, not reconnecting as stopping was requested.")
-            return
-            
-        logger.info("Attempting to reconnect in 5 seconds...")
+    def send(self, message, priority=None):
+        """
+        Queue a message for the writer thread
         
-        # Start reconnection in a new thread
-        if not self.reconnect_thread or not self.reconnect_thread.is_alive():
-            self.reconnect_thread = threading.Thread(target=self._reconnect)
-            self.reconnect_thread.daemon = True
-            self.reconnect_thread.start()
-            
-    def _reconnect(self):
-        """Handle reconnection after connection loss"""
-        time.sleep(5)  # Wait before reconnecting
+        Messages with "format": "columnar" have the tables in their data
+        sent in the columnar encoding. The message is serialized with the
+        connection's codec on the calling thread; only the writer thread
+        writes to the socket.
+        Responses and task completions that cannot be queued because the
+        WebSocket is down, or is not authenticated yet, are stored in the
+        outbox and sent after the next authentication; the server ignores
+        anything but PRE_AUTH_MESSAGE_TYPES until it accepted the agent.
         
-        if self.is_stopping:
-            logger.info("Reconnection cancelled as stopping was requested.")
-            return
+        Args:
+            message: Message object to send (encoded with the connection's codec)
+            priority: Optional send priority (see outbound_writer); by default
+                      it is derived from the message type
+                      
+        Returns:
+            bool: True if message was queued for sending (or stored in the
+                  outbox), False otherwise
+        """
+        try:
+            message_type = None
+            if isinstance(message, dict):
+                message_type = message.get("type")
+                if message.get("format") == FORMAT_COLUMNAR:
+                    message = encode_message(message)
+                message_str = self.codec.encode(message)
+            elif isinstance(message, str):
+                message_str = message
+            else:
+                message_str = self.codec.encode({"data": str(message)})
+                
+        except Exception as e:
+            logger.error(f"Error sending WebSocket message: {e}")
+            return False
+            
+        if not self.ws or not self.is_connected:
+            if self._store_unsent(message_str, message_type):
+                return True
+            logger.warning("Cannot send message: WebSocket is not connected")
+            return False
+            
+        if self.state != STATE_READY and message_type not in PRE_AUTH_MESSAGE_TYPES:
+            if self._store_unsent(message_str, message_type):
+                return True
+            logger.warning(f"Cannot send {message_type} message: WebSocket is not authenticated")
+            return False
             
-        logger.info("Reconnecting to WebSocket...")
-        self._connect_websocket()
+        if self.writer.enqueue(message_str, message_type, priority):
+            return True
+        return self._store_unsent(message_str, message_type)
         
-    def send(self, message):
+    def _store_unsent(self, payload, message_type):
         """
-        Send a message through the WebSocket
+        Keep a message that could not be sent in the outbox
+        
+        Dropped result chunks are not kept; the trailer of their stream is
+        stored as a failure instead, so the server never receives a
+        successful result whose rows were lost.
         
         Args:
-            message: Message object to send (will be JSON-encoded)
+            payload: Encoded message (JSON text or MessagePack bytes)
+            message_type: Message type
             
         Returns:
-            bool: True if message was sent, False otherwise
+            bool: True if the message was stored
         """
-        if not self.ws or not self.is_connected:
-            logger.warning("Cannot send message: WebSocket is not connected")
+        if message_type != "result_chunk" and message_type not in OUTBOX_MESSAGE_TYPES:
             return False
             
         try:
-            if isinstance(message, dict):
-                message_str = json.dumps(message)
-            elif isinstance(message, str):
-                message_str = message
-            else:
-                message_str = json.dumps({"data": str(message)})
+            message = decode_frame(payload)
+            # Alerts are not tied to a task and are kept under their own ID
+            task_id = message.get("task_id") or message.get("alert_id")
+        except (ValueError, AttributeError):
+            return False
+            
+        if message_type == "result_chunk":
+            # Chunks are not kept; the trailer of their stream reports the loss
+            self._record_dropped_chunk(task_id)
+            return False
+            
+        # The outbox keeps JSON text; the next connection may use another codec
+        if self._fail_incomplete_stream(message) or isinstance(payload, bytes):
+            payload = JSON_CODEC.encode(message)
+        return self.outbox.add(payload, message_type, task_id)
+        
+    def _record_dropped_chunk(self, task_id):
+        """Remember that a result_chunk of a task was not sent"""
+        if not task_id:
+            return
+        with self.dropped_streams_lock:
+            self.dropped_streams[task_id] = True
+            self.dropped_streams.move_to_end(task_id)
+            while len(self.dropped_streams) > MAX_DROPPED_STREAMS:
+                self.dropped_streams.popitem(last=False)
                 
-            self.ws.send(message_str)
-            return True
+    def has_dropped_chunks(self, task_id):
+        """
+        Check whether any result_chunk of a task could not be sent
+        
+        Args:
+            task_id: Task ID of the streamed result
             
-        except Exception as e:
-            logger.error(f"Error sending WebSocket message: {e}")
+        Returns:
+            bool: True if at least one chunk was dropped
+        """
+        with self.dropped_streams_lock:
+            return task_id in self.dropped_streams
+            
+    def _fail_incomplete_stream(self, message):
+        """
+        Turn the trailer of a streamed result that lost chunks into a failure
+        
+        Args:
+            message: Decoded message, changed in place
+            
+        Returns:
+            bool: True if the message was changed
+        """
+        data = message.get("data")
+        if (
+            message.get("type") != "task_completed"
+            or not isinstance(data, dict)
+            or not data.get("streamed")
+            or not self.has_dropped_chunks(message.get("task_id"))
+        ):
+            return False
+            
+        logger.warning(f"Result chunks of task {message.get('task_id')} were lost, reporting it as failed")
+        message["success"] = False
+        message["status"] = TASK_STATUS_FAILED
+        message["message"] = f"Task '{message.get('command_type')}' lost result chunks when the connection dropped"
+        message["data"] = None
+        message.pop("format", None)
+        return True
+        
+    def _send_frame(self, frame):
+        """
+        Write one frame to the socket (writer thread only)
+        
+        Frames above the compression threshold are wrapped in a compressed
+        envelope when the connection negotiated compression.
+        
+        Args:
+            frame: JSON text (sent as a text frame) or MessagePack bytes
+                   (sent as a binary frame)
+                   
+        Returns:
+            bool: True if the frame was written, False if not connected
+        """
+        ws = self.ws
+        if not ws or not self.is_connected:
             return False
             
+        if self.compression_active:
+            frame = self.compressor.compress(frame)
+            
+        if isinstance(frame, bytes):
+            ws.send(frame, opcode=websocket.ABNF.OPCODE_BINARY)
+        else:
+            ws.send(frame)
+        return True
+        
+    def get_stats(self):
+        """
+        Returns outbound queue, send latency, outbox, connection and compression metrics
+        
+        Returns:
+            dict: Metrics of the outbound writer, with the outbox, connection
+                  and compression metrics under their own keys
+        """
+        return {
+            **self.writer.get_stats(),
+            "outbox": self.outbox.get_stats(),
+            "connection": self.get_connection_stats(),
+            "compression": self.compressor.get_stats() if self.compressor else None,
+        }
+        
+    def is_ready(self):
+        """
+        Check whether the connection is authenticated and ready
+        
+        Returns:
+            bool: True in the ready state
+        """
+        return self.state == STATE_READY
+        
+    def get_generation(self):
+        """
+        Returns an identifier of the current authenticated connection
+        
+        Returns:
+            int: Number of times the connection became ready; it changes on
+                 every reconnect
+        """
+        return self.ready_count
+        
+    def get_connection_stats(self):
+        """
+        Returns the connection state and reconnect metrics
+        
+        Returns:
+            dict: Current state, attempt and reconnect counters and the total
+                  time (seconds) spent without a ready connection
+        """
+        with self.state_lock:
+            disconnected_time = self.total_disconnected_time
+            if self.disconnected_since is not None:
+                disconnected_time += time.monotonic() - self.disconnected_since
+            return {
+                "state": self.state,
+                "connect_attempts": self.connect_attempts,
+                "reconnects": self.reconnect_count,
+                "ready_count": self.ready_count,
+                "failed_attempts": self.failed_attempts,
+                "last_backoff_seconds": round(self.last_backoff, 2),
+                "disconnected_seconds": round(disconnected_time, 1),
+            }
+            
     def stop(self):
         """Stop the WebSocket connection"""
         logger.info("Stopping WebSocket connection...")
         self.is_stopping = True
+        self.stop_event.set()
         
-        if self.ws:
+        ws = self.ws
+        if ws:
             try:
                 logger.info("Closing WebSocket connection...")
-                self.ws.close()
+                ws.close()
                 logger.info("WebSocket connection closed.")
             except Exception as e:
                 logger.error(f"Error closing WebSocket: {e}")
         else:
             logger.info("WebSocket was not connected.")
             
-        # Wait for reconnect thread to finish if it's running
-        if self.reconnect_thread and self.reconnect_thread.is_alive():
-            logger.info("Waiting for reconnect thread to finish...")
-            self.reconnect_thread.join(timeout=2)
+        # Wait for the supervisor to finish, it also clears the send queue
+        if self.supervisor_thread and self.supervisor_thread.is_alive():
+            logger.info("Waiting for WebSocket supervisor to finish...")
+            self.supervisor_thread.join(timeout=2)
             
-            if self.reconnect_thread.is_alive():
-                logger.warning("Reconnect thread did not stop within timeout.")
+            if self.supervisor_thread.is_alive():
+                logger.warning("WebSocket supervisor did not stop within timeout.")
                 
         self.is_connected = False
+        self.writer.stop()
+        self.outbox.close()
         logger.info("WebSocket connection stopped.")
\ No newline at end of file
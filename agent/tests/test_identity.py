@@ -0,0 +1,40 @@
+# agent/tests/test_identity.py
+import sys
+import types
+import unittest
+from unittest import mock
+
+try:
+    import psutil
+except ImportError:
+    # The identity format does not depend on psutil; a placeholder lets the module import
+    psutil = None
+
+class IdentityMacFormatTest(unittest.TestCase):
+    """
+    The registration MAC is compared by the server as a plain string, so its
+    format must stay what agents sent before the inventory was added
+    """
+    
+    @classmethod
+    def setUpClass(cls):
+        modules = {} if psutil else {"psutil": types.ModuleType("psutil")}
+        with mock.patch.dict(sys.modules, modules):
+            import agent.core.helper.inventory as inventory
+        cls.inventory = inventory
+        
+    def test_identity_mac_keeps_registration_format(self):
+        self.assertEqual(self.inventory.format_identity_mac(0x1A2B3C4D5E6F), "a1:b2:c3:d4:e5:f6")
+        self.assertEqual(self.inventory.format_identity_mac(0x001122334455), "00:11:22:33:44:55")
+        
+    def test_locally_administered_mac(self):
+        self.assertEqual(self.inventory.format_identity_mac(0x010000000000), "Locally Administered")
+        
+    def test_get_identity_uses_registration_format(self):
+        static = {"hostname": "lab-pc", "ip_address": "10.0.0.5", "mac_address": "1a:2b:3c:4d:5e:6f"}
+        with mock.patch.object(self.inventory, "get_static", return_value=(static, "fingerprint")), \
+                mock.patch.object(self.inventory.uuid, "getnode", return_value=0x1A2B3C4D5E6F):
+            self.assertEqual(self.inventory.get_identity(), ("lab-pc", "10.0.0.5", "a1:b2:c3:d4:e5:f6"))
+            
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,99 @@
+# agent/tools/benchmark_codec.py
+"""
+Micro-benchmark of the WebSocket message codecs on process-list payloads.
+
+Usage (from the repository root):
+    python -m agent.tools.benchmark_codec [--rows 400] [--repeat 200]
+
+Reports the encode and decode time per message and the encoded size for
+stdlib json, orjson and MessagePack, each on plain rows and on the columnar
+encoding. Codecs whose library is not installed are skipped.
+"""
+import os
+import sys
+import json
+import random
+import argparse
+import timeit
+
+if __package__ in (None, ""):
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from agent.core.network import codec
+from agent.core.network.columnar import encode_value
+
+PROCESS_NAMES = [
+    "svchost.exe", "chrome.exe", "explorer.exe", "RuntimeBroker.exe", "conhost.exe",
+    "MsMpEng.exe", "python.exe", "code.exe", "SearchHost.exe", "dllhost.exe",
+]
+USERNAMES = ["NT AUTHORITY\\SYSTEM", "NT AUTHORITY\\LOCAL SERVICE", "LAB-PC\\student", None]
+STATUSES = ["running", "sleeping", "stopped"]
+
+def make_process_rows(count, seed=42):
+    """Build rows shaped like get_process_list() output"""
+    rng = random.Random(seed)
+    return [
+        {
+            "pid": 4 + index * 4,
+            "name": rng.choice(PROCESS_NAMES),
+            "status": rng.choice(STATUSES),
+            "username": rng.choice(USERNAMES),
+            "create_time": 1760000000.0 + rng.random() * 86400,
+            "cpu_percent": round(rng.random() * 20, 1),
+            "memory_mb": round(rng.random() * 800, 1),
+        }
+        for index in range(count)
+    ]
+
+def make_message(rows):
+    """Wrap rows in a task_completed message"""
+    return {
+        "type": "task_completed",
+        "command_type": "get_process_list",
+        "task_id": "3f1c2b8e-7d4a-4f7e-9a51-0c2d6e8b9f10",
+        "success": True,
+        "status": "completed",
+        "message": "Task 'get_process_list' completed successfully",
+        "data": rows,
+    }
+
+def get_codecs():
+    """Returns (name, encode, decode) for every codec available here"""
+    codecs = [("json", json.dumps, json.loads)]
+    if codec.orjson:
+        codecs.append(("orjson", codec.JSON_CODEC.encode, codec.JSON_CODEC.decode))
+    if codec.MSGPACK_CODEC:
+        codecs.append(("msgpack", codec.MSGPACK_CODEC.encode, codec.MSGPACK_CODEC.decode))
+    return codecs
+
+def run(rows_count, repeat):
+    """Time every codec and print one line per codec and payload layout"""
+    rows = make_process_rows(rows_count)
+    payloads = [
+        ("rows", make_message(rows)),
+        ("columnar", make_message(encode_value(rows))),
+    ]
+
+    print(f"{rows_count} process rows, best of 5 x {repeat} runs")
+    print(f"{'codec':<10}{'layout':<10}{'encode us':>12}{'decode us':>12}{'bytes':>10}")
+    for name, encode, decode in get_codecs():
+        for layout, message in payloads:
+            encoded = encode(message)
+            encode_time = min(timeit.repeat(lambda: encode(message), number=repeat, repeat=5)) / repeat
+            decode_time = min(timeit.repeat(lambda: decode(encoded), number=repeat, repeat=5)) / repeat
+            size = len(encoded.encode("utf-8") if isinstance(encoded, str) else encoded)
+            print(f"{name:<10}{layout:<10}{encode_time * 1e6:>12.1f}{decode_time * 1e6:>12.1f}{size:>10}")
+
+    missing = [library for library, module in (("orjson", codec.orjson), ("msgpack", codec.msgpack)) if not module]
+    if missing:
+        print(f"Not installed, skipped: {', '.join(missing)}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark WebSocket message codecs")
+    parser.add_argument("--rows", type=int, default=400, help="Process rows per message")
+    parser.add_argument("--repeat", type=int, default=200, help="Runs per timing sample")
+    args = parser.parse_args()
+    run(args.rows, args.repeat)
+
+if __name__ == "__main__":
+    main()
@@ -143,6 +143,7 @@ const ComputerDetails = () => {
         try {
             const res = await computers.getNetActivities(id);
             setNetworkActivities(res.data.networkConnections.data || []);
+            pollNetworkHostnames(res.data.networkConnections.task_id);
         } catch (err) {
             setError(err.response?.data || "Failed to load network activities");
         } finally {
@@ -150,6 +151,35 @@ const ComputerDetails = () => {
         }
     };
 
+    // Remote hostnames are resolved after the connection table is returned
+    const pollNetworkHostnames = async (taskId) => {
+        if (!taskId) return;
+        let after = 0;
+        for (let attempt = 0; attempt < 30; attempt++) {
+            await new Promise((resolve) => setTimeout(resolve, 500));
+            try {
+                const res = await computers.getNetHostnames(id, taskId, after);
+                const { remoteHosts, next, done } = res.data;
+                after = next;
+                if (remoteHosts.length > 0) {
+                    setNetworkActivities((activities) =>
+                        activities.map((activity, index) => {
+                            const update = remoteHosts.find(
+                                (host) => host.index === index
+                            );
+                            return update
+                                ? { ...activity, remote_host: update.remote_host }
+                                : activity;
+                        })
+                    );
+                }
+                if (done) return;
+            } catch (err) {
+                return;
+            }
+        }
+    };
+
     const loadApplicationsData = async () => {
         setAppsLoading(true);
         try {
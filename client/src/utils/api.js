@@ -181,7 +181,23 @@ export const computers = {
     // monitor
     getProcesses: (id) => api.get(`/computer/${id}/processes`),
     getNetActivities: (id) => api.get(`/computer/${id}/network`),
+    getNetHostnames: (id, taskId, after = 0) =>
+        api.get(`/computer/${id}/network/${taskId}/hostnames`, {
+            params: { after },
+        }),
     getApplications: (id) => api.get(`/computer/${id}/applications`),
+    getInventory: (id, refresh = false) =>
+        api.get(`/computer/${id}/inventory`, { params: { refresh } }),
+    getMetrics: (id, params = {}) =>
+        api.get(`/computer/${id}/metrics`, { params }),
+    subscribe: (id, data) => api.post(`/computer/${id}/subscriptions`, data),
+    unsubscribe: (id, subscriptionId) =>
+        api.delete(`/computer/${id}/subscriptions/${subscriptionId}`),
+    getLive: (id, collector) => api.get(`/computer/${id}/live/${collector}`),
+    getAlertRules: (id) => api.get(`/computer/${id}/alert-rules`),
+    updateAlertRules: (id, rules) =>
+        api.put(`/computer/${id}/alert-rules`, { rules }),
+    getAlerts: (id) => api.get(`/computer/${id}/alerts`),
 
     // manage
     installApplication: (data) =>
@@ -8,6 +8,8 @@ const config = {
     refreshTokenSecret: process.env.REFRESH_TOKEN_SECRET || "refresh-secret",
     refreshTokenExpiration: process.env.REFRESH_TOKEN_EXPIRATION || "7d",
     accessTokenExpiration: process.env.ACCESS_TOKEN_EXPIRATION || "1m",
+    resumeTokenSecret: process.env.RESUME_TOKEN_SECRET || "resume-secret",
+    resumeTokenExpiration: process.env.RESUME_TOKEN_EXPIRATION || "30d",
 };
 
 module.exports = config;
@@ -2,6 +2,7 @@ const Computer = require("../models/computer.model");
 const Room = require("../models/room.model");
 const Application = require("../models/application.model");
 const File = require("../models/file.model");
+const jwt = require("../utils/jwt");
 
 const AgentController = {
     connect: async (req, res) => {
@@ -13,6 +14,7 @@ const AgentController = {
                 ip_address,
                 mac_address,
                 hostname,
+                agent_uuid,
             } = req.body;
             
             if (!room_name) {
@@ -106,11 +108,16 @@ const AgentController = {
                 });
             }
             
-            // Return both message and ID as expected by the agent
-            return res.json({ 
+            // Return both message and ID as expected by the agent; agents that send
+            // their UUID also get a token to authenticate the WebSocket directly next time
+            const response = { 
                 message: "Connected successfully", 
                 id: computerId 
-            });
+            };
+            if (agent_uuid) {
+                response.resume_token = jwt.signResumeToken(computerId, agent_uuid);
+            }
+            return res.json(response);
         } catch (err) {
             console.error("Agent connect error:", err);
             if (err.code === "SQLITE_CONSTRAINT") {
@@ -3,7 +3,40 @@ const Application = require("../models/application.model");
 const File = require("../models/file.model");
 const { db } = require("../configs/db");
 
-const { sendCommandToComputer } = require("../utils/agentCommunication");
+const {
+    sendCommandToComputer,
+    getTaskUpdates,
+    subscribeComputer,
+    unsubscribeComputer,
+    getSubscriptionView,
+    getComputerAlerts,
+} = require("../utils/agentCommunication");
+
+const SUBSCRIPTION_COLLECTORS = ["metrics", "processes", "connections"];
+
+// Collector params: optional ?fields=a,b,c projection and ?query={...} filter
+const parseCollectorParams = (query) => {
+    // Tables are requested in the compact columnar format and decoded on receipt
+    const params = { format: "columnar" };
+    if (query.fields) {
+        const fields = String(query.fields)
+            .split(",")
+            .map((field) => field.trim())
+            .filter(Boolean);
+        if (fields.length > 0) params.fields = fields;
+    }
+    if (query.query) {
+        try {
+            const parsed = JSON.parse(query.query);
+            if (parsed && typeof parsed === "object" && !Array.isArray(parsed)) {
+                params.query = parsed;
+            }
+        } catch (e) {
+            console.error("Ignoring malformed collector query:", query.query);
+        }
+    }
+    return params;
+};
 
 const ComputerController = {
     all: async (req, res) => {
@@ -64,7 +97,8 @@ const ComputerController = {
 
             const processList = await sendCommandToComputer(
                 id,
-                "get_process_list"
+                "get_process_list",
+                parseCollectorParams(req.query)
             );
 
             if (!processList) {
@@ -99,7 +133,9 @@ const ComputerController = {
 
             const networkConnections = await sendCommandToComputer(
                 id,
-                "get_network_connections"
+                "get_network_connections",
+                // Large connection tables arrive in flow-controlled chunks
+                { ...parseCollectorParams(req.query), stream: true }
             );
 
             if (!networkConnections) {
@@ -115,6 +151,240 @@ const ComputerController = {
         }
     },
 
+    viewNetHostnames: async (req, res) => {
+        try {
+            const { taskId } = req.params;
+            const after = parseInt(req.query.after, 10) || 0;
+            const { updates, next, done } = getTaskUpdates(taskId, after);
+
+            // Flatten the streamed batches into index/hostname pairs
+            const remoteHosts = updates.flatMap(
+                (update) => update.remote_hosts || []
+            );
+
+            res.status(200).json({ remoteHosts, next, done });
+        } catch (error) {
+            console.error("Error viewing network hostnames:", error);
+            res.status(500).json({ error: "Internal server error" });
+        }
+    },
+
+    viewInventory: async (req, res) => {
+        try {
+            const { id } = req.params;
+            const isOnline = await Computer.isOnline(id);
+            if (!isOnline) {
+                return res.status(503).json({
+                    error: "Computer is offline. Please try again when it's online.",
+                });
+            }
+
+            // ?refresh=true rebuilds the agent's cached hardware and OS facts
+            const response = await sendCommandToComputer(id, "get_system_info", {
+                refresh: req.query.refresh === "true",
+            });
+
+            if (!response || !response.success) {
+                return res.status(503).json({
+                    error: "Unable to retrieve inventory from the computer",
+                });
+            }
+
+            res.status(200).json({ inventory: response.data });
+        } catch (error) {
+            console.error("Error viewing computer inventory:", error);
+            res.status(500).json({ error: "Internal server error" });
+        }
+    },
+
+    viewMetrics: async (req, res) => {
+        try {
+            const { id } = req.params;
+            const computer = await Computer.findById(id);
+
+            if (!computer) {
+                res.status(404).send("Computer not found");
+                return;
+            }
+
+            const isOnline = await Computer.isOnline(id);
+            if (!isOnline) {
+                return res.status(503).json({
+                    error: "Computer is offline. Please try again when it's online.",
+                });
+            }
+
+            // ?window=seconds, ?metrics=a,b and ?resolution=1m select the recorded history
+            const params = {};
+            const window = parseInt(req.query.window, 10);
+            if (window > 0) params.window = window;
+            if (req.query.metrics) {
+                params.metrics = String(req.query.metrics)
+                    .split(",")
+                    .map((metric) => metric.trim())
+                    .filter(Boolean);
+            }
+            if (req.query.resolution) params.resolution = String(req.query.resolution);
+
+            const response = await sendCommandToComputer(id, "get_metrics_history", params);
+
+            if (!response || !response.success) {
+                return res.status(503).json({
+                    error: "Unable to retrieve metrics from the computer",
+                });
+            }
+
+            res.status(200).json({ metrics: response.data });
+        } catch (error) {
+            console.error("Error viewing computer metrics:", error);
+            res.status(500).json({ error: "Internal server error" });
+        }
+    },
+
+    subscribe: async (req, res) => {
+        try {
+            const { id } = req.params;
+            const { collector, interval, fields, query, metrics } = req.body;
+
+            if (!SUBSCRIPTION_COLLECTORS.includes(collector)) {
+                return res.status(400).json({
+                    error: `Collector must be one of: ${SUBSCRIPTION_COLLECTORS.join(", ")}`,
+                });
+            }
+
+            const isOnline = await Computer.isOnline(id);
+            if (!isOnline) {
+                return res.status(503).json({
+                    error: "Computer is offline. Please try again when it's online.",
+                });
+            }
+
+            // Same options as the matching collector commands; tables are pushed columnar
+            const options = { format: "columnar" };
+            if (Array.isArray(fields)) options.fields = fields;
+            if (query && typeof query === "object") options.query = query;
+            if (Array.isArray(metrics)) options.metrics = metrics;
+
+            const response = await subscribeComputer(
+                id,
+                collector,
+                parseInt(interval, 10) || 5,
+                options
+            );
+
+            if (!response || !response.success) {
+                return res.status(400).json({
+                    error: (response && response.message) || "Unable to subscribe",
+                });
+            }
+
+            res.status(201).json(response.data);
+        } catch (error) {
+            console.error("Error subscribing to computer:", error);
+            res.status(500).json({ error: "Internal server error" });
+        }
+    },
+
+    unsubscribe: async (req, res) => {
+        try {
+            const { id, subscriptionId } = req.params;
+            const removed = await unsubscribeComputer(id, subscriptionId);
+
+            if (!removed) {
+                return res.status(404).json({ error: "Subscription not found" });
+            }
+
+            res.status(200).json({ message: "Unsubscribed successfully" });
+        } catch (error) {
+            console.error("Error unsubscribing from computer:", error);
+            res.status(500).json({ error: "Internal server error" });
+        }
+    },
+
+    // Latest data pushed by a subscription, served without contacting the agent
+    viewLive: async (req, res) => {
+        try {
+            const { id, collector } = req.params;
+            const view = getSubscriptionView(id, collector);
+
+            if (!view) {
+                return res.status(404).json({
+                    error: `No ${collector} subscription for this computer`,
+                });
+            }
+
+            res.status(200).json(view);
+        } catch (error) {
+            console.error("Error viewing live computer data:", error);
+            res.status(500).json({ error: "Internal server error" });
+        }
+    },
+
+    viewAlertRules: async (req, res) => {
+        try {
+            const { id } = req.params;
+            const isOnline = await Computer.isOnline(id);
+            if (!isOnline) {
+                return res.status(503).json({
+                    error: "Computer is offline. Please try again when it's online.",
+                });
+            }
+
+            const response = await sendCommandToComputer(id, "get_alert_rules");
+            if (!response || !response.success) {
+                return res.status(503).json({
+                    error: "Unable to retrieve alert rules from the computer",
+                });
+            }
+
+            res.status(200).json(response.data);
+        } catch (error) {
+            console.error("Error viewing alert rules:", error);
+            res.status(500).json({ error: "Internal server error" });
+        }
+    },
+
+    // Replaces the rules the agent evaluates locally; body: { rules: [...] }
+    updateAlertRules: async (req, res) => {
+        try {
+            const { id } = req.params;
+            const { rules } = req.body;
+
+            if (!Array.isArray(rules)) {
+                return res.status(400).json({ error: "Rules must be an array" });
+            }
+
+            const isOnline = await Computer.isOnline(id);
+            if (!isOnline) {
+                return res.status(503).json({
+                    error: "Computer is offline. Please try again when it's online.",
+                });
+            }
+
+            const response = await sendCommandToComputer(id, "set_alert_rules", { rules });
+            if (!response || !response.success) {
+                return res.status(400).json({
+                    error: (response && response.message) || "Unable to install alert rules",
+                });
+            }
+
+            res.status(200).json(response.data);
+        } catch (error) {
+            console.error("Error updating alert rules:", error);
+            res.status(500).json({ error: "Internal server error" });
+        }
+    },
+
+    viewAlerts: async (req, res) => {
+        try {
+            const { id } = req.params;
+            res.status(200).json({ alerts: getComputerAlerts(id) });
+        } catch (error) {
+            console.error("Error viewing alerts:", error);
+            res.status(500).json({ error: "Internal server error" });
+        }
+    },
+
     viewApplications: async (req, res) => {
         try {
             const { id } = req.params;
@@ -30,6 +30,60 @@ router.get(
     ComputerController.viewNetActivities
 );
 
+router.get(
+    "/:id/network/:taskId/hostnames",
+    permissionMiddleware("view", "computer"),
+    ComputerController.viewNetHostnames
+);
+
+router.get(
+    "/:id/inventory",
+    permissionMiddleware("view", "computer"),
+    ComputerController.viewInventory
+);
+
+router.get(
+    "/:id/metrics",
+    permissionMiddleware("view", "computer"),
+    ComputerController.viewMetrics
+);
+
+router.post(
+    "/:id/subscriptions",
+    permissionMiddleware("view", "computer"),
+    ComputerController.subscribe
+);
+
+router.delete(
+    "/:id/subscriptions/:subscriptionId",
+    permissionMiddleware("view", "computer"),
+    ComputerController.unsubscribe
+);
+
+router.get(
+    "/:id/live/:collector",
+    permissionMiddleware("view", "computer"),
+    ComputerController.viewLive
+);
+
+router.get(
+    "/:id/alert-rules",
+    permissionMiddleware("view", "computer"),
+    ComputerController.viewAlertRules
+);
+
+router.put(
+    "/:id/alert-rules",
+    permissionMiddleware("manage", "computer"),
+    ComputerController.updateAlertRules
+);
+
+router.get(
+    "/:id/alerts",
+    permissionMiddleware("view", "computer"),
+    ComputerController.viewAlerts
+);
+
 router.get(
     "/:id/applications",
     permissionMiddleware("view", "computer"),
@@ -1,9 +1,230 @@
 const WebSocket = require('ws');
+const zlib = require('zlib');
 const { v4: uuidv4 } = require('uuid');
+const jwt = require('./jwt');
+
+// MessagePack is optional: without it every agent is answered with JSON
+let msgpack = null;
+try {
+    msgpack = require('@msgpack/msgpack');
+} catch (e) {
+    msgpack = null;
+}
 
 let wss = null;
 const computerClients = new Map();
 const pendingTasks = new Map();
+// Follow-up updates streamed by agents after task_completed, keyed by task ID
+const taskUpdates = new Map();
+const TASK_UPDATES_TTL = 10 * 60 * 1000; // 10 minutes
+// Rows of streamed results received so far, keyed by task ID
+const resultStreams = new Map();
+// Subscriptions requested for each computer, sent again after every authentication
+// (computer ID -> Map of subscription ID -> { collector, interval, options })
+const subscriptions = new Map();
+// Live state of each subscription rebuilt from the pushed updates, keyed by subscription ID
+const subscriptionViews = new Map();
+const MAX_LIVE_METRIC_POINTS = 1800;
+// Alert transitions reported by each agent, newest last (computer ID -> alerts)
+const computerAlerts = new Map();
+const MAX_ALERTS_PER_COMPUTER = 200;
+
+// Rebuilds the row objects of a table sent in the agent's columnar format
+const decodeColumnarTable = (table) => {
+    const { count, columns, values, dictionaries = {} } = table;
+    const rows = new Array(count);
+    for (let rowIndex = 0; rowIndex < count; rowIndex++) {
+        rows[rowIndex] = {};
+    }
+    columns.forEach((column, columnIndex) => {
+        const columnValues = values[columnIndex];
+        const dictionary = dictionaries[column];
+        for (let rowIndex = 0; rowIndex < count; rowIndex++) {
+            const value = columnValues[rowIndex];
+            const decoded = dictionary ? dictionary[value] : value;
+            if (decoded !== undefined) {
+                rows[rowIndex][column] = decoded;
+            }
+        }
+    });
+    return rows;
+};
+
+const decodeColumnar = (value) => {
+    if (Array.isArray(value)) {
+        return value.map(decodeColumnar);
+    }
+    if (value && typeof value === 'object') {
+        if (value['$columnar']) {
+            return decodeColumnarTable(value);
+        }
+        const decoded = {};
+        for (const [key, item] of Object.entries(value)) {
+            decoded[key] = decodeColumnar(item);
+        }
+        return decoded;
+    }
+    return value;
+};
+
+const decodeAgentMessage = (data) => {
+    if (data && data.format === 'columnar') {
+        data.data = decodeColumnar(data.data);
+        delete data.format;
+    }
+    return data;
+};
+
+// Picks the first codec offered by the agent that the server supports
+const chooseCodec = (offered) => {
+    const supported = msgpack ? ['msgpack', 'json'] : ['json'];
+    const codecs = Array.isArray(offered) ? offered : [];
+    return codecs.find((codec) => supported.includes(codec)) || 'json';
+};
+
+// Compressed agent frames: 0xC1 marker (unused by MessagePack), algorithm id,
+// payload encoding (0 = JSON text, 1 = MessagePack), then the compressed bytes
+const COMPRESSED_MARKER = 0xc1;
+const decompressors = { 1: zlib.inflateSync };
+const compressionIds = { zlib: 1 };
+if (typeof zlib.zstdDecompressSync === 'function') {
+    decompressors[2] = zlib.zstdDecompressSync;
+    compressionIds.zstd = 2;
+}
+
+// Picks the first compression algorithm offered by the agent that the server can decompress
+const chooseCompression = (offered) => {
+    const algorithms = Array.isArray(offered) ? offered : [];
+    return algorithms.find((algorithm) => compressionIds[algorithm]) || null;
+};
+
+// Returns the payload and its binary flag after unwrapping a compressed envelope
+const unwrapFrame = (message, isBinary) => {
+    if (!isBinary || message.length < 4 || message[0] !== COMPRESSED_MARKER) {
+        return { payload: message, binary: isBinary };
+    }
+    const decompress = decompressors[message[1]];
+    if (!decompress) {
+        throw new Error(`Unsupported compression algorithm ${message[1]}`);
+    }
+    return { payload: decompress(message.subarray(3)), binary: message[2] === 1 };
+};
+
+// Sends a message to an agent with the codec negotiated for its connection
+const sendToAgent = (ws, data) => {
+    if (ws.codec === 'msgpack') {
+        ws.send(msgpack.encode(data), { binary: true });
+    } else {
+        ws.send(JSON.stringify(data));
+    }
+};
+
+// Parses an agent frame into its messages: binary frames are MessagePack,
+// text frames JSON; batch frames carry several messages, and
+// columnar-encoded tables are expanded back into rows
+const parseAgentMessages = (message, isBinary) => {
+    const { payload, binary } = unwrapFrame(message, isBinary);
+    const data = binary ? msgpack.decode(payload) : JSON.parse(payload.toString());
+    const messages = data.type === 'batch' && Array.isArray(data.messages)
+        ? data.messages
+        : [data];
+    return messages.map(decodeAgentMessage);
+};
+
+const handleAgentMessage = (ws, data) => {
+    try {
+        if (data.type === 'auth' && data.computer_id) {
+            const computerId = data.computer_id.toString();
+
+            // Agents resuming a session prove it with the token issued by /connect
+            if (data.resume_token && !jwt.verifyResumeToken(data.resume_token, computerId, data.agent_uuid)) {
+                console.log('Rejected resume token for computer ID:', computerId);
+                sendToAgent(ws, { type: 'auth_failed', code: 'INVALID_RESUME_TOKEN' });
+                ws.close();
+                return;
+            }
+            console.log('Client authenticated with computer ID:', computerId);
+
+            const existingConnection = computerClients.get(computerId);
+            if (existingConnection && existingConnection !== ws) {
+                existingConnection.close();
+            }
+
+            ws.computer_id = computerId;
+            computerClients.set(computerId, ws);
+            console.log('Current connected computers:', Array.from(computerClients.keys()));
+            // Tells the agent its connection is ready, which resets its reconnect backoff,
+            // renews the agent's resume token and chooses the codec and compression
+            // for the rest of the connection
+            const authOk = {
+                type: 'auth_ok',
+                codec: chooseCodec(data.codecs),
+                compression: chooseCompression(data.compression),
+            };
+            if (data.agent_uuid) {
+                authOk.resume_token = jwt.signResumeToken(computerId, data.agent_uuid);
+            }
+            sendToAgent(ws, authOk);
+            ws.codec = authOk.codec;
+            // The agent drops the subscriptions of a closed connection
+            resubscribeComputer(computerId);
+        }
+        else if (data.type === 'subscription_update' && ws.computer_id && Array.isArray(data.updates)) {
+            for (const update of data.updates) {
+                applySubscriptionUpdate(ws.computer_id, decodeAgentMessage(update));
+            }
+        }
+        else if (data.type === 'result_chunk' && data.task_id) {
+            addResultChunk(data);
+            // Every received chunk returns one credit to the agent
+            sendToAgent(ws, {
+                type: 'grant_credit',
+                task_id: data.task_id,
+                credit: 1,
+            });
+        }
+        else if (data.type === 'task_completed' && data.task_id) {
+            const taskId = data.task_id;
+            if (data.data && data.data.streamed) {
+                const { rows, error } = takeStreamedRows(taskId, data.data);
+                if (error) {
+                    // A truncated row list must not be reported as the result
+                    console.error(`Streamed result ${taskId} is incomplete: ${error}`);
+                    data.success = false;
+                    data.status = 'failed';
+                    data.message = `Result stream incomplete: ${error}`;
+                    data.data = null;
+                } else {
+                    data.data = rows;
+                }
+            } else {
+                resultStreams.delete(taskId);
+            }
+            const pendingTask = pendingTasks.get(taskId);
+            if (pendingTask) {
+                pendingTask.resolve(data);
+                pendingTasks.delete(taskId);
+            }
+        }
+        else if (data.type === 'response' && data.replayed && data.task_id) {
+            // Responses buffered by the agent while it was offline arrive on a new
+            // connection, where the command's own listener is not registered
+            const pendingTask = pendingTasks.get(data.task_id);
+            if (pendingTask && !(data.data && data.data.status === 'wait')) {
+                pendingTask.resolve(data);
+                pendingTasks.delete(data.task_id);
+            }
+        }
+        else if (data.type === 'task_update' && data.task_id) {
+            addTaskUpdate(data.task_id, data.data);
+        }
+        else if (data.type === 'alert' && ws.computer_id && data.data) {
+            addAlert(ws.computer_id, data.data);
+        }
+    } catch (e) {
+        console.error('Error processing message:', e);
+    }
+};
 
 const initializeWebSocket = (server) => {
     if (wss) return;
@@ -16,7 +237,12 @@ const initializeWebSocket = (server) => {
         },
         handleProtocols: (protocols, request) => {
             return 'agent-protocol';
-        }
+        },
+        // Used by clients that offer permessage-deflate; agents that cannot
+        // compress their frames with the compressed envelope instead
+        perMessageDeflate: {
+            threshold: 1024,
+        },
     });
 
     wss.on('connection', (ws, req) => {
@@ -32,33 +258,18 @@ const initializeWebSocket = (server) => {
             console.error('Error sending welcome message:', error);
         }
 
-        ws.on('message', (message) => {
+        ws.on('message', (message, isBinary) => {
+            let messages;
             try {
-                const data = JSON.parse(message.toString());
-                
-                if (data.type === 'auth' && data.computer_id) {
-                    const computerId = data.computer_id.toString();
-                    console.log('Client authenticated with computer ID:', computerId);
-                    
-                    const existingConnection = computerClients.get(computerId);
-                    if (existingConnection && existingConnection !== ws) {
-                        existingConnection.close();
-                    }
-                    
-                    ws.computer_id = computerId;
-                    computerClients.set(computerId, ws);
-                    console.log('Current connected computers:', Array.from(computerClients.keys()));
-                }
-                else if (data.type === 'task_completed' && data.task_id) {
-                    const taskId = data.task_id;
-                    const pendingTask = pendingTasks.get(taskId);
-                    if (pendingTask) {
-                        pendingTask.resolve(data);
-                        pendingTasks.delete(taskId);
-                    }
-                }
+                messages = parseAgentMessages(message, isBinary);
             } catch (e) {
-                console.error('Error processing message:', e);
+                console.error('Error parsing message:', e);
+                return;
+            }
+            for (const data of messages) {
+                // Command listeners receive each message of a frame separately
+                ws.emit('agent-message', data);
+                handleAgentMessage(ws, data);
             }
         });
 
@@ -88,26 +299,27 @@ const sendCommandToComputer = (computerId, commandType, params = {}) => {
         }
 
         const taskId = uuidv4();
-        const command = JSON.stringify({
+        const command = {
             type: commandType,
             params: {
                 ...params,
                 task_id: taskId
             },
-        });
-
-        ws.send(command);
+        };
 
-        const handleMessage = (message) => {
+        const handleMessage = (response) => {
             try {
-                const response = JSON.parse(message.toString());
+                // Only the immediate response to this command is handled here
+                if (response.type !== 'response' || response.task_id !== taskId) {
+                    return;
+                }
                 if (response.data && response.data.status === 'wait') {
-                    // Nếu nhận được trạng thái wait, lưu promise để resolve sau
-                    pendingTasks.set(taskId, { resolve, reject });
-                    ws.removeListener('message', handleMessage);
+                    // Nếu nhận được trạng thái wait, chờ task_completed
+                    ws.removeListener('agent-message', handleMessage);
                 } else {
                     // Nếu là response thông thường, resolve ngay
-                    ws.removeListener('message', handleMessage);
+                    ws.removeListener('agent-message', handleMessage);
+                    pendingTasks.delete(taskId);
                     resolve(response);
                 }
             } catch (e) {
@@ -116,16 +328,265 @@ const sendCommandToComputer = (computerId, commandType, params = {}) => {
             }
         };
 
-        ws.on('message', handleMessage);
+        // Async commands are resolved by their task_completed message
+        pendingTasks.set(taskId, {
+            resolve: (data) => {
+                ws.removeListener('agent-message', handleMessage);
+                resolve(data);
+            },
+            reject,
+        });
+        ws.on('agent-message', handleMessage);
+        sendToAgent(ws, command);
 
         setTimeout(() => {
-            ws.removeListener('message', handleMessage);
+            ws.removeListener('agent-message', handleMessage);
             pendingTasks.delete(taskId);
+            resultStreams.delete(taskId);
             reject(new Error('Command timeout'));
         }, 60 * 60 * 1000); // 1 hour
     });
 };
 
+const addResultChunk = (chunk) => {
+    let stream = resultStreams.get(chunk.task_id);
+    if (!stream) {
+        stream = { chunks: [] };
+        resultStreams.set(chunk.task_id, stream);
+    }
+    stream.chunks[chunk.seq] = chunk.data || [];
+};
+
+// Reassembles the rows of a streamed result once its trailer arrives; the
+// result is only complete when every chunk and row the trailer counts arrived
+const takeStreamedRows = (taskId, summary) => {
+    const stream = resultStreams.get(taskId);
+    resultStreams.delete(taskId);
+    const chunks = stream ? stream.chunks : [];
+
+    const rows = [];
+    const missing = [];
+    for (let seq = 0; seq < summary.chunks; seq++) {
+        const chunk = chunks[seq];
+        if (!chunk) {
+            missing.push(seq);
+            continue;
+        }
+        rows.push(...chunk);
+    }
+    if (missing.length) {
+        return { rows, error: `${missing.length} of ${summary.chunks} chunks missing` };
+    }
+    if (typeof summary.rows === 'number' && rows.length !== summary.rows) {
+        return { rows, error: `received ${rows.length} of ${summary.rows} rows` };
+    }
+    return { rows, error: null };
+};
+
+const addTaskUpdate = (taskId, update) => {
+    let entry = taskUpdates.get(taskId);
+    if (!entry) {
+        entry = { updates: [], done: false };
+        taskUpdates.set(taskId, entry);
+        setTimeout(() => taskUpdates.delete(taskId), TASK_UPDATES_TTL);
+    }
+    if (update) {
+        entry.updates.push(update);
+        if (update.done) {
+            entry.done = true;
+        }
+    }
+};
+
+// Returns the updates received for a task, starting at index `after`
+const getTaskUpdates = (taskId, after = 0) => {
+    const entry = taskUpdates.get(taskId);
+    if (!entry) {
+        return { updates: [], next: after, done: false };
+    }
+    return {
+        updates: entry.updates.slice(after),
+        next: entry.updates.length,
+        done: entry.done,
+    };
+};
+
+const processKey = (row) => `${row.pid}:${row.create_time}`;
+const connectionKey = (row) => `${row.pid}|${row.local_addr}|${row.remote_addr}`;
+
+// Applies added/removed/changed rows of a delta to a Map of rows
+const applyRowDelta = (rows, data, keyOf, removedKeyOf) => {
+    for (const key of data.removed || []) {
+        rows.delete(removedKeyOf(key));
+    }
+    for (const row of data.added || []) {
+        rows.set(keyOf(row), row);
+    }
+    for (const change of data.changed || []) {
+        const key = keyOf(change);
+        rows.set(key, { ...(rows.get(key) || {}), ...change });
+    }
+};
+
+// Asks the agent to restart a subscription, which makes its next push a full one
+const sendSubscribe = (computerId, subscriptionId) => {
+    const ws = computerClients.get(computerId);
+    const subscription = subscriptions.get(computerId)?.get(subscriptionId);
+    if (!ws || !subscription) return;
+
+    // Updates sent before the restart are ignored until its first (full) one arrives
+    subscriptionViews.set(subscriptionId, { resyncing: true });
+    sendToAgent(ws, {
+        type: 'subscribe',
+        params: {
+            ...subscription.options,
+            collector: subscription.collector,
+            interval: subscription.interval,
+            subscription_id: subscriptionId,
+            task_id: uuidv4(),
+        },
+    });
+};
+
+const resubscribeComputer = (computerId) => {
+    const computerSubscriptions = subscriptions.get(computerId);
+    if (!computerSubscriptions) return;
+    for (const subscriptionId of computerSubscriptions.keys()) {
+        sendSubscribe(computerId, subscriptionId);
+    }
+};
+
+// Updates the live view of a subscription from one pushed update. A delta
+// that does not follow the previous update (lost frame, unknown version)
+// restarts the subscription so the agent sends full data again
+const applySubscriptionUpdate = (computerId, update) => {
+    const subscription = subscriptions.get(computerId)?.get(update.subscription_id);
+    if (!subscription) return;
+
+    const data = update.data || {};
+    let view = subscriptionViews.get(update.subscription_id);
+    if (view && view.resyncing) {
+        if (update.seq !== 0) return;
+        view = null;
+    }
+    const inOrder = view && update.seq === view.seq + 1;
+
+    if (update.collector === 'metrics') {
+        const columns = data.columns || [];
+        if (!view || !inOrder || view.data.columns.join() !== columns.join()) {
+            view = { data: { columns, timestamps: [], values: columns.map(() => []) } };
+        }
+        const live = view.data;
+        live.resolution = data.resolution;
+        live.timestamps.push(...(data.timestamps || []));
+        (data.values || []).forEach((values, index) => live.values[index].push(...values));
+        const excess = live.timestamps.length - MAX_LIVE_METRIC_POINTS;
+        if (excess > 0) {
+            live.timestamps.splice(0, excess);
+            live.values.forEach((values) => values.splice(0, excess));
+        }
+    } else if (data.full) {
+        const rows = data.processes || data.connections || [];
+        const keyOf = update.collector === 'processes' ? processKey : connectionKey;
+        view = { rows: new Map(rows.map((row) => [keyOf(row), row])), version: data.version };
+    } else if (!inOrder || (update.collector === 'processes' && data.since_version !== view.version)) {
+        console.log(`Subscription ${update.subscription_id} is out of sync, restarting it`);
+        sendSubscribe(computerId, update.subscription_id);
+        return;
+    } else if (update.collector === 'processes') {
+        applyRowDelta(view.rows, data, processKey, ([pid, createTime]) => `${pid}:${createTime}`);
+        view.version = data.version;
+    } else {
+        applyRowDelta(view.rows, data, connectionKey, ([pid, local, remote]) => `${pid}|${local}|${remote}`);
+    }
+
+    view.seq = update.seq;
+    view.updatedAt = new Date().toISOString();
+    subscriptionViews.set(update.subscription_id, view);
+};
+
+// Starts pushing a collector from a computer; the subscription is kept until
+// unsubscribed and renewed every time the agent reconnects
+const subscribeComputer = async (computerId, collector, interval, options = {}) => {
+    computerId = computerId.toString();
+    const subscriptionId = uuidv4();
+    const response = await sendCommandToComputer(computerId, 'subscribe', {
+        ...options,
+        collector,
+        interval,
+        subscription_id: subscriptionId,
+    });
+    if (response && response.success) {
+        if (!subscriptions.has(computerId)) {
+            subscriptions.set(computerId, new Map());
+        }
+        subscriptions.get(computerId).set(subscriptionId, { collector, interval, options });
+    }
+    return response;
+};
+
+const unsubscribeComputer = async (computerId, subscriptionId) => {
+    computerId = computerId.toString();
+    const computerSubscriptions = subscriptions.get(computerId);
+    if (!computerSubscriptions || !computerSubscriptions.delete(subscriptionId)) {
+        return false;
+    }
+    subscriptionViews.delete(subscriptionId);
+    if (computerClients.has(computerId)) {
+        await sendCommandToComputer(computerId, 'unsubscribe', { subscription_id: subscriptionId });
+    }
+    return true;
+};
+
+// Returns the live data of the computer's subscription to a collector, or null
+const getSubscriptionView = (computerId, collector) => {
+    const computerSubscriptions = subscriptions.get(computerId.toString());
+    if (!computerSubscriptions) return null;
+
+    for (const [subscriptionId, subscription] of computerSubscriptions) {
+        if (subscription.collector !== collector) continue;
+        let view = subscriptionViews.get(subscriptionId);
+        if (view && view.resyncing) view = null;
+        let data = null;
+        if (view && collector === 'metrics') {
+            data = view.data;
+        } else if (view) {
+            data = { [collector]: Array.from(view.rows.values()) };
+            if (collector === 'processes') data.version = view.version;
+        }
+        return {
+            subscription_id: subscriptionId,
+            collector,
+            interval: subscription.interval,
+            seq: view ? view.seq : null,
+            updated_at: view ? view.updatedAt : null,
+            data,
+        };
+    }
+    return null;
+};
+
+const addAlert = (computerId, alert) => {
+    let alerts = computerAlerts.get(computerId);
+    if (!alerts) {
+        alerts = [];
+        computerAlerts.set(computerId, alerts);
+    }
+    // Alerts stored in the agent's outbox may be delivered again after a reconnect
+    if (alerts.some((existing) => existing.alert_id === alert.alert_id)) return;
+
+    console.log(`Alert ${alert.rule_id} ${alert.state} on computer ${computerId}: ${alert.metric} = ${alert.value}`);
+    alerts.push({ ...alert, received_at: new Date().toISOString() });
+    if (alerts.length > MAX_ALERTS_PER_COMPUTER) {
+        alerts.splice(0, alerts.length - MAX_ALERTS_PER_COMPUTER);
+    }
+};
+
+// Returns the alerts received from a computer, newest first
+const getComputerAlerts = (computerId) => {
+    return (computerAlerts.get(computerId.toString()) || []).slice().reverse();
+};
+
 const getConnectedComputers = () => {
     return Array.from(computerClients.keys());
 };
@@ -133,6 +594,11 @@ const getConnectedComputers = () => {
 module.exports = { 
     initializeWebSocket, 
     sendCommandToComputer,
+    getTaskUpdates,
     getConnectedComputers,
+    subscribeComputer,
+    unsubscribeComputer,
+    getSubscriptionView,
+    getComputerAlerts,
     computerClients 
 };
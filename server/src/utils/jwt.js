@@ -63,6 +63,25 @@ const JWT = {
             });
         });
     },
+
+    // Resume tokens are signed and checked synchronously: the agent's auth
+    // message must be handled before the messages that follow it on the socket
+    signResumeToken: (computerId, agentUuid) => {
+        return jwt.sign(
+            { computer_id: computerId.toString(), agent_uuid: agentUuid },
+            config.resumeTokenSecret,
+            { expiresIn: config.resumeTokenExpiration, issuer: "localhost" }
+        );
+    },
+
+    verifyResumeToken: (token, computerId, agentUuid) => {
+        try {
+            const decoded = jwt.verify(token, config.resumeTokenSecret);
+            return decoded.computer_id === computerId.toString() && decoded.agent_uuid === agentUuid;
+        } catch (err) {
+            return false;
+        }
+    },
 };
 
 module.exports = JWT;